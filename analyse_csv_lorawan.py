@@ -1,99 +1,357 @@
+import io
 import os
 import re
+import csv
 import sys
+import json
+import time
+import argparse
+import functools
+import itertools
+import contextlib
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-def parse_csv_file(csv_path):
-    """Parse un fichier CSV LoRaWAN et retourne un DataFrame"""
-    data = []
+from experiment_cache import load_experiment, file_fingerprint, fingerprint_matches
+from loss_accounting import delivery_stats, rolling_delivery_rate
+from decimation import decimate_indices, pixel_budget
+from dataset import parse_filename
+from grouped_bars import bar_matrix, draw_grouped_bars
+from uplink_dedup import deduplicate_uplinks, diversity_summary
+from mmap_csv import mapped_file, data_start, record_ranges, window_ranges, release, count_newlines
+import profiling
+
+# Ligne "canonique" : au moins 9 champs, snr/rssi/cr entiers. Ces lignes, qui
+# forment l'essentiel des exports, sont tokenisées en bloc par le moteur C de
+# pandas puis reconnues par des tests vectorisés sur les colonnes ; les autres
+# passent par _parse_line qui applique les règles de repli. Aucune expression
+# régulière ni boucle Python ne parcourt les lignes canoniques.
+
+# Champs 1 à 7 d'une ligne de données et type de lecture : les champs à peu de
+# valeurs distinctes sont lus en catégories, testés et convertis par valeur
+FIELD_DTYPES = {
+    'gateway_eui': 'category',
+    'node_eui': 'category',
+    'snr': 'category',
+    'rssi': 'category',
+    'cr': 'category',
+    'datarate': 'category',
+    'time': object
+}
+# Nombre de points-virgules d'une ligne canonique (champ data présent)
+MIN_SEPARATORS = 8
+# Nombre maximal de chiffres d'un champ entier canonique (tient dans un int64)
+MAX_INT_DIGITS = 18
+
+# Graphiques générés pour chaque fichier (suffixes des noms de fichiers)
+PER_FILE_CHARTS = ('time_series_metrics', 'snr_par_message', 'rssi_par_message', 'taux_livraison')
+
+# Paramètres de rendu enregistrés dans le manifeste du mode incrémental ;
+# incrémenter 'version' à chaque modification de l'aspect des graphiques
+RENDER_PARAMS = {'version': 8, 'dpi': 150, 'decimation': 'minmax'}
+# Fenêtre par défaut du PDR glissant : (taille, 'messages' ou 'seconds')
+DEFAULT_PDR_WINDOW = (10, 'messages')
+
+MANIFEST_NAME = '.manifest.json'
+
+COLUMNS = ['message_id', 'time', 'rssi', 'snr', 'sf', 'datarate', 'cr', 'node_eui', 'gateway_eui']
+STRING_COLUMNS = ('time', 'datarate', 'node_eui', 'gateway_eui')
+
+# Schéma compact d'une expérience (voir compact_experiment)
+COMPACT_DTYPES = {
+    'message_id': np.int32,
+    'rssi': np.int16,
+    'snr': np.int8,
+    'sf': np.int8,
+    'cr': np.int8,
+    'datarate': 'category',
+    'node_eui': 'category',
+    'gateway_eui': 'category'
+}
+
+
+def _extract_sf(datarate):
+    """Extrait le Spreading Factor d'un datarate (ex: SF7BW500 -> 7)"""
+    sf_match = re.search(r'SF(\d+)', datarate)
+    return int(sf_match.group(1)) if sf_match else 0
+
+
+def _parse_line(line, line_num):
+    """Parse une ligne non canonique et retourne (entrée, message d'erreur)
+    
+    Les lignes vides retournent (None, None).
+    """
+    line = line.strip()
+    if not line:
+        return None, None
+    
+    # Nettoyer et diviser la ligne
+    parts = line.strip('"').split(';')
+    if len(parts) < 8:
+        return None, f"Ligne {line_num} ignorée: pas assez de champs"
+    
+    # Extraire les données
+    data_str = ';'.join(parts[8:]) if len(parts) > 8 else ''
+    
+    # Extraire SNR et RSSI
+    rssi = int(parts[4]) if parts[4].lstrip('-').isdigit() else None
+    snr = int(parts[3]) if parts[3].lstrip('-').isdigit() else None
+    
+    # Si pas trouvé, essayer de les extraire du champ data
+    if rssi is None or snr is None:
+        rssi_match = re.search(r'"RSSI"\s*:\s*(-?\d+)', data_str)
+        snr_match = re.search(r'"SNR"\s*:\s*(-?\d+)', data_str)
+        
+        if rssi_match:
+            rssi = int(rssi_match.group(1))
+        if snr_match:
+            snr = int(snr_match.group(1))
     
+    if rssi is None or snr is None:
+        return None, f"Ligne {line_num}: Impossible d'extraire RSSI ou SNR"
+    
+    return {
+        'time': parts[7],
+        'rssi': rssi,
+        'snr': snr,
+        'sf': _extract_sf(parts[6]),
+        'datarate': parts[6],
+        'cr': int(parts[5]) if parts[5].isdigit() else 5,
+        'node_eui': parts[2],
+        'gateway_eui': parts[1]
+    }, None
+
+
+def _read_fields(buf):
+    """Tokenise les champs 1 à 7 de chaque ligne d'un tampon avec le moteur C de pandas
+    
+    Chaque ligne du tampon (lignes vides comprises) donne une ligne de la
+    table ; les champs absents sont des chaînes vides.
+    """
+    # Ligne d'en-tête factice : le nombre de colonnes ne dépend pas des premières lignes du tampon
+    return pd.read_csv(
+        io.BytesIO(b';' * len(FIELD_DTYPES) + b'\n' + buf), sep=';', header=0, names=list(FIELD_DTYPES),
+        usecols=range(1, len(FIELD_DTYPES) + 1), quoting=csv.QUOTE_NONE, na_filter=False,
+        skip_blank_lines=False, lineterminator='\n', engine='c', dtype=FIELD_DTYPES,
+        encoding='utf-8', encoding_errors='replace'
+    )
+
+
+def _integer_fields(column, signed=True):
+    """Retourne (masque, valeurs) des lignes d'une colonne catégorielle écrites comme des entiers décimaux
+    
+    Un entier canonique compte 1 à MAX_INT_DIGITS chiffres, précédés d'un
+    signe '-' si signed. Le test porte sur les codes des caractères de chaque
+    valeur distincte, sans boucle Python ; les valeurs non entières valent 0.
+    """
+    # Tronquées à cette largeur, les chaînes trop longues gardent trop de chiffres ou un caractère invalide
+    width = MAX_INT_DIGITS + 2
+    text = column.cat.categories.to_numpy(dtype=object).astype(f'U{width}')
+    codes = text.view(np.uint32).reshape(len(text), width)
+    digits = (codes >= ord('0')) & (codes <= ord('9'))
+    empty = codes == 0
+    n_digits = digits.sum(axis=1)
+    first = digits[:, 0] | (codes[:, 0] == ord('-')) if signed else digits[:, 0]
+    mask = (first & (digits[:, 1:] | empty[:, 1:]).all(axis=1)
+            # Aucun caractère après la fin de la chaîne (caractère nul inclus)
+            & ~(empty[:, :-1] & ~empty[:, 1:]).any(axis=1)
+            & (n_digits >= 1) & (n_digits <= MAX_INT_DIGITS))
+    parsed = np.zeros(len(text), dtype=np.int64)
+    parsed[mask] = text[mask].astype(np.int64)
+    
+    rows = column.cat.codes.to_numpy()
+    return mask[rows], parsed[rows]
+
+
+def _parse_block(buf, first_line=2):
+    """Parse un bloc d'octets de lignes de données complètes
+    
+    first_line est le numéro de la première ligne de buf dans le fichier
+    (pour les messages d'erreur). Retourne (colonnes dans l'ordre du bloc,
+    nombre de lignes, erreurs).
+    """
+    table = _read_fields(buf)
+    
+    # Bornes de chaque ligne et nombre de séparateurs, comptés sur les octets
+    octets = np.frombuffer(buf, dtype=np.uint8)
+    ends = np.flatnonzero(octets == ord('\n'))
+    n_lines = len(ends) + 1
+    if len(ends) < len(table):
+        ends = np.append(ends, len(buf))
+    starts = np.concatenate(([0], ends[:-1] + 1)) if len(table) else ends
+    separators = np.add.reduceat(octets == ord(';'), starts, dtype=np.int64)
+    
+    # Lignes canoniques : champ data présent, snr/rssi/cr entiers
+    snr_ok, snr = _integer_fields(table['snr'])
+    rssi_ok, rssi = _integer_fields(table['rssi'])
+    cr_ok, cr = _integer_fields(table['cr'], signed=False)
+    canonical = (separators >= MIN_SEPARATORS) & snr_ok & rssi_ok & cr_ok
+    # Un caractère nul en fin de champ disparaît des chaînes numpy : ces lignes passent par _parse_line
+    canonical[np.searchsorted(ends, np.flatnonzero(octets == 0))] = False
+    
+    # Lignes atypiques : traitement ligne par ligne
+    fallback_entries = []
+    fallback_index = []
+    errors = []
+    for line in np.flatnonzero(~canonical):
+        line_num = first_line + line
+        text = buf[starts[line]:ends[line]].decode('utf-8', errors='replace')
+        try:
+            entry, error = _parse_line(text, line_num)
+        except Exception as e:
+            errors.append(f"Erreur ligne {line_num}: {e}")
+            continue
+        if error:
+            errors.append(error)
+        elif entry:
+            fallback_entries.append(entry)
+            fallback_index.append(line)
+    
+    columns = {name: [] for name in COLUMNS[1:]}
+    line_index = []
+    if canonical.any():
+        # Le SF est extrait une seule fois par datarate distinct
+        datarates = table['datarate'].cat
+        sf_values = np.array([_extract_sf(dr) for dr in datarates.categories], dtype=np.int64)
+        block = {
+            'time': table['time'].to_numpy()[canonical],
+            'rssi': rssi[canonical],
+            'snr': snr[canonical],
+            'sf': sf_values[datarates.codes.to_numpy()][canonical],
+            'datarate': table['datarate'].to_numpy(dtype=object)[canonical],
+            'cr': cr[canonical],
+            'node_eui': table['node_eui'].to_numpy(dtype=object)[canonical],
+            'gateway_eui': table['gateway_eui'].to_numpy(dtype=object)[canonical]
+        }
+        for name, values in block.items():
+            columns[name].append(values)
+        line_index.append(np.flatnonzero(canonical))
+    
+    if fallback_entries:
+        for name in columns:
+            dtype = object if name in STRING_COLUMNS else np.int64
+            columns[name].append(np.array([entry[name] for entry in fallback_entries], dtype=dtype))
+        line_index.append(np.array(fallback_index, dtype=np.int64))
+    
+    # Remettre les messages dans l'ordre du bloc
+    if not line_index:
+        return {}, n_lines, errors
+    order = np.argsort(np.concatenate(line_index), kind='stable')
+    data = {name: np.concatenate(values)[order] for name, values in columns.items()}
+    return data, n_lines, errors
+
+
+def _parse_range(csv_path, start, end, first_line, profile=False):
+    """Parse la plage d'octets [start, end) d'un fichier projeté en mémoire (processus de travail)
+    
+    La plage est analysée par fenêtres de taille bornée (voir
+    mmap_csv.window_ranges), dont les pages sont libérées une fois lues :
+    aucun tampon ne contient toute la plage. Retourne (bloc analysé, trace) ;
+    avec profile, trace contient les étapes mesurées dans le processus de
+    travail (voir profiling.collect).
+    """
+    with profiling.collect(profile) as trace:
+        with profiling.stage('parse_range', file=os.path.basename(csv_path), bytes=end - start) as info:
+            blocks = []
+            with mapped_file(csv_path) as buf:
+                for lo, hi in window_ranges(buf, start, end):
+                    blocks.append(_parse_block(buf[lo:hi], first_line))
+                    first_line += blocks[-1][1] - 1
+                    release(buf, lo, hi)
+            parsed = _concat_blocks(blocks)
+            info['rows'] = len(parsed[0].get('time', ()))
+    return parsed, trace
+
+
+def _concat_blocks(blocks):
+    """Fusionne dans l'ordre des blocs consécutifs (colonnes, nombre de lignes, erreurs) d'une même plage"""
+    columns = [data for data, _, _ in blocks if data]
+    data = {name: np.concatenate([block[name] for block in columns]) for name in COLUMNS[1:]} if columns else {}
+    n_lines = sum(n_lines - 1 for _, n_lines, _ in blocks) + 1
+    errors = [error for _, _, block_errors in blocks for error in block_errors]
+    return data, n_lines, errors
+
+
+def parse_csv_file(csv_path, jobs=1):
+    """Parse un fichier CSV LoRaWAN et retourne un DataFrame
+    
+    Le fichier est projeté en mémoire (mmap) : les lignes canoniques sont
+    tokenisées en colonnes typées par le moteur C de pandas directement
+    depuis les octets, seules les lignes atypiques (champs manquants,
+    SNR/RSSI à extraire du JSON) sont décodées et traitées une à une.
+    
+    Avec jobs > 1, un gros fichier est découpé en plages d'octets alignées sur
+    les fins de ligne (voir mmap_csv.record_ranges), analysées en parallèle
+    par des processus de travail puis fusionnées dans l'ordre du fichier.
+    """
     # Extraire les paramètres du nom de fichier
     filename = os.path.basename(csv_path)
     
-    # Extraire SF (ex: SF7, SF12) et la taille de la payload (dernier nombre avant .csv)
-    sf_match = re.search(r'SF(\d+)', filename)
-    payload_match = re.search(r'_(\d+)\.csv$', filename)
-    
-    sf = int(sf_match.group(1)) if sf_match else 0
-    payload_size = int(payload_match.group(1)) if payload_match else 0
+    # Extraire SF (ex: SF7, SF12) et la taille de la payload (voir dataset.parse_filename)
+    metadata = parse_filename(filename) or {}
+    sf = metadata.get('sf', 0)
+    payload_size = metadata.get('payload', 0)
     
     print(f"  - Fichier: {filename}")
     print(f"  - Spreading Factor: {sf}")
     print(f"  - Taille de la payload: {payload_size} octets")
     
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        # Lire l'en-tête
-        header = f.readline().strip().strip('"').split(';')
-        
-        for line_num, line in enumerate(f, 2):  # Commencer à 2 car on a déjà lu la première ligne
-            try:
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                # Nettoyer et diviser la ligne
-                parts = line.strip('"').split(';')
-                if len(parts) < 8:
-                    print(f"Ligne {line_num} ignorée: pas assez de champs")
-                    continue
-                
-                # Extraire les données
-                data_str = ';'.join(parts[8:]) if len(parts) > 8 else ''
-                
-                # Extraire SNR et RSSI
-                rssi = int(parts[4]) if parts[4].lstrip('-').isdigit() else None
-                snr = int(parts[3]) if parts[3].lstrip('-').isdigit() else None
-                
-                # Si pas trouvé, essayer de les extraire du champ data
-                if rssi is None or snr is None:
-                    rssi_match = re.search(r'"RSSI"\s*:\s*(-?\d+)', data_str)
-                    snr_match = re.search(r'"SNR"\s*:\s*(-?\d+)', data_str)
-                    
-                    if rssi_match:
-                        rssi = int(rssi_match.group(1))
-                    if snr_match:
-                        snr = int(snr_match.group(1))
-                
-                if rssi is None or snr is None:
-                    print(f"Ligne {line_num}: Impossible d'extraire RSSI ou SNR")
-                    continue
-                
-                # Extraire le Spreading Factor
-                sf_match = re.search(r'SF(\d+)', parts[6])
-                sf = int(sf_match.group(1)) if sf_match else 0
-                
-                # Créer l'entrée de données
-                entry = {
-                    'message_id': len(data) + 1,
-                    'time': parts[7],
-                    'rssi': rssi,
-                    'snr': snr,
-                    'sf': sf,
-                    'datarate': parts[6],
-                    'cr': int(parts[5]) if parts[5].isdigit() else 5,
-                    'node_eui': parts[2],
-                    'gateway_eui': parts[1]
-                }
-                data.append(entry)
-                
-            except Exception as e:
-                print(f"Erreur ligne {line_num}: {e}")
-                continue
+    with mapped_file(csv_path) as buf:
+        # Ignorer l'en-tête
+        start = data_start(buf)
+        ranges = record_ranges(buf, start, jobs) if jobs > 1 else [(start, len(buf))]
+        if len(ranges) > 1:
+            # Numéro de la première ligne de chaque plage (l'en-tête étant la ligne 1)
+            first_lines = np.cumsum([2] + [count_newlines(buf, lo, hi) for lo, hi in ranges[:-1]])
+    if len(ranges) > 1:
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            results = list(executor.map(_parse_range, itertools.repeat(csv_path),
+                                        *zip(*ranges), first_lines.tolist(),
+                                        itertools.repeat(profiling.active())))
+        blocks = []
+        for block, trace in results:
+            profiling.merge(trace)
+            blocks.append(block)
+    else:
+        blocks = [_parse_range(csv_path, *ranges[0], 2)[0]] if ranges else []
     
-    if not data:
+    for _, _, errors in blocks:
+        for error in errors:
+            print(error)
+    
+    df = _blocks_to_frame([data for data, _, _ in blocks])
+    if df is None:
         print(f"Aucune donnée valide trouvée dans {csv_path}")
         return None
+    return df
+
+
+def _blocks_to_frame(blocks, first_id=1):
+    """Fusionne des blocs analysés (voir _parse_block) dans l'ordre et retourne le DataFrame trié par date
+    
+    Les messages sont numérotés à partir de first_id ; retourne None si
+    aucun bloc ne contient de message.
+    """
+    blocks = [block for block in blocks if block]
+    if not blocks:
+        return None
+    
+    # Fusionner les plages dans l'ordre du fichier
+    n_messages = sum(len(block['time']) for block in blocks)
+    data = {'message_id': np.arange(first_id, first_id + n_messages)}
+    for name in COLUMNS[1:]:
+        data[name] = np.concatenate([block[name] for block in blocks])
     
     # Créer un DataFrame
     df = pd.DataFrame(data)
     
-    # Convertir la date en datetime
+    # Convertir la date en datetime ; le tri stable fusionne les plages dans l'ordre chronologique
     try:
-        df['datetime'] = pd.to_datetime(df['time'])
-        df = df.sort_values('datetime')
+        with profiling.stage('datetime', rows=n_messages):
+            df['datetime'] = pd.to_datetime(df['time'])
+            df = df.sort_values('datetime', kind='stable')
     except Exception as e:
         print(f"Erreur de conversion de date: {e}")
         df = df.sort_values('message_id')
@@ -101,197 +359,539 @@ def parse_csv_file(csv_path):
     return df
 
 
+def _downcast(values, dtype):
+    """Convertit une colonne entière en dtype si toutes ses valeurs y tiennent, sinon la laisse intacte"""
+    info = np.iinfo(dtype)
+    if values.empty or (values.min() >= info.min and values.max() <= info.max):
+        return values.astype(dtype)
+    return values
 
-def generate_plots(df, output_dir='graphs', prefix=''):
-    """Génère les graphiques à partir du DataFrame"""
-    # Créer le répertoire de sortie s'il n'existe pas
-    os.makedirs(output_dir, exist_ok=True)
+def compact_experiment(df):
+    """Convertit un DataFrame issu de parse_csv_file vers un schéma compact
+    
+    Métriques radio en int8/int16, identifiants et datarates en catégories,
+    horodatage conservé une seule fois en datetime64 (la colonne texte 'time'
+    est supprimée au profit de 'datetime').
+    """
+    if df is None:
+        return None
     
-    # Extraire la taille de la payload depuis le préfixe
-    payload_size = 0
-    payload_match = re.search(r'_(\d+)\.csv$', prefix)
-    if payload_match:
-        payload_size = int(payload_match.group(1))
+    df = df.copy()
+    if 'datetime' not in df.columns:
+        df['datetime'] = pd.to_datetime(df['time'], errors='coerce')
+    df = df.drop(columns='time')
+    
+    for name, dtype in COMPACT_DTYPES.items():
+        if name not in df.columns:
+            continue
+        if dtype == 'category':
+            df[name] = df[name].astype('category')
+        else:
+            df[name] = _downcast(df[name], dtype)
+    return df
+
+def parse_experiment(csv_path, jobs=1):
+    """Parse un fichier CSV LoRaWAN et retourne son DataFrame au schéma compact"""
+    return compact_experiment(parse_csv_file(csv_path, jobs))
+
+def memory_report(before, after):
+    """Affiche l'empreinte mémoire par colonne de deux DataFrames et retourne (octets avant, octets après)"""
+    usage_before = before.memory_usage(deep=True, index=False)
+    usage_after = after.memory_usage(deep=True, index=False)
+    
+    print(f"  {'Colonne':<14}{'Avant':>12}{'Après':>12}  Type")
+    for name in usage_before.index:
+        size_after = usage_after.get(name, 0)
+        dtype = after[name].dtype if name in after.columns else 'supprimée'
+        print(f"  {name:<14}{usage_before[name]:>12,}{size_after:>12,}  {dtype}")
+    
+    total_before = int(usage_before.sum())
+    total_after = int(usage_after.sum())
+    print(f"  {'Total':<14}{total_before:>12,}{total_after:>12,}  "
+          f"(x{total_before / max(total_after, 1):.1f})")
+    return total_before, total_after
+
+
+
+def _pyplot():
+    """Importe pyplot à la première utilisation : les analyses sans graphique n'importent jamais matplotlib"""
+    import matplotlib
+    # Backend non interactif : les graphiques sont uniquement enregistrés sur disque
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def render_chart(output_path, draw, args, figsize=(14, 7)):
+    """Construit une figure avec l'API objet (Figure/Agg), l'enregistre et retourne la durée du rendu
+    
+    La figure n'est jamais enregistrée auprès de pyplot : aucun état global
+    n'est partagé, le rendu peut donc s'exécuter dans un thread ou un processus.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    start = time.perf_counter()
+    chart = os.path.basename(output_path)
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    with profiling.stage('draw', chart=chart):
+        draw(fig, *args)
+    with profiling.stage('savefig', chart=chart):
+        fig.savefig(output_path, dpi=RENDER_PARAMS['dpi'], bbox_inches='tight')
+    return time.perf_counter() - start
+
+def render_jobs(jobs, workers=1):
+    """Exécute une file de rendus (output_path, draw, args, figsize) et affiche la durée de chacun"""
+    if workers == 1:
+        durations = [render_chart(*job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=workers or None) as executor:
+            durations = list(executor.map(lambda job: render_chart(*job), jobs))
     
-    # 1. Graphique SNR par message
-    plt.figure(figsize=(14, 7))
+    for job, duration in zip(jobs, durations):
+        print(f"  - Rendu {os.path.basename(job[0])} : {duration:.2f} s")
+    return durations
+
+def _plot_decimated(ax, x, y, budget, **style):
+    """Trace y en fonction de x, décimé à budget points si la série est plus longue
+    
+    Les marqueurs ne sont dessinés que pour les séries non décimées : sur une
+    trace longue ils coûtent cher au rendu sans rien apporter de lisible.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(x) > budget:
+        keep = decimate_indices(x, y, budget, RENDER_PARAMS['decimation'])
+        x, y = x[keep], y[keep]
+        style['marker'] = None
+    ax.plot(x, y, **style)
+
+def _draw_metric_par_message(fig, df, column, unit, label, prefix, stats_top):
+    """Dessine une métrique (SNR ou RSSI) par numéro de message, une courbe par SF"""
+    ax = fig.add_subplot()
+    budget = pixel_budget(fig, RENDER_PARAMS['dpi'])
     for sf, group in df.groupby('sf'):
-        plt.plot(group['message_id'], group['snr'], 'o-', label=f'SF{sf} (n={len(group)})', markersize=4, linewidth=1)
+        _plot_decimated(ax, group['message_id'], group[column], budget, marker='o', linestyle='-',
+                        label=f'SF{sf} (n={len(group)})', markersize=4, linewidth=1)
     
-    plt.xlabel("Numéro de séquence du message")
-    plt.ylabel("SNR (dB)")
-    plt.title(f"SNR par Spreading Factor - {prefix}")
-    plt.legend()
-    plt.grid(True, linestyle='--', alpha=0.6)
-    plt.tight_layout()
+    ax.set_xlabel("Numéro de séquence du message")
+    ax.set_ylabel(f"{label} ({unit})")
+    ax.set_title(f"{label} par Spreading Factor - {prefix}")
+    ax.legend()
+    ax.grid(True, linestyle='--', alpha=0.6)
+    fig.tight_layout()
     
     # Ajouter des statistiques
-    stats_text = f"Moyenne: {df['snr'].mean():.1f} dB\n" \
-                f"Médiane: {df['snr'].median():.1f} dB\n" \
-                f"Min: {df['snr'].min():.1f} dB\n" \
-                f"Max: {df['snr'].max():.1f} dB"
+    stats_text = f"Moyenne: {df[column].mean():.1f} {unit}\n" \
+                f"Médiane: {df[column].median():.1f} {unit}\n" \
+                f"Min: {df[column].min():.1f} {unit}\n" \
+                f"Max: {df[column].max():.1f} {unit}"
+    
+    if stats_top:
+        ax.text(0.02, 0.98, stats_text, transform=ax.transAxes,
+                verticalalignment='top', bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+    else:
+        ax.text(0.02, 0.02, stats_text, transform=ax.transAxes,
+                verticalalignment='bottom', bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+
+def _draw_taux_livraison(fig, nb_messages, nb_expected, delivery_rate, prefix, max_burst=0):
+    """Dessine l'histogramme messages reçus / perdus d'un fichier"""
+    ax = fig.add_subplot()
+    ax.bar(['Messages reçus', 'Messages perdus'], 
+           [nb_messages, max(0, nb_expected - nb_messages)],
+           color=['green', 'red'])
     
-    plt.gca().text(0.02, 0.98, stats_text, transform=plt.gca().transAxes,
-                  verticalalignment='top', bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+    ax.set_ylabel('Nombre de messages')
+    ax.set_title(f"Taux de livraison - {prefix}\n{delivery_rate:.1f}% ({nb_messages}/{nb_expected})"
+                 f"\nPlus longue rafale de pertes : {max_burst} message(s)")
     
-    # Sauvegarder
-    plt.savefig(os.path.join(output_dir, f"{prefix}snr_par_message.png"), dpi=150, bbox_inches='tight')
-    plt.close()
+    # Afficher les valeurs sur les barres
+    for i, v in enumerate([nb_messages, max(0, nb_expected - nb_messages)]):
+        ax.text(i, v + 1, str(v), ha='center')
     
-    # 2. Graphique RSSI par message
-    plt.figure(figsize=(14, 7))
-    for sf, group in df.groupby('sf'):
-        plt.plot(group['message_id'], group['rssi'], 'o-', label=f'SF{sf} (n={len(group)})', markersize=4, linewidth=1)
+    ax.set_ylim(0, nb_expected * 1.1)
+    fig.tight_layout()
+
+def generate_plots(df, output_dir='graphs', prefix='', render_queue=None, render_workers=1, period=None):
+    """Génère les graphiques à partir du DataFrame
     
-    plt.xlabel("Numéro de séquence du message")
-    plt.ylabel("RSSI (dBm)")
-    plt.title(f"RSSI par Spreading Factor - {prefix}")
-    plt.legend()
-    plt.grid(True, linestyle='--', alpha=0.6)
-    plt.tight_layout()
+    Si render_queue (liste) est fourni, les rendus y sont ajoutés au lieu
+    d'être exécutés immédiatement, voir render_jobs.
     
-    # Ajouter des statistiques
-    stats_text = f"Moyenne: {df['rssi'].mean():.1f} dBm\n" \
-                f"Médiane: {df['rssi'].median():.1f} dBm\n" \
-                f"Min: {df['rssi'].min():.1f} dBm\n" \
-                f"Max: {df['rssi'].max():.1f} dBm"
+    Le nombre de messages attendus est déduit des trous de la séquence
+    reçue (voir loss_accounting) ; period fixe la période d'émission en
+    secondes, estimée à partir des données si elle vaut None.
+    """
+    # Créer le répertoire de sortie s'il n'existe pas
+    os.makedirs(output_dir, exist_ok=True)
     
-    plt.gca().text(0.02, 0.02, stats_text, transform=plt.gca().transAxes,
-                  verticalalignment='bottom', bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+    jobs = []
     
-    # Sauvegarder
-    plt.savefig(os.path.join(output_dir, f"{prefix}rssi_par_message.png"), dpi=150, bbox_inches='tight')
-    plt.close()
+    # 1. Graphique SNR par message
+    jobs.append((os.path.join(output_dir, f"{prefix}snr_par_message.png"),
+                 _draw_metric_par_message, (df, 'snr', 'dB', 'SNR', prefix, True), (14, 7)))
+    
+    # 2. Graphique RSSI par message
+    jobs.append((os.path.join(output_dir, f"{prefix}rssi_par_message.png"),
+                 _draw_metric_par_message, (df, 'rssi', 'dBm', 'RSSI', prefix, False), (14, 7)))
     
     # 3. Taux de livraison - Sauvegarder les données pour le graphique combiné
-    nb_messages = len(df)
-    nb_expected = 200  # Nombre de messages attendus
-    delivery_rate = (nb_messages / nb_expected) * 100
+    pdr_data = file_metrics(df, prefix, period)
     
     # Créer un graphique individuel pour ce fichier
-    plt.figure(figsize=(10, 6))
-    plt.bar(['Messages reçus', 'Messages perdus'], 
-            [nb_messages, max(0, nb_expected - nb_messages)],
-            color=['green', 'red'])
+    jobs.append((os.path.join(output_dir, f"{prefix}taux_livraison.png"),
+                 _draw_taux_livraison,
+                 (pdr_data['messages_received'], pdr_data['messages_expected'], pdr_data['delivery_rate'],
+                  prefix, pdr_data['max_burst']), (10, 6)))
     
-    plt.ylabel('Nombre de messages')
-    plt.title(f"Taux de livraison - {prefix}\n{delivery_rate:.1f}% ({nb_messages}/{nb_expected})")
+    if render_queue is None:
+        render_jobs(jobs, render_workers)
+    else:
+        render_queue.extend(jobs)
     
-    # Afficher les valeurs sur les barres
-    for i, v in enumerate([nb_messages, max(0, nb_expected - nb_messages)]):
-        plt.text(i, v + 1, str(v), ha='center')
+    # Retourner les données pour le graphique combiné
+    return pdr_data
+
+def file_metrics(df, prefix='', period=None):
+    """Taux de livraison d'un fichier, sans graphique (données du graphique combiné du PDR)
     
-    plt.ylim(0, nb_expected * 1.1)
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, f"{prefix}taux_livraison.png"), dpi=150, bbox_inches='tight')
-    plt.close()
+    La taille de payload est extraite de prefix (nom du fichier sans
+    extension) ; period a le même rôle que pour generate_plots.
+    """
+    # Extraire la taille de la payload depuis le préfixe (nom du fichier sans extension)
+    metadata = parse_filename(prefix)
+    payload_size = metadata['payload'] if metadata else 0
+    
+    with profiling.stage('delivery_stats', rows=len(df)):
+        losses = delivery_stats(df, period)
+    print(f"  - Messages perdus: {losses['messages_lost']}/{losses['messages_expected']} "
+          f"({losses['n_bursts']} rafales, la plus longue de {losses['max_burst']} messages)")
     
-    # Retourner les données pour le graphique combiné
     return {
         'payload_size': payload_size,
         'sf': df['sf'].iloc[0] if not df.empty else 0,
-        'messages_received': nb_messages,
-        'delivery_rate': delivery_rate,
+        'messages_received': losses['messages_received'],
+        'messages_expected': losses['messages_expected'],
+        'messages_lost': losses['messages_lost'],
+        'max_burst': losses['max_burst'],
+        'delivery_rate': losses['delivery_rate'],
         'prefix': prefix
     }
 
-def process_file(csv_path, output_dir='graphs'):
-    """Traite un fichier CSV et génère les graphiques"""
+def signal_metrics(df):
+    """Moyenne, minimum et maximum du SNR et du RSSI d'un fichier"""
+    metrics = {}
+    for column in ('snr', 'rssi'):
+        values = df[column]
+        metrics.update({f'{column}_mean': values.mean(), f'{column}_min': values.min(), f'{column}_max': values.max()})
+    return metrics
+
+def combined_metrics(metrics_list):
+    """Totaux de plusieurs fichiers (dicts de file_metrics) : messages, pertes et taux de livraison global"""
+    received = sum(metrics['messages_received'] for metrics in metrics_list)
+    expected = sum(metrics['messages_expected'] for metrics in metrics_list)
+    return {
+        'files': len(metrics_list),
+        'messages_received': received,
+        'messages_expected': expected,
+        'messages_lost': sum(metrics['messages_lost'] for metrics in metrics_list),
+        'max_burst': max((metrics['max_burst'] for metrics in metrics_list), default=0),
+        'delivery_rate': received / expected * 100 if expected else 0.0
+    }
+
+def _metric_value(value):
+    """Valeur native sérialisable en JSON : scalaires numpy convertis, valeurs manquantes à None"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    return None if isinstance(value, float) and value != value else value
+
+def write_metrics(files, combined, output=None):
+    """Écrit les métriques par fichier et combinées (mode --stats-only)
+    
+    En CSV si output se termine par .csv (une ligne par fichier puis une
+    ligne 'ensemble'), en JSON sinon ({"files": [...], "combined": {...}}),
+    sur la sortie standard si output vaut None.
+    """
+    files = [{key: _metric_value(value) for key, value in metrics.items()} for metrics in files]
+    combined = {key: _metric_value(value) for key, value in combined.items()}
+    if output and output.lower().endswith('.csv'):
+        # Types entiers nullables : la ligne 'ensemble' laisse vides les colonnes propres aux fichiers
+        pd.DataFrame(files + [dict(combined, file='ensemble')]).convert_dtypes().to_csv(output, index=False)
+        return
+    document = json.dumps({'files': files, 'combined': combined}, indent=2, ensure_ascii=False)
+    if output is None:
+        print(document)
+        return
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(document + '\n')
+
+def process_file(csv_path, output_dir='graphs', render_workers=1, use_cache=True, period=None,
+                 pdr_window=DEFAULT_PDR_WINDOW, parse_jobs=1, stats_only=False):
+    """Traite un fichier CSV et génère les graphiques
+    
+    Avec use_cache, le DataFrame analysé est relu depuis le cache disque
+    (voir experiment_cache) tant que le fichier source n'a pas changé.
+    parse_jobs répartit l'analyse d'un gros fichier sur plusieurs processus
+    (voir parse_csv_file). Avec le profilage actif (voir profiling), le
+    fichier et son analyse sont mesurés comme des étapes.
+    
+    Avec stats_only, aucun graphique n'est généré (matplotlib n'est pas
+    importé) : les métriques du fichier sont retournées, complétées par
+    son nom et ses statistiques SNR/RSSI (voir signal_metrics).
+    
+    Les messages sont comptés par uplink : les réceptions d'un même uplink
+    par plusieurs passerelles sont fusionnées (voir uplink_dedup) avant le
+    calcul des pertes et les graphiques, qui montrent la meilleure réception.
+    """
     print(f"\nTraitement de {os.path.basename(csv_path)}...")
     
     # Extraire le préfixe du nom de fichier
     filename = os.path.basename(csv_path)
     prefix = os.path.splitext(filename)[0] + '_'
     
-    # Parser le fichier CSV
-    df = parse_csv_file(csv_path)
-    if df is None or df.empty:
-        print("  - Aucune donnée valide trouvée dans le fichier.")
-        return None
-    
-    # Afficher des informations sur les données
-    print(f"  - Fichier: {filename}")
-    print(f"  - Spreading Factor: {df['sf'].iloc[0] if not df.empty else 'N/A'}")
+    with profiling.stage('file', file=filename) as file_info:
+        # Parser le fichier CSV
+        parser = functools.partial(parse_experiment, jobs=parse_jobs)
+        with profiling.stage('parse', file=filename, cached=use_cache) as info:
+            df = load_experiment(csv_path, parser, 'parse_experiment') if use_cache else parser(csv_path)
+            info['rows'] = file_info['rows'] = 0 if df is None else len(df)
+        if df is None or df.empty:
+            print("  - Aucune donnée valide trouvée dans le fichier.")
+            return None
+        
+        # Une ligne par uplink : les réceptions d'un même message par plusieurs passerelles sont fusionnées
+        with profiling.stage('dedup', rows=len(df)):
+            df = deduplicate_uplinks(df)
+        diversity = diversity_summary(df)
+        if diversity['receptions'] > diversity['uplinks']:
+            print(f"  - {diversity['receptions']} réceptions regroupées en {diversity['uplinks']} uplinks "
+                  f"({diversity['mean_gateways']:.2f} passerelles par uplink en moyenne)")
+        
+        # Afficher des informations sur les données
+        print(f"  - Fichier: {filename}")
+        print(f"  - Spreading Factor: {df['sf'].iloc[0] if not df.empty else 'N/A'}")
+        
+        # Extraire la taille de la payload du nom de fichier
+        metadata = parse_filename(filename)
+        if metadata:
+            print(f"  - Taille de la payload: {metadata['payload']} octets")
+        
+        print(f"  - {len(df)} messages valides trouvés")
+        print(f"  - Spreading Factors: {sorted(df['sf'].unique())}")
+        print(f"  - Période: {df['datetime'].min()} à {df['datetime'].max()}")
+        
+        if stats_only:
+            return dict(file_metrics(df, prefix, period), file=filename, receptions=diversity['receptions'],
+                        mean_gateways=diversity['mean_gateways'], **signal_metrics(df))
+        
+        # Les quatre graphiques du fichier sont mis en file puis rendus ensemble
+        render_queue = []
+        
+        # Générer les graphiques temporels pour ce fichier
+        generate_time_series_plots(df, output_dir, prefix, render_queue, period=period, pdr_window=pdr_window)
+        
+        # Générer les autres graphiques et récupérer les données du PDR
+        pdr_data = generate_plots(df, output_dir, prefix, render_queue, period=period)
+        render_jobs(render_queue, render_workers)
+        return pdr_data
+
+def _process_file_logged(csv_path, output_dir='graphs', render_workers=1, use_cache=True, period=None,
+                         pdr_window=DEFAULT_PDR_WINDOW, stats_only=False, profile=False):
+    """Traite un fichier dans un processus de travail et retourne (données PDR, journal, trace)
+    
+    La sortie standard est capturée pour être réémise par le processus
+    principal dans l'ordre des fichiers ; une erreur n'interrompt pas le lot.
+    Avec profile, trace contient les étapes mesurées dans le processus de
+    travail, à fusionner dans la trace principale (voir profiling.collect).
+    """
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log), profiling.collect(profile) as trace:
+        try:
+            pdr_data = process_file(csv_path, output_dir, render_workers, use_cache, period, pdr_window,
+                                    stats_only=stats_only)
+        except Exception as e:
+            print(f"Erreur lors du traitement de {os.path.basename(csv_path)}: {e}")
+            pdr_data = None
+    return pdr_data, log.getvalue(), trace
+
+def _iter_process_files(csv_paths, output_dir='graphs', jobs=1, render_workers=1, use_cache=True,
+                        period=None, pdr_window=DEFAULT_PDR_WINDOW, stats_only=False):
+    """Traite les fichiers et produit leurs données PDR dans l'ordre de csv_paths"""
+    if jobs == 1:
+        for csv_path in csv_paths:
+            try:
+                yield process_file(csv_path, output_dir, render_workers, use_cache, period, pdr_window,
+                                   stats_only=stats_only)
+            except Exception as e:
+                print(f"Erreur lors du traitement de {os.path.basename(csv_path)}: {e}")
+                yield None
+        return
     
-    # Extraire la taille de la payload du nom de fichier
-    payload_match = re.search(r'_(\d+)\.csv$', filename)
-    if payload_match:
-        payload_size = int(payload_match.group(1))
-        print(f"  - Taille de la payload: {payload_size} octets")
+    with ProcessPoolExecutor(max_workers=jobs or None) as executor:
+        futures = [executor.submit(_process_file_logged, csv_path, output_dir, render_workers, use_cache,
+                                   period, pdr_window, stats_only, profiling.active())
+                   for csv_path in csv_paths]
+        # Les résultats sont consommés dans l'ordre de soumission pour un journal déterministe
+        for csv_path, future in zip(csv_paths, futures):
+            try:
+                pdr_data, log, trace = future.result()
+            except Exception as e:
+                pdr_data = None
+                log = f"\nErreur lors du traitement de {os.path.basename(csv_path)}: {e}\n"
+            else:
+                profiling.merge(trace)
+            sys.stdout.write(log)
+            yield pdr_data
+
+def _file_outputs(csv_path):
+    """Noms des quatre graphiques générés pour un fichier CSV"""
+    prefix = os.path.splitext(os.path.basename(csv_path))[0] + '_'
+    return [f"{prefix}{suffix}.png" for suffix in PER_FILE_CHARTS]
+
+def _json_ready(pdr_data):
+    """Convertit les données PDR en types natifs (sérialisables en JSON)"""
+    return {key: value.item() if isinstance(value, np.generic) else value
+            for key, value in pdr_data.items()}
+
+def load_manifest(output_dir='graphs'):
+    """Charge le manifeste de construction incrémentale du dossier de sortie"""
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'files': {}, 'combined': None}
+    return manifest
+
+def save_manifest(manifest, output_dir='graphs'):
+    """Enregistre le manifeste de construction incrémentale"""
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+def _render_params(period=None, pdr_window=DEFAULT_PDR_WINDOW):
+    """Paramètres dont dépendent les graphiques, enregistrés dans le manifeste"""
+    return dict(RENDER_PARAMS, period=period, pdr_window=list(pdr_window))
+
+def _is_up_to_date(csv_path, manifest, output_dir='graphs', params=RENDER_PARAMS):
+    """Retourne l'entrée du manifeste si les graphiques du fichier sont à jour, None sinon"""
+    entry = manifest['files'].get(os.path.abspath(csv_path))
+    if not entry or entry.get('params') != params or not entry.get('pdr'):
+        return None
+    if not all(os.path.exists(os.path.join(output_dir, name)) for name in entry['outputs']):
+        return None
+    matches, fingerprint = fingerprint_matches(csv_path, entry['fingerprint'])
+    if not matches:
+        return None
+    entry['fingerprint'] = fingerprint
+    return entry
+
+def process_directory(directory_path, output_dir='graphs', jobs=1, render_workers=1, use_cache=True,
+                      incremental=False, period=None, pdr_window=DEFAULT_PDR_WINDOW, stats_only=False):
+    """Traite tous les fichiers CSV d'un répertoire et génère un graphique combiné du PDR
     
-    print(f"  - {len(df)} messages valides trouvés")
-    print(f"  - Spreading Factors: {sorted(df['sf'].unique())}")
-    print(f"  - Période: {df['time'].min()} à {df['time'].max()}")
+    Avec jobs > 1 (ou 0 pour tous les cœurs), les fichiers sont répartis sur
+    un pool de processus ; le journal et l'ordre des données PDR restent ceux
+    de l'exécution séquentielle.
     
-    # Générer les graphiques temporels pour ce fichier
-    generate_time_series_plots(df, output_dir, prefix)
+    Avec incremental, un manifeste (empreinte des CSV et paramètres de rendu
+    de chaque graphique) permet de ne régénérer que les graphiques des
+    fichiers modifiés, et le graphique combiné que si un PDR a changé.
     
-    # Générer les autres graphiques et récupérer les données du PDR
-    return generate_plots(df, output_dir, prefix)
-
-def process_directory(directory_path, output_dir='graphs'):
-    """Traite tous les fichiers CSV d'un répertoire et génère un graphique combiné du PDR"""
+    Avec stats_only, aucun graphique n'est généré (voir process_file).
+    Retourne les données PDR (ou métriques) des fichiers, dans leur ordre.
+    """
     print(f"\nTraitement des fichiers dans {directory_path}")
+    incremental = incremental and not stats_only
     
     # Créer le répertoire de sortie s'il n'existe pas
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Liste pour stocker les données de tous les fichiers
-    all_pdr_data = []
+    if not stats_only:
+        os.makedirs(output_dir, exist_ok=True)
     
     # Parcourir tous les fichiers CSV du répertoire
-    for filename in sorted(os.listdir(directory_path)):
-        if filename.endswith('.csv'):
-            file_path = os.path.join(directory_path, filename)
-            pdr_data = process_file(file_path, output_dir)
-            if pdr_data:
-                all_pdr_data.append(pdr_data)
+    csv_paths = [os.path.join(directory_path, filename)
+                 for filename in sorted(os.listdir(directory_path))
+                 if filename.endswith('.csv')]
+    
+    manifest = load_manifest(output_dir) if incremental else None
+    params = _render_params(period, pdr_window)
+    pdr_by_path = {}
+    fingerprints = {}
+    stale_paths = []
+    for csv_path in csv_paths:
+        entry = _is_up_to_date(csv_path, manifest, output_dir, params) if incremental else None
+        if entry:
+            print(f"\n{os.path.basename(csv_path)} : graphiques à jour")
+            pdr_by_path[csv_path] = entry['pdr']
+        else:
+            if incremental:
+                # Empreinte prise avant l'analyse : une modification concurrente sera détectée au prochain passage
+                fingerprints[csv_path] = file_fingerprint(csv_path)
+            stale_paths.append(csv_path)
+    
+    for csv_path, pdr_data in zip(stale_paths,
+                                  _iter_process_files(stale_paths, output_dir, jobs, render_workers, use_cache,
+                                                      period, pdr_window, stats_only)):
+        if not pdr_data:
+            continue
+        pdr_by_path[csv_path] = pdr_data
+        if incremental:
+            manifest['files'][os.path.abspath(csv_path)] = {
+                'fingerprint': fingerprints[csv_path],
+                'params': params,
+                'outputs': _file_outputs(csv_path),
+                'pdr': _json_ready(pdr_data)
+            }
+    
+    # Liste pour stocker les données de tous les fichiers, dans l'ordre des fichiers
+    all_pdr_data = [pdr_by_path[csv_path] for csv_path in csv_paths if csv_path in pdr_by_path]
+    if stats_only:
+        return all_pdr_data
     
     # Générer le graphique combiné du PDR si on a des données
     if all_pdr_data:
-        generate_combined_pdr_plot(all_pdr_data, output_dir)
+        combined = {
+            'directory': os.path.abspath(directory_path),
+            'params': params,
+            'pdr': [_json_ready(pdr_data) for pdr_data in all_pdr_data]
+        }
+        combined_path = os.path.join(output_dir, 'pdr_grouped_barchart.png')
+        if incremental and manifest.get('combined') == combined and os.path.exists(combined_path):
+            print(f"\nHistogramme groupé du PDR à jour : {combined_path}")
+        else:
+            with profiling.stage('combined_pdr', files=len(all_pdr_data)):
+                generate_combined_pdr_plot(all_pdr_data, output_dir)
+            if incremental:
+                manifest['combined'] = combined
+    
+    if incremental:
+        save_manifest(manifest, output_dir)
+    return all_pdr_data
 
 
-def generate_time_series_plots(df, output_dir='graphs', prefix=''):
-    """Génère des graphiques temporels pour SNR, RSSI et PDR avec l'heure en abscisse"""
-    if df is None or df.empty:
-        return
-    
-    # Créer le répertoire de sortie s'il n'existe pas
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # S'assurer que la colonne 'time' est au format datetime
-    if not pd.api.types.is_datetime64_any_dtype(df['time']):
-        df['time'] = pd.to_datetime(df['time'])
-    
-    # Trier les données par temps
-    df = df.sort_values('time')
-    
-    # Extraire la date et l'heure des timestamps
-    date_str = df['time'].dt.strftime('%d/%m/%Y').iloc[0]  # Format: JJ/MM/AAAA
-    df['hour_minute'] = df['time'].dt.strftime('%H:%M')
-    
-    # Créer un titre avec la date
-    title_date = f" - {date_str}"
-    
-    # Calculer le PDR glissant sur une fenêtre de 10 messages
-    window_size = 10
-    df['pdr'] = df.groupby('sf')['message_id'].transform(
-        lambda x: x.rolling(window=window_size, min_periods=1).count() / window_size * 100
-    )
+def _draw_time_series(fig, df, title_date, window_label='10 messages'):
+    """Dessine les trois sous-graphiques SNR, RSSI et PDR glissant en fonction de l'heure"""
+    import matplotlib.dates as mdates
     
     # Créer une figure avec 3 sous-graphiques
-    fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(14, 16), sharex=True)
+    ax1, ax2, ax3 = fig.subplots(3, 1, sharex=True)
     
     # Couleurs pour chaque SF
     colors = {7: '#1f77b4', 9: '#ff7f0e', 12: '#d62728'}
     
+    # Nombre de points utiles par courbe, fonction de la largeur de la figure et non du nombre de lignes
+    budget = pixel_budget(fig, RENDER_PARAMS['dpi'])
+    
     # 1. Graphique SNR
     for sf, group in df.groupby('sf'):
-        ax1.plot(
-            group['hour_minute'], 
+        _plot_decimated(
+            ax1,
+            group['datetime'], 
             group['snr'], 
-            'o-',
+            budget,
+            marker='o',
+            linestyle='-',
             markersize=4,
             linewidth=1,
             color=colors.get(sf, '#000000'),
@@ -306,10 +906,13 @@ def generate_time_series_plots(df, output_dir='graphs', prefix=''):
     
     # 2. Graphique RSSI
     for sf, group in df.groupby('sf'):
-        ax2.plot(
-            group['hour_minute'], 
+        _plot_decimated(
+            ax2,
+            group['datetime'], 
             group['rssi'], 
-            'o-',
+            budget,
+            marker='o',
+            linestyle='-',
             markersize=4,
             linewidth=1,
             color=colors.get(sf, '#000000'),
@@ -324,10 +927,13 @@ def generate_time_series_plots(df, output_dir='graphs', prefix=''):
     
     # 3. Graphique PDR glissant
     for sf, group in df.groupby('sf'):
-        ax3.plot(
-            group['hour_minute'], 
+        _plot_decimated(
+            ax3,
+            group['datetime'], 
             group['pdr'], 
-            'o-',
+            budget,
+            marker='o',
+            linestyle='-',
             markersize=4,
             linewidth=1,
             color=colors.get(sf, '#000000'),
@@ -335,26 +941,71 @@ def generate_time_series_plots(df, output_dir='graphs', prefix=''):
             alpha=0.7
         )
     
-    ax3.set_xlabel('Heure (HH:MM)', fontsize=12)
+    # Axe temporel réel : graduations automatiques, avec la date si la trace dépasse une journée
+    multi_day = df['datetime'].max() - df['datetime'].min() >= pd.Timedelta(days=1)
+    ax3.xaxis.set_major_locator(mdates.AutoDateLocator())
+    ax3.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %H:%M' if multi_day else '%H:%M'))
+    ax3.set_xlabel('Date et heure (JJ/MM HH:MM)' if multi_day else 'Heure (HH:MM)', fontsize=12)
     ax3.set_ylabel('PDR (%)', fontsize=12)
-    ax3.set_title(f'Évolution du PDR (moyenne glissante sur 10 messages) en fonction de l\'heure{title_date}', 
+    ax3.set_title(f'Évolution du PDR (glissant sur {window_label}) en fonction de l\'heure{title_date}', 
                  fontsize=14, pad=15)
     ax3.grid(True, linestyle='--', alpha=0.6)
     ax3.legend()
     
     # Rotation des étiquettes de l'axe des x pour une meilleure lisibilité
-    plt.xticks(rotation=45, ha='right')
+    for label in ax3.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment('right')
     
     # Ajuster l'espacement pour éviter que les étiquettes ne soient coupées
-    plt.subplots_adjust(bottom=0.15)
+    fig.subplots_adjust(bottom=0.15)
     
     # Ajuster l'espacement entre les sous-graphiques
-    plt.tight_layout()
+    fig.tight_layout()
+
+
+def generate_time_series_plots(df, output_dir='graphs', prefix='', render_queue=None, render_workers=1,
+                               period=None, pdr_window=DEFAULT_PDR_WINDOW):
+    """Génère des graphiques temporels pour SNR, RSSI et PDR avec l'heure en abscisse
+    
+    Si render_queue (liste) est fourni, le rendu y est ajouté au lieu
+    d'être exécuté immédiatement, voir render_jobs.
+    
+    Le PDR glissant est calculé sur pdr_window = (taille, 'messages' ou
+    'seconds') messages attendus, voir loss_accounting.rolling_delivery_rate.
+    """
+    if df is None or df.empty:
+        return
+    
+    # Créer le répertoire de sortie s'il n'existe pas
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # S'assurer qu'une colonne 'datetime' est disponible
+    if 'datetime' not in df.columns:
+        df['datetime'] = pd.to_datetime(df['time'])
+    
+    # Trier les données par temps
+    df = df.sort_values('datetime')
+    
+    # Extraire la date des timestamps (l'heure est portée par l'axe temporel)
+    date_str = df['datetime'].iloc[0].strftime('%d/%m/%Y')  # Format: JJ/MM/AAAA
+    
+    # Créer un titre avec la date
+    title_date = f" - {date_str}"
+    
+    # Calculer le PDR glissant : messages reçus parmi les messages attendus de la fenêtre
+    window_size, window_unit = pdr_window
+    with profiling.stage('rolling_pdr', rows=len(df)):
+        df['pdr'] = rolling_delivery_rate(df, window_size, window_unit, period)
+    window_label = f"{window_size:g} messages" if window_unit == 'messages' else f"{window_size:g} s"
     
     # Sauvegarder la figure
     output_path = os.path.join(output_dir, f"{prefix}time_series_metrics.png")
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    plt.close()
+    job = (output_path, _draw_time_series, (df, title_date, window_label), (14, 16))
+    if render_queue is None:
+        render_jobs([job], render_workers)
+    else:
+        render_queue.append(job)
     
     print(f"Graphiques temporels générés : {output_path}")
 
@@ -363,80 +1014,19 @@ def generate_combined_pdr_plot(pdr_data_list, output_dir='graphs'):
     """Génère un histogramme groupé du PDR pour toutes les combinaisons SF et tailles de payload"""
     if not pdr_data_list:
         return
+    plt = _pyplot()
     
     # Créer un DataFrame à partir des données
     df = pd.DataFrame(pdr_data_list)
     
-    # Trier par SF et par taille de payload
-    df = df.sort_values(['sf', 'payload_size'])
+    # Matrice SF x payload construite en un seul pivot (valeurs manquantes : pas de barre)
+    matrix = bar_matrix(df, 'sf', 'payload_size', 'delivery_rate')
     
     # Créer une figure plus large pour une meilleure lisibilité
     plt.figure(figsize=(16, 9))
     
-    # Définir les positions des barres pour chaque groupe
-    sf_values = sorted(df['sf'].unique())
-    payload_sizes = sorted(df['payload_size'].unique())
-    
-    # Largeur d'une barre
-    bar_width = 0.25
-    
-    # Position des ticks sur l'axe X
-    x = np.arange(len(sf_values))
-    
-    # Couleurs et motifs pour chaque taille de payload
-    colors = {
-        20: '#1f77b4',  # Bleu
-        50: '#ff7f0e',   # Orange
-        80: '#d62728'    # Rouge
-    }
-    
-    # Motifs de hachurage pour une meilleure différenciation
-    patterns = {
-        20: None,       # Pas de motif
-        50: '////',     # Hachures diagonales
-        80: '..'        # Pointillés
-    }
-    
-    # Pour chaque taille de payload, créer un groupe de barres
-    for i, payload in enumerate(payload_sizes):
-        # Récupérer les valeurs de PDR pour cette taille de payload
-        pdr_values = []
-        for sf in sf_values:
-            mask = (df['sf'] == sf) & (df['payload_size'] == payload)
-            if mask.any():
-                pdr_values.append(df.loc[mask, 'delivery_rate'].values[0])
-            else:
-                pdr_values.append(0)
-        
-        # Calculer la position de chaque barre dans le groupe
-        x_pos = x + (i * bar_width) - (bar_width * (len(payload_sizes) - 1) / 2)
-        
-        # Créer les barres pour cette taille de payload
-        bars = plt.bar(
-            x_pos, 
-            pdr_values, 
-            width=bar_width,
-            label=f'{payload} octets',
-            color=colors.get(payload, '#8c564b'),  # Couleur par défaut si taille non reconnue
-            edgecolor='black',
-            linewidth=0.7,
-            alpha=0.8,
-            hatch=patterns.get(payload, None)  # Ajout du motif de hachurage
-        )
-        
-        # Ajouter les étiquettes de valeur au-dessus de chaque barre
-        for bar, value in zip(bars, pdr_values):
-            if value > 0:  # Ne pas afficher d'étiquette pour les valeurs nulles
-                height = bar.get_height()
-                plt.text(
-                    bar.get_x() + bar.get_width() / 2.,
-                    height + 1,  # Légèrement au-dessus de la barre
-                    f'{value:.1f}%',
-                    ha='center',
-                    va='bottom',
-                    fontsize=9,
-                    fontweight='bold'
-                )
+    # Une série de barres par taille de payload, quel que soit leur nombre
+    draw_grouped_bars(plt.gca(), matrix, series_label='{} octets', group_label='SF{}')
     
     # Configurer le graphique
     plt.title('Taux de livraison (PDR) par Spreading Factor et taille de payload', 
@@ -444,9 +1034,6 @@ def generate_combined_pdr_plot(pdr_data_list, output_dir='graphs'):
     plt.xlabel('Spreading Factor (SF)', fontsize=12, labelpad=10)
     plt.ylabel('Taux de livraison (%)', fontsize=12, labelpad=10)
     
-    # Définir les étiquettes de l'axe X (SF)
-    plt.xticks(x, [f'SF{int(sf)}' for sf in sf_values])
-    
     # Ajouter une grille pour une meilleure lisibilité
     plt.grid(axis='y', linestyle='--', alpha=0.7)
     
@@ -491,24 +1078,100 @@ def generate_combined_pdr_plot(pdr_data_list, output_dir='graphs'):
     
     # Sauvegarder le graphique en haute résolution
     output_path = os.path.join(output_dir, 'pdr_grouped_barchart.png')
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    with profiling.stage('savefig', chart=os.path.basename(output_path)):
+        plt.savefig(output_path, dpi=RENDER_PARAMS['dpi'], bbox_inches='tight')
     plt.close()
     
     print(f"\nHistogramme groupé du PDR généré : {output_path}")
 
+def parse_window(text):
+    """Convertit une fenêtre de PDR '10' ou '300s' en (taille, unité)"""
+    text = text.strip().lower()
+    unit = 'seconds' if text.endswith('s') else 'messages'
+    try:
+        size = float(text.rstrip('s'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Fenêtre invalide : {text} (ex: 10 ou 300s)")
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"La fenêtre doit être positive : {text}")
+    return (size, unit)
+
+def parse_workers(text):
+    """Convertit un nombre de processus ou de threads en entier positif ou nul (0 = automatique)"""
+    try:
+        workers = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Nombre invalide : {text} (ex: 4, ou 0 = automatique)")
+    if workers < 0:
+        raise argparse.ArgumentTypeError(f"Le nombre doit être positif ou nul (0 = automatique) : {text}")
+    return workers
+
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python analyse_csv_lorawan.py <chemin_vers_fichier_ou_dossier>")
-        print("Exemple: python analyse_csv_lorawan.py Data/Max/")
-        sys.exit(1)
-    
-    path = sys.argv[1]
+    parser = argparse.ArgumentParser(
+        description="Analyse des fichiers CSV LoRaWAN",
+        epilog="Exemple: python analyse_csv_lorawan.py Data/Max/ --jobs 8"
+    )
+    parser.add_argument('path', help="Fichier .csv ou dossier contenant des fichiers .csv")
+    parser.add_argument('--jobs', '-j', type=parse_workers, default=1,
+                        help="Nombre de processus pour traiter un dossier, ou pour analyser un seul "
+                             "gros fichier par plages d'octets (0 = tous les cœurs)")
+    parser.add_argument('--render-workers', type=parse_workers, default=1,
+                        help="Nombre de threads de rendu des graphiques par fichier (0 = automatique)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Ignorer le cache des fichiers déjà analysés")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Ne régénérer que les graphiques des fichiers modifiés")
+    parser.add_argument('--pdr-window', type=parse_window, default=DEFAULT_PDR_WINDOW,
+                        help="Fenêtre du PDR glissant : nombre de messages (ex: 10) "
+                             "ou durée en secondes (ex: 300s)")
+    parser.add_argument('--period', type=float, default=None,
+                        help="Période d'émission en secondes pour le calcul des pertes "
+                             "(défaut : estimée à partir des données)")
+    parser.add_argument('--follow', '-f', action='store_true',
+                        help="Suivre un fichier en cours d'écriture : seules les lignes ajoutées sont "
+                             "analysées, statistiques et graphique temporel mis à jour en continu")
+    parser.add_argument('--refresh', type=float, default=10.0,
+                        help="Avec --follow, intervalle minimal en secondes entre deux rendus (défaut: 10)")
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help="Avec --follow, arrêter après N secondes sans nouvelle ligne")
+    parser.add_argument('--stats-only', action='store_true',
+                        help="Calculer seulement les métriques par fichier et combinées, sans graphique "
+                             "(matplotlib n'est pas importé)")
+    parser.add_argument('--output', '-o',
+                        help="Avec --stats-only, fichier de sortie des métriques (.csv ou .json ; "
+                             "défaut: JSON sur la sortie standard)")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.setup(args)
+    
+    path = args.path
     output_dir = 'graphs'
     
-    if os.path.isdir(path):
-        process_directory(path, output_dir)
-    elif os.path.isfile(path) and path.lower().endswith('.csv'):
-        process_file(path, output_dir)
-    else:
-        print("Le chemin doit être un fichier .csv ou un dossier contenant des fichiers .csv")
+    if args.follow and args.stats_only:
+        print("--follow et --stats-only sont incompatibles")
         sys.exit(1)
+    
+    # Métriques sur la sortie standard : le journal est renvoyé sur la sortie d'erreur
+    log = sys.stderr if args.stats_only and not args.output else sys.stdout
+    with contextlib.redirect_stdout(log):
+        if args.follow:
+            if not os.path.isfile(path):
+                print("--follow nécessite un fichier .csv")
+                sys.exit(1)
+            # Import différé : live_tail dépend de ce module
+            from live_tail import follow_file
+            follow_file(path, output_dir, refresh_interval=args.refresh, period=args.period,
+                        pdr_window=args.pdr_window, idle_timeout=args.idle_timeout)
+        elif os.path.isdir(path):
+            results = process_directory(path, output_dir, args.jobs, args.render_workers, not args.no_cache,
+                                        args.incremental, args.period, args.pdr_window, args.stats_only)
+        elif os.path.isfile(path) and path.lower().endswith('.csv'):
+            results = [process_file(path, output_dir, args.render_workers, not args.no_cache, args.period,
+                                    args.pdr_window, args.jobs or os.cpu_count(), args.stats_only)]
+        else:
+            print("Le chemin doit être un fichier .csv ou un dossier contenant des fichiers .csv")
+            sys.exit(1)
+    
+    if args.stats_only:
+        metrics = [result for result in results if result]
+        write_metrics(metrics, combined_metrics(metrics), args.output)
@@ -82,33 +82,91 @@
 # print(" - taux_livraison.png")
 
 import json
+import gzip
 import os
+import contextlib
+import argparse
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import sys
 
-# Vérifie qu’un argument est bien passé
-if len(sys.argv) != 2:
-    print("Usage : python analyse_lorawan.py <fichier_json>")
-    sys.exit(1)
-
-json_file = sys.argv[1]
-
-# Charger les données JSON
-with open(json_file, 'r') as f:
-    data = json.load(f)
-
-# Convertir en DataFrame
-df = pd.DataFrame(data)
-
-# Extraire le message_id depuis _id
-df['message_id'] = df['_id'].apply(lambda x: x['$oid'])
-
-# Extraire le spreading factor depuis datarate (ex : "SF12BW125" -> "SF12")
-df['spreading_factor'] = df['datarate'].apply(lambda x: x.split('BW')[0])
-
-# Trier les messages dans l'ordre d'apparition (optionnel)
-df = df.sort_values('message_id').reset_index(drop=True)
+from loss_accounting import delivery_stats
+from uplink_dedup import deduplicate_uplinks
+# pyplot est importé à la première utilisation (backend sans affichage) : --stats-only ne charge pas matplotlib
+from analyse_csv_lorawan import _pyplot, signal_metrics, combined_metrics, write_metrics
+import profiling
+
+try:
+    import orjson
+except ImportError:  # repli sur le module json standard
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # lecture des fichiers .zst indisponible
+    zstandard = None
+
+def _loads(data):
+    """Décode un document JSON avec orjson s'il est disponible"""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _read_bytes(json_file):
+    """Lit le contenu brut d'un export, décompressé s'il se termine par .gz ou .zst"""
+    if json_file.endswith('.gz'):
+        with gzip.open(json_file, 'rb') as f:
+            return f.read()
+    if json_file.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("Le module zstandard est requis pour lire les fichiers .zst (pip install zstandard)")
+        with open(json_file, 'rb') as f:
+            return zstandard.ZstdDecompressor().stream_reader(f).read()
+    with open(json_file, 'rb') as f:
+        return f.read()
+
+def load_json_records(json_file):
+    """Charge un export JSON (tableau) ou NDJSON en DataFrame typé
+    
+    - message_id : entier extrait de _id.$oid (chaîne si les identifiants
+      ne sont pas numériques, ex: ObjectId MongoDB)
+    - spreading_factor : catégorie extraite du datarate (ex: SF12BW125 -> SF12)
+    """
+    raw = _read_bytes(json_file)
+    if raw.lstrip()[:1] == b'[':
+        records = _loads(raw)
+    else:
+        # NDJSON : un enregistrement par ligne
+        records = [_loads(line) for line in raw.splitlines() if line.strip()]
+    del raw
+    
+    df = pd.DataFrame.from_records(records)
+    del records
+    
+    # Extraire le message_id depuis _id en une passe, puis le typer en entier
+    oids = df.pop('_id').str.get('$oid')
+    numeric_ids = pd.to_numeric(oids, errors='coerce')
+    df['message_id'] = numeric_ids.astype(np.int64) if numeric_ids.notna().all() else oids
+    
+    # Extraire le spreading factor depuis datarate (ex : "SF12BW125" -> "SF12"),
+    # calculé une seule fois par datarate distinct
+    codes, datarates = pd.factorize(df['datarate'])
+    spreading_factors = np.array([dr.split('BW')[0] for dr in datarates], dtype=object)
+    df['spreading_factor'] = pd.Categorical(spreading_factors[codes])
+    
+    return df
+
+
+# Graphiques produits pour chaque export, avec leur nom de fichier
+CHART_NAMES = ('snr_par_sf.png', 'rssi_par_sf.png', 'taux_livraison.png')
+
+JSON_EXTENSIONS = ('.json', '.ndjson', '.json.gz', '.ndjson.gz', '.json.zst', '.ndjson.zst')
+
+def export_stem(json_file):
+    """Nom d'un export sans ses extensions (ex: exp.ndjson.gz -> exp)"""
+    name = os.path.basename(json_file)
+    for extension in sorted(JSON_EXTENSIONS, key=len, reverse=True):
+        if name.endswith(extension):
+            return name[:-len(extension)]
+    return os.path.splitext(name)[0]
 
 # Fonction pour ajouter des statistiques au graphique
 def add_stats(ax, values, xpos=0.02, ypos=0.98):
@@ -119,89 +177,209 @@ def add_stats(ax, values, xpos=0.02, ypos=0.98):
     ax.text(xpos, ypos, stats, transform=ax.transAxes, 
             verticalalignment='top', bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
 
-# === 1. Graphique SNR par message_id ===
-plt.figure(figsize=(14, 7))
-ax = plt.gca()
-
-# Tracer chaque groupe de SF
-for sf, group in df.groupby('spreading_factor'):
-    # Convertir les message_id en numéros de séquence
-    x = range(1, len(group) + 1)
-    plt.plot(x, group['snr'], 'o-', label=f'{sf} (n={len(group)})', markersize=4, linewidth=1)
-
-plt.xticks(rotation=45, fontsize=8)
-plt.xlabel("Numéro de séquence du message")
-plt.ylabel("SNR (dB)")
-plt.title(f"SNR par Spreading Factor - {os.path.basename(json_file)}")
-plt.legend()
-plt.grid(True, linestyle='--', alpha=0.6)
-plt.tight_layout()
-
-# Ajouter des statistiques globales
-add_stats(ax, df['snr'])
-
-# Sauvegarder avec une meilleure résolution
-plt.savefig("snr_par_sf.png", dpi=150, bbox_inches='tight')
-plt.close()
-
-# === 2. Graphique RSSI par message_id ===
-plt.figure(figsize=(14, 7))
-ax = plt.gca()
-
-for sf, group in df.groupby('spreading_factor'):
-    x = range(1, len(group) + 1)
-    plt.plot(x, group['rssi'], 'o-', label=f'{sf} (n={len(group)})', markersize=4, linewidth=1)
-
-plt.xticks(rotation=45, fontsize=8)
-plt.xlabel("Numéro de séquence du message")
-plt.ylabel("RSSI (dBm)")
-plt.title(f"RSSI par Spreading Factor - {os.path.basename(json_file)}")
-plt.legend()
-plt.grid(True, linestyle='--', alpha=0.6)
-plt.tight_layout()
-
-# Ajouter des statistiques
-add_stats(ax, df['rssi'])
-
-plt.savefig("rssi_par_sf.png", dpi=150, bbox_inches='tight')
-plt.close()
-
-# === 3. Taux de livraison ===
-nb_total_messages = 200
-group_size = 10
-
-# Calculer le taux de livraison cumulatif
-df_sorted = df.sort_values('time')
-delivery_rates = []
-x_axis = []
-
-for i in range(1, len(df_sorted) + 1):
-    rate = (i / nb_total_messages) * 100  # en pourcentage
-    delivery_rates.append(rate)
-    x_axis.append(i)
-
-# Tracer le taux de livraison cumulatif
-plt.figure(figsize=(12, 6))
-plt.plot(x_axis, delivery_rates, 'b-', linewidth=2, label='Taux de livraison')
-plt.axhline(y=100, color='r', linestyle='--', label='100% de livraison')
-plt.axvline(x=len(df), color='g', linestyle='--', alpha=0.5, label=f'Messages reçus: {len(df)}')
-
-plt.xlabel("Nombre de messages reçus")
-plt.ylabel("Taux de livraison (%)")
-plt.title(f"Taux de Livraison de Paquets - {os.path.basename(json_file)}")
-plt.legend()
-plt.grid(True, linestyle='--', alpha=0.6)
-plt.tight_layout()
-
-# Afficher le taux de livraison final
-plt.text(0.02, 0.12, f"Taux final: {delivery_rates[-1]:.1f}%\n"
-                     f"Messages reçus: {len(df)}/{nb_total_messages}",
-         transform=plt.gca().transAxes, bbox=dict(facecolor='white', alpha=0.8))
-
-plt.savefig("taux_livraison.png", dpi=150, bbox_inches='tight')
-plt.close()
-
-print("✅ Graphiques générés :")
-print(" - snr_par_sf.png")
-print(" - rssi_par_sf.png")
-print(" - taux_livraison.png")
\ No newline at end of file
+def plot_metric_par_sf(df, metric, ylabel, title, output_path):
+    """Trace une métrique (snr ou rssi) par Spreading Factor en fonction du numéro de séquence"""
+    plt = _pyplot()
+    plt.figure(figsize=(14, 7))
+    ax = plt.gca()
+    
+    # Tracer chaque groupe de SF
+    for sf, group in df.groupby('spreading_factor', observed=True):
+        # Convertir les message_id en numéros de séquence
+        x = range(1, len(group) + 1)
+        plt.plot(x, group[metric], 'o-', label=f'{sf} (n={len(group)})', markersize=4, linewidth=1)
+    
+    plt.xticks(rotation=45, fontsize=8)
+    plt.xlabel("Numéro de séquence du message")
+    plt.ylabel(ylabel)
+    plt.title(title)
+    plt.legend()
+    plt.grid(True, linestyle='--', alpha=0.6)
+    plt.tight_layout()
+    
+    # Ajouter des statistiques globales
+    add_stats(ax, df[metric])
+    
+    # Sauvegarder avec une meilleure résolution
+    with profiling.stage('savefig', chart=os.path.basename(output_path)):
+        plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close()
+
+def plot_taux_livraison(df, title, output_path, nb_total_messages):
+    """Trace le taux de livraison cumulatif, nb_total_messages étant le nombre de messages attendus"""
+    plt = _pyplot()
+    # Calculer le taux de livraison cumulatif
+    x_axis = np.arange(1, len(df) + 1)
+    delivery_rates = x_axis / nb_total_messages * 100  # en pourcentage
+    
+    # Tracer le taux de livraison cumulatif
+    plt.figure(figsize=(12, 6))
+    plt.plot(x_axis, delivery_rates, 'b-', linewidth=2, label='Taux de livraison')
+    plt.axhline(y=100, color='r', linestyle='--', label='100% de livraison')
+    plt.axvline(x=len(df), color='g', linestyle='--', alpha=0.5, label=f'Messages reçus: {len(df)}')
+    
+    plt.xlabel("Nombre de messages reçus")
+    plt.ylabel("Taux de livraison (%)")
+    plt.title(title)
+    plt.legend()
+    plt.grid(True, linestyle='--', alpha=0.6)
+    plt.tight_layout()
+    
+    # Afficher le taux de livraison final
+    plt.text(0.02, 0.12, f"Taux final: {delivery_rates[-1]:.1f}%\n"
+                         f"Messages reçus: {len(df)}/{nb_total_messages}",
+             transform=plt.gca().transAxes, bbox=dict(facecolor='white', alpha=0.8))
+    
+    with profiling.stage('savefig', chart=os.path.basename(output_path)):
+        plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close()
+
+def analyse_json(json_file, output_dir='.', prefix='', period=None):
+    """Analyse un export JSON/NDJSON et écrit ses trois graphiques dans output_dir
+    
+    Les fichiers sont nommés prefix + snr_par_sf.png, rssi_par_sf.png et
+    taux_livraison.png. Le nombre de messages attendus est déduit des trous
+    de la séquence reçue (voir loss_accounting), avec la période d'émission
+    period en secondes ou estimée si None. Retourne la liste des chemins écrits.
+    """
+    # Charger les données JSON (tableau ou NDJSON, éventuellement compressé), un message par uplink
+    df = load_uplinks(json_file)
+    if df.empty:
+        print(f"Aucun message dans {json_file}")
+        return []
+    
+    # Trier les messages dans l'ordre d'apparition (optionnel)
+    df = df.sort_values('message_id').reset_index(drop=True)
+    
+    os.makedirs(output_dir, exist_ok=True)
+    snr_path, rssi_path, pdr_path = [os.path.join(output_dir, prefix + name) for name in CHART_NAMES]
+    name = os.path.basename(json_file)
+    
+    # === 1. Graphique SNR par message_id ===
+    plot_metric_par_sf(df, 'snr', "SNR (dB)", f"SNR par Spreading Factor - {name}", snr_path)
+    
+    # === 2. Graphique RSSI par message_id ===
+    plot_metric_par_sf(df, 'rssi', "RSSI (dBm)", f"RSSI par Spreading Factor - {name}", rssi_path)
+    
+    # === 3. Taux de livraison ===
+    losses = export_losses(df, period)
+    print(f"  - Messages perdus: {losses['messages_lost']}/{losses['messages_expected']} "
+          f"(plus longue rafale : {losses['max_burst']})")
+    plot_taux_livraison(df.sort_values('time'), f"Taux de Livraison de Paquets - {name}", pdr_path,
+                        losses['messages_expected'])
+    
+    return [snr_path, rssi_path, pdr_path]
+
+def load_uplinks(json_file):
+    """Charge un export (voir load_json_records) avec une ligne par uplink
+    
+    Les réceptions d'un même uplink par plusieurs passerelles sont fusionnées
+    (voir uplink_dedup) : la meilleure est conservée, avec les colonnes
+    gateways et receptions.
+    """
+    with profiling.stage('load', file=os.path.basename(json_file)) as info:
+        df = load_json_records(json_file)
+        info['rows'] = len(df)
+    if df.empty:
+        return df
+    with profiling.stage('datetime', rows=len(df)):
+        df['datetime'] = pd.to_datetime(df['time'])
+    with profiling.stage('dedup', rows=len(df)):
+        return deduplicate_uplinks(df, key_cols=('node_eui', 'spreading_factor'))
+
+def export_losses(df, period=None):
+    """Pertes d'un export chargé par load_uplinks, par nœud et par SF (voir loss_accounting)"""
+    with profiling.stage('delivery_stats', rows=len(df)):
+        return delivery_stats(df, period, group_cols=('node_eui', 'spreading_factor'))
+
+def json_metrics(json_file, period=None):
+    """Métriques d'un export sans graphique : messages, pertes, taux de livraison et SNR/RSSI
+    
+    Retourne None si l'export est vide.
+    """
+    df = load_uplinks(json_file)
+    if df.empty:
+        print(f"Aucun message dans {json_file}")
+        return None
+    losses = export_losses(df, period)
+    metrics = {'file': os.path.basename(json_file)}
+    metrics.update({key: losses[key] for key in ('messages_received', 'messages_expected', 'messages_lost',
+                                                 'max_burst', 'delivery_rate')})
+    metrics.update(signal_metrics(df))
+    return metrics
+
+def find_json_files(paths):
+    """Développe une liste de fichiers et de dossiers en exports JSON/NDJSON triés"""
+    json_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            json_files.extend(sorted(os.path.join(path, f) for f in os.listdir(path)
+                                     if f.endswith(JSON_EXTENSIONS)))
+        elif os.path.isfile(path):
+            json_files.append(path)
+        else:
+            print(f"Chemin introuvable ignoré : {path}")
+    return json_files
+
+def analyse_batch(json_files, output_dir, period=None):
+    """Analyse plusieurs exports dans le même processus
+    
+    Les graphiques de chaque export sont préfixés par son nom
+    (ex: graphs/exp_snr_par_sf.png) pour ne pas s'écraser entre eux.
+    Une erreur sur un fichier n'interrompt pas le lot.
+    """
+    outputs = {}
+    for json_file in json_files:
+        print(f"  Analyse de {json_file}")
+        try:
+            with profiling.stage('file', file=os.path.basename(json_file)):
+                outputs[json_file] = analyse_json(json_file, output_dir, export_stem(json_file) + '_', period)
+        except Exception as e:
+            print(f"Erreur lors de l'analyse de {json_file}: {e}")
+    return outputs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Analyse des exports JSON/NDJSON LoRaWAN",
+        epilog="Exemple: python analyse_lorawan.py Data/Max/json Data/Min/json --output-dir graphs"
+    )
+    parser.add_argument('paths', nargs='+',
+                        help="Fichiers JSON/NDJSON ou dossiers contenant des exports")
+    parser.add_argument('--output-dir', '-o', default=None,
+                        help="Dossier de sortie des graphiques (défaut : dossier courant)")
+    parser.add_argument('--period', type=float, default=None,
+                        help="Période d'émission en secondes pour le calcul des pertes "
+                             "(défaut : estimée à partir des données)")
+    parser.add_argument('--stats-only', action='store_true',
+                        help="Calculer seulement les métriques par export et combinées, sans graphique "
+                             "(matplotlib n'est pas importé)")
+    parser.add_argument('--output', default=None,
+                        help="Avec --stats-only, fichier de sortie des métriques (.csv ou .json ; "
+                             "défaut: JSON sur la sortie standard)")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.setup(args)
+    
+    if args.stats_only:
+        json_files = find_json_files(args.paths)
+        metrics = []
+        for json_file in json_files:
+            # Journal sur la sortie d'erreur : la sortie standard peut porter les métriques
+            with contextlib.redirect_stdout(sys.stderr):
+                metrics.append(json_metrics(json_file, args.period))
+        metrics = [entry for entry in metrics if entry]
+        write_metrics(metrics, combined_metrics(metrics), args.output)
+    elif len(args.paths) == 1 and os.path.isfile(args.paths[0]):
+        # Un seul fichier : noms de graphiques historiques, sans préfixe
+        output_paths = analyse_json(args.paths[0], args.output_dir or '.', period=args.period)
+        print("✅ Graphiques générés :")
+        for output_path in output_paths:
+            print(f" - {output_path}")
+    else:
+        json_files = find_json_files(args.paths)
+        if not json_files:
+            print("Aucun export JSON trouvé")
+            sys.exit(1)
+        outputs = analyse_batch(json_files, args.output_dir or '.', args.period)
+        print(f"✅ {sum(len(paths) for paths in outputs.values())} graphiques générés "
+              f"pour {len(outputs)}/{len(json_files)} exports")
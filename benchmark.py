@@ -0,0 +1,317 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import contextlib
+import numpy as np
+import pandas as pd
+
+import analyse_csv_lorawan
+import convert_csv_to_json
+import generate_summary_report
+
+
+HEADER = 'type;gateway_eui;node_eui;snr;rssi;cr;datarate;time;data,,\n'
+
+# Étapes mesurées par bench_stages, dans l'ordre d'exécution
+STAGES = ('parse_csv_file', 'convert_csv_to_json', 'analyze_data_files',
+          'generate_time_series_plots', 'generate_plots', 'generate_combined_pdr_plot')
+
+# Ralentissement relatif au-delà duquel --compare signale une régression
+REGRESSION_TOLERANCE = 0.2
+
+
+def generate_csv(path, rows, sf=7, malformed_rate=0.0, seed=0, nodes=1, sfs=None):
+    """Écrit un fichier CSV synthétique au format des exports de la passerelle (Data/Max)
+
+    Les lignes sont réparties à tour de rôle entre `nodes` nœuds et les SF de
+    `sfs` (par défaut le seul `sf`), chaque flux émettant toutes les 8 s.
+    Une fraction `malformed_rate` des lignes est volontairement invalide :
+    lignes tronquées, SNR non entier avec repli sur le JSON, ou RSSI absent.
+    """
+    rng = random.Random(seed)
+    t0 = pd.Timestamp('2025-06-07 10:00:00').timestamp()
+    sfs = sfs or (sf,)
+    node_euis = [f"{16 + k:X}" for k in range(nodes)]
+    streams = nodes * len(sfs)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(HEADER)
+        chunk = []
+        for i in range(rows):
+            ts = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(t0 + i * 8 / streams))
+            node = node_euis[i % nodes]
+            datarate = f"SF{sfs[(i // nodes) % len(sfs)]}BW500"
+            snr = rng.randint(-20, 12)
+            rssi = rng.randint(-130, -30)
+            line = (f'"16;0000B827EB24A52C;{node};{snr};{rssi};5;{datarate};{ts};'
+                    f'{{""RSSI"": {rssi}"," ""SNR"": {snr}"," ""TC"": ""27.50..........""}};"\n')
+
+            if malformed_rate and rng.random() < malformed_rate:
+                kind = rng.randrange(3)
+                if kind == 0:
+                    # Ligne tronquée
+                    line = f'"16;0000B827EB24A52C;{node};{snr}"\n'
+                elif kind == 1:
+                    # SNR décimal : repli sur le champ JSON
+                    line = (f'"16;0000B827EB24A52C;{node};{snr}.5;{rssi};5;{datarate};{ts};'
+                            f'{{"RSSI": {rssi}, "SNR": {snr}}}"\n')
+                else:
+                    # RSSI absent, introuvable dans le JSON
+                    line = f'"16;0000B827EB24A52C;{node};{snr};;5;{datarate};{ts};{{}}"\n'
+
+            chunk.append(line)
+            if len(chunk) >= 100000:
+                f.writelines(chunk)
+                chunk = []
+        f.writelines(chunk)
+
+
+def legacy_parse_csv_file(csv_path):
+    """Ancienne implémentation ligne par ligne de parse_csv_file, conservée comme référence"""
+    data = []
+    errors = []
+
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        f.readline()
+
+        for line_num, line in enumerate(f, 2):
+            try:
+                line = line.strip()
+                if not line:
+                    continue
+
+                parts = line.strip('"').split(';')
+                if len(parts) < 8:
+                    errors.append(f"Ligne {line_num} ignorée: pas assez de champs")
+                    continue
+
+                data_str = ';'.join(parts[8:]) if len(parts) > 8 else ''
+
+                rssi = int(parts[4]) if parts[4].lstrip('-').isdigit() else None
+                snr = int(parts[3]) if parts[3].lstrip('-').isdigit() else None
+
+                if rssi is None or snr is None:
+                    rssi_match = re.search(r'"RSSI"\s*:\s*(-?\d+)', data_str)
+                    snr_match = re.search(r'"SNR"\s*:\s*(-?\d+)', data_str)
+
+                    if rssi_match:
+                        rssi = int(rssi_match.group(1))
+                    if snr_match:
+                        snr = int(snr_match.group(1))
+
+                if rssi is None or snr is None:
+                    errors.append(f"Ligne {line_num}: Impossible d'extraire RSSI ou SNR")
+                    continue
+
+                sf_match = re.search(r'SF(\d+)', parts[6])
+                sf = int(sf_match.group(1)) if sf_match else 0
+
+                data.append({
+                    'message_id': len(data) + 1,
+                    'time': parts[7],
+                    'rssi': rssi,
+                    'snr': snr,
+                    'sf': sf,
+                    'datarate': parts[6],
+                    'cr': int(parts[5]) if parts[5].isdigit() else 5,
+                    'node_eui': parts[2],
+                    'gateway_eui': parts[1]
+                })
+
+            except Exception as e:
+                errors.append(f"Erreur ligne {line_num}: {e}")
+                continue
+
+    if not data:
+        return None
+
+    df = pd.DataFrame(data)
+    df['datetime'] = pd.to_datetime(df['time'])
+    return df.sort_values('datetime')
+
+
+def timed(func, *args):
+    """Exécute func en silence et retourne (résultat, durée en secondes)"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+    return result, elapsed
+
+
+def dataset_path(workdir, rows, nodes=1, sfs=(7,), malformed_rate=0.01):
+    """Chemin du jeu synthétique d'une taille donnée, généré au besoin
+
+    Chaque jeu est rangé dans son propre dossier, nommé d'après ses
+    paramètres, pour pouvoir être indexé seul par analyze_data_files.
+    """
+    directory = os.path.join(workdir, f"rows{rows}_nodes{nodes}_sf{'-'.join(map(str, sfs))}_err{malformed_rate:g}")
+    path = os.path.join(directory, f"synthetic_SF{sfs[0]}_BW500_CR5_{rows}_20.csv")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        print(f"Génération de {path} ({rows} lignes)...")
+        generate_csv(path, rows, malformed_rate=malformed_rate, nodes=nodes, sfs=sfs)
+    return path
+
+
+def bench_parse(path, rows, legacy=True, jobs=1):
+    """Compare l'ingestion vectorisée à l'ancienne boucle ligne par ligne (et à l'analyse par plages si jobs > 1)"""
+    df, t_vec = timed(analyse_csv_lorawan.parse_csv_file, path)
+    print(f"  - parse_csv_file (vectorisé) : {t_vec:.2f} s ({rows / t_vec:,.0f} lignes/s)")
+
+    if legacy:
+        df_ref, t_ref = timed(legacy_parse_csv_file, path)
+        print(f"  - boucle ligne par ligne     : {t_ref:.2f} s ({rows / t_ref:,.0f} lignes/s)")
+        print(f"  - accélération               : x{t_ref / t_vec:.1f}")
+        pd.testing.assert_frame_equal(df, df_ref)
+        print("  - DataFrames identiques")
+
+    if jobs > 1:
+        df_par, t_par = timed(analyse_csv_lorawan.parse_csv_file, path, jobs)
+        print(f"  - plages en parallèle ({jobs}) : {t_par:.2f} s ({rows / t_par:,.0f} lignes/s)")
+        pd.testing.assert_frame_equal(df, df_par)
+
+    return df
+
+
+def bench_memory(df):
+    """Mesure l'empreinte mémoire d'une expérience avant et après passage au schéma compact"""
+    compact, t_compact = timed(analyse_csv_lorawan.compact_experiment, df)
+    print(f"  - compact_experiment : {t_compact:.2f} s")
+    analyse_csv_lorawan.memory_report(df, compact)
+
+
+def bench_stages(path, rows, output_dir, stages=STAGES):
+    """Chronomètre séparément chaque étape du pipeline sur un fichier, sans cache
+
+    Les graphiques sont écrits dans output_dir et la conversion JSON dans un
+    fichier temporaire du même dossier. Retourne une ligne de résultats
+    (étape, durée, lignes/s) par étape mesurée.
+    """
+    prefix = os.path.splitext(os.path.basename(path))[0] + '_'
+    json_path = os.path.join(output_dir, prefix + 'bench.json')
+    results = []
+
+    def record(stage, func, *args):
+        result, elapsed = timed(func, *args)
+        results.append({'rows': rows, 'stage': stage, 'seconds': elapsed,
+                        'rows_per_s': rows / elapsed if elapsed else None})
+        print(f"  - {stage:<27}: {elapsed:.2f} s ({rows / elapsed:,.0f} lignes/s)")
+        return result
+
+    # Les étapes de rendu ont besoin du DataFrame et des données de PDR : calculés hors mesure si besoin
+    df = (record('parse_csv_file', analyse_csv_lorawan.parse_csv_file, path) if 'parse_csv_file' in stages
+          else timed(analyse_csv_lorawan.parse_csv_file, path)[0])
+    if 'convert_csv_to_json' in stages:
+        record('convert_csv_to_json', convert_csv_to_json.convert_csv_to_json, path, json_path, False)
+        os.remove(json_path)
+    if 'analyze_data_files' in stages:
+        record('analyze_data_files', generate_summary_report.analyze_data_files, os.path.dirname(path), False)
+    if 'generate_time_series_plots' in stages:
+        record('generate_time_series_plots', analyse_csv_lorawan.generate_time_series_plots,
+               df.copy(), output_dir, prefix)
+    if 'generate_plots' in stages:
+        pdr_data = record('generate_plots', analyse_csv_lorawan.generate_plots, df, output_dir, prefix)
+    elif 'generate_combined_pdr_plot' in stages:
+        pdr_data = timed(analyse_csv_lorawan.generate_plots, df, output_dir, prefix)[0]
+    if 'generate_combined_pdr_plot' in stages:
+        record('generate_combined_pdr_plot', analyse_csv_lorawan.generate_combined_pdr_plot, [pdr_data], output_dir)
+    return results
+
+
+def environment():
+    """Description de la machine et des versions, jointe aux résultats pour les comparer à bon escient"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def compare_results(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Compare des durées à celles d'une exécution de référence
+
+    Retourne les régressions (étape plus lente de plus de tolerance, en
+    proportion) ; les couples (taille, étape) absents de la référence sont
+    ignorés.
+    """
+    reference = {(entry['rows'], entry['stage']): entry['seconds'] for entry in baseline['results']}
+    regressions = []
+    print(f"\nComparaison à la référence ({baseline['environment']['date']}) :")
+    for entry in results:
+        before = reference.get((entry['rows'], entry['stage']))
+        if not before:
+            continue
+        change = entry['seconds'] / before - 1
+        flag = '  <-- régression' if change > tolerance else ''
+        print(f"  - {entry['rows']:>10} lignes {entry['stage']:<27}: {before:.2f} s -> "
+              f"{entry['seconds']:.2f} s ({change:+.0%}){flag}")
+        if flag:
+            regressions.append(dict(entry, baseline_seconds=before, change=change))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de l'ingestion des CSV LoRaWAN et des étapes du pipeline")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000, 10000000])
+    parser.add_argument('--workdir', default='bench_data')
+    parser.add_argument('--malformed-rate', type=float, default=0.01)
+    parser.add_argument('--nodes', type=int, default=1,
+                        help="Nombre de nœuds des fichiers synthétiques")
+    parser.add_argument('--sfs', type=int, nargs='+', default=[7],
+                        help="Spreading Factors des fichiers synthétiques (répartis à tour de rôle)")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES),
+                        help="Étapes du pipeline à chronométrer")
+    parser.add_argument('--no-legacy', action='store_true',
+                        help="Ne pas exécuter l'ancienne boucle de référence")
+    parser.add_argument('--parse-jobs', type=int, default=1,
+                        help="Mesurer aussi l'analyse d'un fichier découpé en plages sur N processus")
+    parser.add_argument('--output', '-o',
+                        help="Fichier JSON des résultats (défaut: <workdir>/results.json)")
+    parser.add_argument('--compare', metavar='REFERENCE',
+                        help="Comparer aux résultats JSON d'une exécution précédente")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help="Ralentissement relatif toléré par --compare (défaut: 0.2 = +20 %%)")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    output_dir = os.path.join(args.workdir, 'graphs')
+    results = []
+    for rows in args.rows:
+        print(f"\nBenchmark sur {rows} lignes")
+        path = dataset_path(args.workdir, rows, args.nodes, tuple(args.sfs), args.malformed_rate)
+        df = bench_parse(path, rows, legacy=not args.no_legacy, jobs=args.parse_jobs)
+        bench_memory(df)
+        del df
+        print("  Étapes du pipeline :")
+        results.extend(bench_stages(path, rows, output_dir, args.stages))
+
+    report = {
+        'environment': environment(),
+        'params': {'nodes': args.nodes, 'sfs': args.sfs, 'malformed_rate': args.malformed_rate},
+        'results': results
+    }
+    output = args.output or os.path.join(args.workdir, 'results.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nRésultats enregistrés : {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('params') != report['params']:
+            print("Attention : la référence a été mesurée sur des fichiers synthétiques différents")
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} régression(s) au-delà de +{args.tolerance:.0%}")
+            sys.exit(1)
+        print("Aucune régression")
@@ -1,12 +1,32 @@
+import io
 import json
+import gzip
 import os
 import sys
 import re
+import argparse
+import pandas as pd
 
-def convert_csv_to_json(csv_file_path, json_file_path):
-    data = []
+from experiment_cache import load_experiment
+import profiling
+
+try:
+    import zstandard
+except ImportError:  # compression zstd indisponible
+    zstandard = None
+
+# Extensions ajoutées au fichier de sortie selon la compression
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+def iter_csv_records(csv_file_path):
+    """Parse un fichier CSV ligne par ligne et produit les enregistrements à convertir
+    
+    Contrairement à parse_csv_file, les valeurs RSSI/SNR du champ data sont
+    prioritaires sur les colonnes snr/rssi.
+    """
     message_id = 1
     
+    # Lecture tamponnée ligne par ligne : la mémoire utilisée ne dépend pas de la taille du fichier
     with open(csv_file_path, 'r', encoding='utf-8') as f:
         # Lire l'en-tête
         header = f.readline().strip().strip('"').split(';')
@@ -45,8 +65,8 @@ def convert_csv_to_json(csv_file_path, json_file_path):
                 if rssi is None or snr is None:
                     continue
                     
-                entry = {
-                    "_id": {"$oid": str(message_id)},
+                yield {
+                    "message_id": message_id,
                     "snr": snr,
                     "rssi": rssi,
                     "cr": int(parts[5]) if parts[5].isdigit() else 5,
@@ -55,28 +75,125 @@ def convert_csv_to_json(csv_file_path, json_file_path):
                     "gateway_eui": parts[1],
                     "node_eui": parts[2]
                 }
-                data.append(entry)
                 message_id += 1
                 
             except Exception as e:
                 print(f"Erreur ligne {message_id}: {e}")
                 continue
-    
+
+def parse_csv_records(csv_file_path):
+    """Parse un fichier CSV et retourne un DataFrame des enregistrements à convertir"""
+    data = list(iter_csv_records(csv_file_path))
     if not data:
+        return None
+    
+    return pd.DataFrame(data)
+
+def _to_json_record(record):
+    """Met un enregistrement au format JSON exporté (_id.$oid, snr, rssi, ...)"""
+    record = dict(record)
+    return {
+        "_id": {"$oid": str(record.pop('message_id'))},
+        **record
+    }
+
+def _iter_json_records(df):
+    """Produit les enregistrements d'un DataFrame au format JSON exporté"""
+    for record in df.to_dict('records'):
+        yield _to_json_record(record)
+
+def open_output(path, compression=None):
+    """Ouvre un fichier de sortie texte, éventuellement compressé en gzip ou zstd"""
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Le module zstandard est requis pour la compression zstd (pip install zstandard)")
+        raw = open(path, 'wb')
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw, closefd=True), encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+def stream_csv_to_json(csv_file_path, json_file_path, output_format='ndjson', compression=None):
+    """Convertit un fichier CSV en JSON au fil de la lecture, à mémoire constante
+    
+    Chaque enregistrement est écrit dès qu'il est analysé, soit une ligne
+    JSON par message (ndjson), soit dans un tableau JSON compact écrit
+    progressivement (json). Le fichier n'apparaît qu'une fois complet.
+    """
+    json_file_path += COMPRESSION_SUFFIXES[compression]
+    tmp_path = json_file_path + '.tmp'
+    
+    # Créer le répertoire de destination si nécessaire
+    os.makedirs(os.path.dirname(json_file_path) or '.', exist_ok=True)
+    
+    count = 0
+    try:
+        with profiling.stage('stream', file=os.path.basename(csv_file_path), format=output_format) as info:
+            with open_output(tmp_path, compression) as f:
+                if output_format == 'json':
+                    f.write('[')
+                for record in iter_csv_records(csv_file_path):
+                    if output_format == 'json':
+                        f.write(',\n' if count else '\n')
+                        f.write(json.dumps(_to_json_record(record)))
+                    else:
+                        f.write(json.dumps(_to_json_record(record)))
+                        f.write('\n')
+                    count += 1
+                if output_format == 'json':
+                    f.write('\n]\n')
+            info['rows'] = count
+    except BaseException:
+        # Ne pas laisser de fichier partiel si la conversion échoue ou est interrompue
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    if not count:
+        os.remove(tmp_path)
         print(f"Aucune donnée valide trouvée dans {csv_file_path}")
         return False
     
-    # Créer le répertoire de destination si nécessaire
-    os.makedirs(os.path.dirname(json_file_path), exist_ok=True)
+    os.replace(tmp_path, json_file_path)
+    print(f"Conversion réussie : {os.path.basename(csv_file_path)} -> {os.path.basename(json_file_path)} ({count} messages)")
+    return True
+
+def convert_csv_to_json(csv_file_path, json_file_path, use_cache=True):
+    """Convertit un fichier CSV en fichier JSON
+    
+    Avec use_cache, les enregistrements sont relus depuis le cache disque
+    (voir experiment_cache) tant que le fichier source n'a pas changé.
+    """
+    with profiling.stage('parse', file=os.path.basename(csv_file_path), cached=use_cache) as info:
+        if use_cache:
+            df = load_experiment(csv_file_path, parse_csv_records)
+        else:
+            df = parse_csv_records(csv_file_path)
+        info['rows'] = 0 if df is None else len(df)
+    
+    if df is None:
+        print(f"Aucune donnée valide trouvée dans {csv_file_path}")
+        return False
     
-    # Écrire les données dans un fichier JSON
-    with open(json_file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+    with profiling.stage('write', file=os.path.basename(json_file_path), rows=len(df)):
+        data = list(_iter_json_records(df))
+        
+        # Créer le répertoire de destination si nécessaire
+        os.makedirs(os.path.dirname(json_file_path), exist_ok=True)
+        
+        # Écrire les données dans un fichier JSON
+        with open(json_file_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
     
     print(f"Conversion réussie : {os.path.basename(csv_file_path)} -> {os.path.basename(json_file_path)} ({len(data)} messages)")
     return True
 
-def process_directory(directory_path):
+def process_directory(directory_path, use_cache=True, output_format=None, compression=None):
+    """Convertit tous les fichiers CSV d'un dossier dans son sous-dossier json/
+    
+    Sans output_format, chaque fichier est écrit en JSON indenté (via le
+    cache) ; avec 'json' ou 'ndjson', la conversion se fait en flux.
+    """
     # Créer un sous-dossier pour les fichiers JSON s'il n'existe pas
     json_dir = os.path.join(directory_path, 'json')
     if not os.path.exists(json_dir):
@@ -86,24 +203,45 @@ def process_directory(directory_path):
     for filename in os.listdir(directory_path):
         if filename.lower().endswith('.csv'):
             csv_path = os.path.join(directory_path, filename)
-            json_filename = os.path.splitext(filename)[0] + '.json'
+            extension = '.ndjson' if output_format == 'ndjson' else '.json'
+            json_filename = os.path.splitext(filename)[0] + extension
             json_path = os.path.join(json_dir, json_filename)
             
             print(f"Traitement de {filename}...")
-            convert_csv_to_json(csv_path, json_path)
+            with profiling.stage('file', file=filename):
+                if output_format:
+                    stream_csv_to_json(csv_path, json_path, output_format, compression)
+                else:
+                    convert_csv_to_json(csv_path, json_path, use_cache)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python convert_csv_to_json.py <chemin_vers_fichier_ou_dossier>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Conversion des fichiers CSV LoRaWAN en JSON")
+    parser.add_argument('path', help="Fichier .csv ou dossier contenant des fichiers .csv")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Ignorer le cache des fichiers déjà analysés")
+    parser.add_argument('--stream', action='store_true',
+                        help="Conversion en flux à mémoire constante (JSON compact)")
+    parser.add_argument('--format', choices=['json', 'ndjson'], default='json',
+                        help="Format de sortie en flux : tableau JSON ou une ligne JSON par message")
+    parser.add_argument('--compress', choices=['gzip', 'zstd'],
+                        help="Compresser la sortie (implique --stream)")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.setup(args)
     
-    path = sys.argv[1]
+    path = args.path
+    # NDJSON et compression ne sont produits qu'en flux
+    output_format = args.format if (args.stream or args.format == 'ndjson' or args.compress) else None
     
     if os.path.isdir(path):
-        process_directory(path)
+        process_directory(path, not args.no_cache, output_format, args.compress)
     elif os.path.isfile(path) and path.lower().endswith('.csv'):
-        json_path = os.path.splitext(path)[0] + '.json'
-        convert_csv_to_json(path, json_path)
+        if output_format:
+            extension = '.ndjson' if output_format == 'ndjson' else '.json'
+            stream_csv_to_json(path, os.path.splitext(path)[0] + extension, output_format, args.compress)
+        else:
+            json_path = os.path.splitext(path)[0] + '.json'
+            convert_csv_to_json(path, json_path, not args.no_cache)
     else:
         print("Le chemin doit être un fichier .csv ou un dossier contenant des fichiers .csv")
         sys.exit(1)
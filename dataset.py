@@ -0,0 +1,152 @@
+import os
+import re
+import pandas as pd
+
+from experiment_cache import load_experiment
+
+
+# Racine des campagnes : un sous-dossier par niveau de puissance d'émission
+DATA_ROOT = 'Data'
+POWER_LEVELS = ('Max', 'Min', 'Moy')
+
+# Clé d'une expérience dans l'index
+INDEX_KEYS = ['power', 'sf', 'bw', 'cr', 'payload', 'window_start']
+
+# ex: received_data_experience-07-06-2025_10h10-10h30_SF7_BW500_CR5_20.csv
+# La date et la fenêtre horaire sont facultatives (fichiers synthétiques, exports renommés) ;
+# la taille de payload est toujours le dernier nombre du nom
+FILENAME_RE = re.compile(
+    r'(?:(?P<date>\d{2}-\d{2}-\d{4})_(?P<start>\d{2}h\d{2})-(?P<end>\d{2}h\d{2})_)?'
+    r'SF(?P<sf>\d+)_BW(?P<bw>\d+)_CR(?P<cr>\d+)_(?:\d+_)*(?P<payload>\d+)_?(?:\.csv)?$'
+)
+
+
+def _window_time(date, hhmm):
+    """Horodatage d'une borne de fenêtre (ex: '07-06-2025', '10h30')"""
+    return pd.to_datetime(f"{date} {hhmm.replace('h', ':')}", format='%d-%m-%Y %H:%M')
+
+
+def parse_filename(filename):
+    """Extrait SF, BW, CR, taille de payload et fenêtre horaire d'un nom d'expérience
+
+    Accepte un nom de fichier, un chemin ou un préfixe de graphique (nom sans
+    extension terminé par '_'). Retourne None si le nom ne suit pas le format.
+    """
+    match = FILENAME_RE.search(os.path.basename(filename))
+    if not match:
+        return None
+    metadata = {
+        'sf': int(match.group('sf')),
+        'bw': int(match.group('bw')),
+        'cr': int(match.group('cr')),
+        'payload': int(match.group('payload')),
+        'window_start': pd.NaT,
+        'window_end': pd.NaT
+    }
+    if match.group('date'):
+        metadata['window_start'] = _window_time(match.group('date'), match.group('start'))
+        metadata['window_end'] = _window_time(match.group('date'), match.group('end'))
+    return metadata
+
+
+def _campaign_dirs(path):
+    """Dossiers de campagne (niveau de puissance, chemin) sous path
+
+    path peut être la racine des données (un sous-dossier par niveau de
+    puissance) ou directement le dossier d'une campagne.
+    """
+    subdirs = sorted(entry.name for entry in os.scandir(path) if entry.is_dir())
+    campaigns = [(name, os.path.join(path, name)) for name in subdirs
+                 if name in POWER_LEVELS or any(f.endswith('.csv') for f in os.listdir(os.path.join(path, name)))]
+    if any(f.endswith('.csv') for f in os.listdir(path)):
+        campaigns.insert(0, (os.path.basename(os.path.normpath(path)), path))
+    return campaigns
+
+
+def csv_files(paths):
+    """Fichiers CSV désignés par une liste de fichiers et de dossiers
+
+    Un dossier est remplacé par les fichiers .csv triés de ses dossiers de
+    campagne (voir _campaign_dirs) : la racine des données comme le dossier
+    d'une campagne. Un fichier est gardé tel quel.
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for _, directory in _campaign_dirs(path):
+                found.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                             if name.endswith('.csv'))
+        else:
+            found.append(path)
+    return found
+
+
+def build_index(path=DATA_ROOT):
+    """Parcourt une fois les campagnes et retourne l'index des expériences
+
+    Une ligne par fichier CSV reconnu, indexée par (power, sf, bw, cr,
+    payload, window_start) et triée, avec le chemin du fichier et la fin de
+    fenêtre. Aucun fichier CSV n'est ouvert.
+    """
+    rows = []
+    for power, directory in _campaign_dirs(path):
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith('.csv'):
+                continue
+            metadata = parse_filename(filename)
+            if metadata is None:
+                continue
+            metadata.update({'power': power, 'file': filename, 'path': os.path.join(directory, filename)})
+            rows.append(metadata)
+
+    columns = INDEX_KEYS + ['window_end', 'file', 'path']
+    index = pd.DataFrame(rows, columns=columns)
+    return index.set_index(INDEX_KEYS).sort_index()
+
+
+def select(index, **criteria):
+    """Filtre l'index sur ses clés (ex: select(index, power='Max', sf=[7, 9]))
+
+    Une valeur scalaire ou une liste de valeurs acceptées par clé ; seules les
+    lignes de l'index sont lues, aucun fichier n'est ouvert.
+    """
+    unknown = set(criteria) - set(INDEX_KEYS)
+    if unknown:
+        raise KeyError(f"Clés inconnues : {', '.join(sorted(unknown))} (clés : {', '.join(INDEX_KEYS)})")
+    mask = pd.Series(True, index=index.index)
+    for key, value in criteria.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        mask &= index.index.get_level_values(key).isin(values)
+    return index[mask.to_numpy()]
+
+
+def load_table(index, parser, use_cache=True):
+    """Charge les expériences de l'index en une seule table partitionnée
+
+    Chaque expérience est lue via parser (depuis le cache si use_cache, voir
+    experiment_cache) puis étiquetée par les clés d'index absentes de ses
+    colonnes (sf et cr restent ceux des messages), en catégories pour que
+    la table reste compacte.
+    """
+    frames = []
+    for keys, path in zip(index.index, index['path']):
+        df = load_experiment(path, parser) if use_cache else parser(path)
+        if df is None or df.empty:
+            continue
+        partition = {key: value for key, value in zip(INDEX_KEYS, keys) if key not in df.columns}
+        frames.append(df.assign(**partition))
+    if not frames:
+        return pd.DataFrame()
+
+    # pd.concat ne conserve une catégorie que si tous les fichiers partagent les mêmes modalités
+    categorical = [name for name, dtype in frames[0].dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    for name in categorical:
+        categories = frames[0][name].cat.categories
+        for df in frames[1:]:
+            categories = categories.union(df[name].cat.categories)
+        frames = [df.assign(**{name: df[name].cat.set_categories(categories)}) for df in frames]
+
+    table = pd.concat(frames, ignore_index=True)
+    for key in ('power', 'bw', 'payload'):
+        table[key] = table[key].astype('category')
+    return table
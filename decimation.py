@@ -0,0 +1,102 @@
+import numpy as np
+
+
+# Nombre de points conservés par colonne de pixels de la figure
+POINTS_PER_PIXEL = 2
+
+
+def pixel_budget(fig, dpi, points_per_pixel=POINTS_PER_PIXEL):
+    """Nombre maximal de points utiles pour une courbe de la largeur de la figure"""
+    return int(fig.get_figwidth() * dpi * points_per_pixel)
+
+
+def _as_float(x):
+    """Convertit un axe (nombres ou datetime64) en flottants croissants"""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').view(np.int64)
+    return x.astype(float)
+
+
+def minmax_indices(x, y, n_out):
+    """Indices des points à tracer : minimum et maximum de y dans chaque tranche de x
+
+    L'axe x (trié) est découpé en n_out / 2 tranches de même largeur ; les
+    extrêmes de chaque tranche sont conservés, ainsi que le premier et le
+    dernier point, de sorte que pics et chutes restent visibles. Le calcul est
+    entièrement vectorisé (un tri par (tranche, y)).
+    """
+    x = _as_float(x)
+    y = np.asarray(y, dtype=float)
+    if len(x) <= n_out:
+        return np.arange(len(x))
+
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= n_out:
+        return valid
+    n_buckets = max(n_out // 2, 1)
+    xv = x[valid]
+    span = xv[-1] - xv[0]
+    if span <= 0:
+        buckets = np.zeros(len(valid), dtype=np.int64)
+    else:
+        buckets = np.minimum(((xv - xv[0]) / span * n_buckets).astype(np.int64), n_buckets - 1)
+
+    # Dans chaque tranche, le premier élément trié est le minimum et le dernier le maximum
+    order = np.lexsort((y[valid], buckets))
+    sorted_buckets = buckets[order]
+    starts = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+    keep = np.concatenate((order[starts], order[ends], [0, len(valid) - 1]))
+    return valid[np.unique(keep)]
+
+
+def lttb_indices(x, y, n_out):
+    """Indices retenus par l'algorithme Largest-Triangle-Three-Buckets
+
+    Conserve la forme visuelle de la courbe avec n_out points. Les moyennes
+    des tranches sont calculées en une passe ; seule la sélection, qui dépend
+    du point choisi dans la tranche précédente, boucle sur les n_out tranches.
+    """
+    x = _as_float(x)
+    y = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= max(n_out, 3):
+        return valid
+    xv, yv = x[valid], y[valid]
+    n = len(valid)
+
+    # Tranches intérieures (le premier et le dernier point sont toujours conservés)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    sums_x = np.add.reduceat(xv[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(yv[1:n - 1], edges[:-1] - 1)
+    mean_x = np.r_[sums_x / np.maximum(counts, 1), xv[-1]]
+    mean_y = np.r_[sums_y / np.maximum(counts, 1), yv[-1]]
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if hi <= lo:
+            selected[i + 1] = previous
+            continue
+        # Aire du triangle (point précédent, candidat, moyenne de la tranche suivante)
+        ax, ay = xv[previous], yv[previous]
+        areas = np.abs((ax - mean_x[i + 1]) * (yv[lo:hi] - ay) - (ax - xv[lo:hi]) * (mean_y[i + 1] - ay))
+        previous = lo + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return valid[np.unique(selected)]
+
+
+def decimate_indices(x, y, n_out, method='minmax'):
+    """Indices des points à tracer pour au plus ~n_out points ('minmax', 'lttb' ou 'none')"""
+    if method == 'none' or len(x) <= n_out:
+        return np.arange(len(x))
+    if method == 'minmax':
+        return minmax_indices(x, y, n_out)
+    if method == 'lttb':
+        return lttb_indices(x, y, n_out)
+    raise ValueError(f"Méthode de décimation inconnue : {method} (minmax, lttb ou none)")
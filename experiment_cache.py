@@ -0,0 +1,153 @@
+import os
+import json
+import hashlib
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow absent : repli sur le format pickle de pandas
+    feather = None
+
+
+# Répertoire du cache, modifiable par la variable d'environnement LORAWAN_CACHE_DIR
+CACHE_DIR = os.environ.get('LORAWAN_CACHE_DIR', os.path.join('.cache', 'experiments'))
+
+# À incrémenter lorsque le format des DataFrames mis en cache change
+CACHE_VERSION = 1
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_fingerprint(path, with_hash=True):
+    """Retourne l'empreinte d'un fichier : chemin absolu, taille, mtime et hachage du contenu"""
+    stat = os.stat(path)
+    fingerprint = {
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns
+    }
+    if with_hash:
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        fingerprint['hash'] = digest.hexdigest()
+    return fingerprint
+
+
+def _entry_paths(csv_path, namespace, cache_dir):
+    """Chemins (données, métadonnées) de l'entrée de cache d'un fichier source"""
+    key = hashlib.blake2b(f"{namespace}:{os.path.abspath(csv_path)}".encode('utf-8'),
+                          digest_size=16).hexdigest()
+    extension = '.feather' if feather is not None else '.pkl'
+    base = os.path.join(cache_dir, key)
+    return base + extension, base + '.json'
+
+
+def _write_frame(df, data_path):
+    """Écrit un DataFrame en Feather non compressé (lisible par memory-map) ou en pickle"""
+    tmp_path = data_path + '.tmp'
+    if feather is not None:
+        # Feather n'accepte qu'un index par défaut : l'index est conservé en colonne
+        table = df.rename_axis('__index__').reset_index()
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, data_path)
+
+
+def _read_frame(data_path):
+    """Relit un DataFrame mis en cache ; en Feather, la table Arrow est projetée en mémoire sans copie"""
+    if feather is None:
+        return pd.read_pickle(data_path)
+    table = feather.read_table(data_path, memory_map=True)
+    df = table.to_pandas(split_blocks=True)
+    return df.set_index('__index__').rename_axis(None)
+
+
+def _write_meta(meta, meta_path):
+    """Écrit les métadonnées d'une entrée de façon atomique"""
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def fingerprint_matches(path, recorded):
+    """Compare un fichier à une empreinte enregistrée, retourne (identique, empreinte à jour)
+
+    La taille et la date de modification suffisent dans le cas courant ; si
+    seule la date a changé (copie, touch), le hachage du contenu tranche.
+    L'empreinte retournée est None si le fichier a changé.
+    """
+    current = file_fingerprint(path, with_hash=False)
+    if current['size'] != recorded.get('size'):
+        return False, None
+    if current['mtime_ns'] == recorded.get('mtime_ns'):
+        return True, recorded
+
+    current = file_fingerprint(path)
+    if current['hash'] != recorded.get('hash'):
+        return False, None
+    return True, dict(recorded, **current)
+
+
+def _lookup(csv_path, data_path, meta_path):
+    """Retourne True si l'entrée de cache correspond au fichier source actuel"""
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return False
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if meta.get('version') != CACHE_VERSION:
+        return False
+
+    matches, current = fingerprint_matches(csv_path, meta)
+    if matches and current is not meta:
+        # Seule la date a changé : mettre à jour les métadonnées
+        _write_meta(current, meta_path)
+    return matches
+
+
+def load_experiment(csv_path, parser, namespace=None, cache_dir=None):
+    """Retourne parser(csv_path), relu depuis le cache si le fichier source n'a pas changé
+
+    Les entrées sont propres à chaque namespace (par défaut le nom de la
+    fonction parser) afin que plusieurs outils partagent le même répertoire sans
+    se mélanger. Un résultat None n'est pas mis en cache.
+    """
+    if namespace is None:
+        namespace = parser.__name__
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+
+    data_path, meta_path = _entry_paths(csv_path, namespace, cache_dir)
+    if _lookup(csv_path, data_path, meta_path):
+        try:
+            return _read_frame(data_path)
+        except Exception as e:
+            print(f"Entrée de cache illisible pour {os.path.basename(csv_path)}: {e}")
+
+    # Empreinte prise avant l'analyse : une modification concurrente invalidera l'entrée
+    fingerprint = file_fingerprint(csv_path)
+    df = parser(csv_path)
+    if df is None:
+        return None
+
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_frame(df, data_path)
+    fingerprint.update({'version': CACHE_VERSION, 'namespace': namespace})
+    _write_meta(fingerprint, meta_path)
+    return df
+
+
+def clear_cache(cache_dir=None):
+    """Supprime toutes les entrées du cache"""
+    cache_dir = cache_dir or CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return
+    for filename in os.listdir(cache_dir):
+        if filename.endswith(('.feather', '.pkl', '.json', '.tmp')):
+            os.remove(os.path.join(cache_dir, filename))
@@ -0,0 +1,316 @@
+import os
+import sys
+import math
+import argparse
+import functools
+import contextlib
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from analyse_csv_lorawan import parse_experiment, parse_workers, render_chart, _plot_decimated, RENDER_PARAMS
+from experiment_cache import load_experiment
+from loss_accounting import detect_losses
+from decimation import pixel_budget
+from uplink_dedup import deduplicate_uplinks
+from dataset import csv_files
+import profiling
+
+
+# Dimensions de la ventilation : colonne clé de chaque dimension
+DIMENSIONS = {'node': 'node_eui', 'gateway': 'gateway_eui'}
+# Nombre de lignes des classements (et de graphiques des petits multiples)
+WORST_N = 12
+# Nombre de colonnes de la grille des petits multiples
+GRID_COLUMNS = 4
+METRICS = ('snr', 'rssi')
+# Libellés des métriques de classement (titre des petits multiples)
+RANK_LABELS = {
+    'delivery_rate': 'au plus faible taux de livraison',
+    'snr_mean': 'au plus faible SNR moyen',
+    'rssi_mean': 'au plus faible RSSI moyen'
+}
+
+
+def _partial(df, column, losses):
+    """Agrégats additifs de df par valeur de column (sommes, extrêmes, pertes), fusionnables entre fichiers
+
+    losses est le résumé de detect_losses, dont les groupes commencent par
+    column : leurs reçus, attendus et pertes sont sommés par valeur de column.
+    """
+    grouped = df.groupby(column, observed=True, sort=False)
+    partial = grouped[list(METRICS)].agg(['sum', 'min', 'max'])
+    partial.columns = [f"{metric}_{stat}" for metric, stat in partial.columns]
+    partial['messages'] = grouped.size()
+    if 'gateways' in df.columns:
+        partial['gateways_sum'] = grouped['gateways'].sum()
+
+    by_key = losses.groupby(level=column, observed=True)
+    partial = partial.join(by_key[['received', 'expected', 'lost']].sum())
+    partial['max_burst'] = by_key['max_burst'].max()
+    # Clés en texte : les catégories diffèrent d'un fichier à l'autre
+    partial.index = partial.index.astype(str)
+    partial.index.name = column
+    return partial
+
+
+def frame_breakdown(df, period=None):
+    """Agrégats partiels par nœud et par passerelle d'une expérience (DataFrame au schéma compact)
+
+    Un seul regroupement par dimension sur les clés catégorielles. Les nœuds
+    sont vus par uplink (réceptions fusionnées, voir uplink_dedup : PDR du
+    nœud, SNR/RSSI de la meilleure réception) ; les passerelles par
+    réception, leur PDR étant la part des uplinks attendus des nœuds
+    qu'elles entendent (pertes détectées par passerelle, nœud et SF).
+    """
+    uplinks = deduplicate_uplinks(df)
+    node_losses, _ = detect_losses(uplinks, period)
+    gateway_losses, _ = detect_losses(df, period, group_cols=('gateway_eui', 'node_eui', 'sf'))
+    return {
+        'node': _partial(uplinks, 'node_eui', node_losses),
+        'gateway': _partial(df, 'gateway_eui', gateway_losses)
+    }
+
+
+def _load(csv_path, use_cache=True):
+    """DataFrame compact d'un fichier, relu depuis le cache d'analyse_csv_lorawan si possible"""
+    if use_cache:
+        return load_experiment(csv_path, parse_experiment, 'parse_experiment')
+    return parse_experiment(csv_path)
+
+
+def file_breakdown(csv_path, period=None, use_cache=True, profile=False):
+    """Agrégats partiels d'un fichier CSV (voir frame_breakdown, None s'il est vide) et trace
+
+    Avec profile, la trace contient les étapes mesurées dans le processus de
+    travail (voir profiling.collect).
+    """
+    partial = None
+    with profiling.collect(profile) as trace:
+        with profiling.stage('parse', file=os.path.basename(csv_path)) as info:
+            df = _load(csv_path, use_cache)
+            info['rows'] = 0 if df is None else len(df)
+        if df is not None and not df.empty:
+            with profiling.stage('breakdown', rows=len(df)):
+                partial = frame_breakdown(df, period)
+    return partial, trace
+
+
+def merge_partials(total, partial):
+    """Fusionne deux tables d'agrégats partiels (total peut valoir None)"""
+    if total is None:
+        return partial
+    merged = pd.concat([total, partial])
+    aggregates = {column: 'min' if column.endswith('_min') else
+                  'max' if column.endswith('_max') or column == 'max_burst' else 'sum'
+                  for column in merged.columns}
+    return merged.groupby(level=0, sort=False).agg(aggregates)
+
+
+def accumulate_files(csv_paths, period=None, use_cache=True, jobs=1):
+    """Agrégats partiels par dimension de plusieurs fichiers, fusionnés fichier par fichier
+
+    Seuls le fichier en cours et les tables agrégées (une ligne par nœud ou
+    passerelle) sont en mémoire ; avec jobs > 1, les fichiers sont répartis
+    sur des processus.
+    """
+    totals = dict.fromkeys(DIMENSIONS)
+    worker = functools.partial(file_breakdown, period=period, use_cache=use_cache)
+    if jobs == 1:
+        results = map(worker, csv_paths)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs or None)
+        results = executor.map(functools.partial(worker, profile=profiling.active()), csv_paths)
+    try:
+        for partial, trace in results:
+            profiling.merge(trace)
+            if partial is None:
+                continue
+            for dimension in DIMENSIONS:
+                totals[dimension] = merge_partials(totals[dimension], partial[dimension])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return totals
+
+
+def finalize(partial):
+    """Table finale d'une dimension : messages, pertes, PDR et SNR/RSSI (moyenne, min, max) par clé"""
+    table = pd.DataFrame(index=partial.index)
+    table['messages'] = partial['messages']
+    table['received'] = partial['received']
+    table['expected'] = partial['expected']
+    table['lost'] = partial['lost']
+    table['delivery_rate'] = partial['received'] / partial['expected'].where(partial['expected'] > 0) * 100
+    table['max_burst'] = partial['max_burst']
+    for metric in METRICS:
+        table[f"{metric}_mean"] = partial[f"{metric}_sum"] / partial['messages']
+        table[f"{metric}_min"] = partial[f"{metric}_min"]
+        table[f"{metric}_max"] = partial[f"{metric}_max"]
+    if 'gateways_sum' in partial.columns:
+        table['mean_gateways'] = partial['gateways_sum'] / partial['messages']
+    return table.sort_index()
+
+
+def worst(table, n=WORST_N, by='delivery_rate'):
+    """Les n pires lignes de table : plus faible valeur de by, puis plus faible SNR moyen
+
+    Sélection partielle (nsmallest) : le coût ne dépend pas de n et la table
+    n'est pas triée en entier.
+    """
+    keys = [by] if by == 'snr_mean' else [by, 'snr_mean']
+    return table.nsmallest(n, keys)
+
+
+def offender_rows(csv_paths, column, keys, use_cache=True):
+    """Mesures des seules clés keys (nœuds ou passerelles) dans tous les fichiers, triées par date
+
+    Second passage, relu depuis le cache : la mémoire est bornée par les
+    messages des clés retenues et non par la taille de la flotte. Les nœuds
+    sont vus par uplink, comme dans frame_breakdown.
+    """
+    keys = list(keys)
+    rows = []
+    for csv_path in csv_paths:
+        df = _load(csv_path, use_cache)
+        if df is None or df.empty:
+            continue
+        if column == DIMENSIONS['node']:
+            df = deduplicate_uplinks(df[df[column].isin(keys)])
+        else:
+            df = df[df[column].isin(keys)]
+        if df is not None and not df.empty:
+            rows.append(pd.DataFrame({column: df[column].astype(str), 'sf': df['sf'],
+                                      'datetime': df['datetime'], 'snr': df['snr']}))
+    if not rows:
+        return None
+    return pd.concat(rows, ignore_index=True).sort_values('datetime', kind='stable')
+
+
+def _draw_small_multiples(fig, rows, ranked, column, title):
+    """Une petite figure par clé de ranked (SNR en fonction de l'heure, une courbe par SF), axes partagés"""
+    import matplotlib.dates as mdates
+
+    n_cols = min(GRID_COLUMNS, len(ranked))
+    n_rows = math.ceil(len(ranked) / n_cols)
+    axes = fig.subplots(n_rows, n_cols, sharey=True, squeeze=False).ravel()
+    # Budget de points d'une vignette : largeur de la figure partagée entre les colonnes
+    budget = max(pixel_budget(fig, RENDER_PARAMS['dpi']) // n_cols, 2)
+    groups = dict(tuple(rows.groupby(column, sort=False))) if rows is not None else {}
+
+    for ax, (key, stats) in zip(axes, ranked.iterrows()):
+        sub = groups.get(key)
+        if sub is not None:
+            for sf, group in sub.groupby('sf'):
+                _plot_decimated(ax, group['datetime'], group['snr'], budget, marker='o', linestyle='-',
+                                markersize=2, linewidth=0.8, label=f'SF{int(sf)}', alpha=0.7)
+            # Graduations compactes : la date n'est répétée que lorsqu'elle change
+            locator = mdates.AutoDateLocator(minticks=2, maxticks=5)
+            ax.xaxis.set_major_locator(locator)
+            ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        ax.set_title(f"{key}\nPDR {stats['delivery_rate']:.1f}% - SNR moy {stats['snr_mean']:.1f} dB "
+                     f"(n={int(stats['messages'])})", fontsize=9)
+        ax.tick_params(labelsize=8)
+        ax.grid(True, linestyle='--', alpha=0.6)
+    if groups:
+        axes[0].legend(fontsize=8)
+    for ax in axes[len(ranked):]:
+        ax.set_visible(False)
+    for ax in axes[::n_cols]:
+        ax.set_ylabel('SNR (dB)', fontsize=9)
+
+    fig.suptitle(title, fontsize=13)
+    fig.tight_layout()
+
+
+def plot_worst(rows, dimension, ranked, output_dir='graphs', rank_by='delivery_rate'):
+    """Petits multiples des pires clés d'une dimension (rows : voir offender_rows), une seule figure
+
+    Le nombre de vignettes est celui du classement, quelle que soit la
+    taille de la flotte.
+    """
+    if ranked.empty:
+        return None
+    column = DIMENSIONS[dimension]
+    label = 'nœuds' if dimension == 'node' else 'passerelles'
+    n_cols = min(GRID_COLUMNS, len(ranked))
+    figsize = (4 * n_cols, 3 * math.ceil(len(ranked) / n_cols) + 0.6)
+    output_path = os.path.join(output_dir, f"worst_{dimension}s.png")
+    title = f"{len(ranked)} {label} {RANK_LABELS[rank_by]}"
+    duration = render_chart(output_path, _draw_small_multiples, (rows, ranked, column, title), figsize)
+    print(f"  - Rendu {os.path.basename(output_path)} : {duration:.2f} s")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ventilation SNR/RSSI/PDR par nœud et par passerelle, "
+                                                 "classement des pires et petits multiples")
+    parser.add_argument('paths', nargs='+', help="Fichiers .csv ou dossiers")
+    parser.add_argument('--by', default=','.join(DIMENSIONS),
+                        help=f"Dimensions séparées par des virgules parmi {', '.join(DIMENSIONS)} "
+                             "(défaut: toutes)")
+    parser.add_argument('--worst', '-n', type=int, default=WORST_N,
+                        help=f"Nombre de pires nœuds/passerelles classés et tracés (défaut: {WORST_N})")
+    parser.add_argument('--rank-by', default='delivery_rate',
+                        choices=tuple(RANK_LABELS),
+                        help="Métrique du classement (défaut: delivery_rate)")
+    parser.add_argument('--period', type=float, default=None,
+                        help="Période d'émission en secondes pour le calcul des pertes "
+                             "(défaut : estimée à partir des données)")
+    parser.add_argument('--jobs', '-j', type=parse_workers, default=1,
+                        help="Nombre de processus (0 = tous les cœurs)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Ignorer le cache des fichiers déjà analysés")
+    parser.add_argument('--no-plots', action='store_true',
+                        help="Tables seulement, sans petits multiples (matplotlib n'est pas importé)")
+    parser.add_argument('--output-dir', '-o', default='graphs',
+                        help="Dossier des tables CSV et des graphiques (défaut: graphs)")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.setup(args)
+
+    dimensions = [name for name in args.by.split(',') if name]
+    unknown = set(dimensions) - set(DIMENSIONS)
+    if unknown:
+        print(f"Dimensions inconnues : {', '.join(sorted(unknown))}")
+        sys.exit(1)
+
+    csv_paths = csv_files(args.paths)
+    if not csv_paths:
+        print(f"Aucun fichier CSV trouvé dans {', '.join(args.paths)}")
+        sys.exit(1)
+    use_cache = not args.no_cache
+
+    # Journal d'analyse des fichiers (lignes invalides) masqué, comme pour streaming_stats
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        totals = accumulate_files(csv_paths, args.period, use_cache, args.jobs)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for dimension in dimensions:
+        if totals[dimension] is None:
+            print("Aucune donnée valide trouvée.")
+            return
+        table = finalize(totals[dimension])
+        table_path = os.path.join(args.output_dir, f"breakdown_{dimension}.csv")
+        table.to_csv(table_path)
+        ranked = worst(table, args.worst, args.rank_by)
+
+        label = 'nœuds' if dimension == 'node' else 'passerelles'
+        print(f"\n{len(ranked)} pires {label} sur {len(table)} (classés par {args.rank_by}) :")
+        columns = ['messages', 'lost', 'delivery_rate', 'max_burst', 'snr_mean', 'rssi_mean']
+        if 'mean_gateways' in ranked.columns:
+            columns.append('mean_gateways')
+        print(ranked[columns].round(2).to_string())
+        print(f"Table complète : {table_path}")
+
+        if not args.no_plots and not ranked.empty:
+            with profiling.stage('offender_rows', dimension=dimension) as info, \
+                    open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                rows = offender_rows(csv_paths, DIMENSIONS[dimension], ranked.index, use_cache)
+                info['rows'] = 0 if rows is None else len(rows)
+            output_path = plot_worst(rows, dimension, ranked, args.output_dir, args.rank_by)
+            print(f"Petits multiples : {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,305 +1,595 @@
 import os
+import sys
+import html
+import json
+import string
+import argparse
+import contextlib
+import functools
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import re
 from datetime import datetime
 
+from experiment_cache import load_experiment
+from loss_accounting import delivery_stats
+from analyse_csv_lorawan import parse_csv_file, parse_experiment, _parse_line, _pyplot, write_metrics
+from dataset import build_index, parse_filename
+from grouped_bars import bar_matrix, draw_grouped_bars, draw_facets
+from streaming_stats import accumulate_files
+from uplink_dedup import deduplicate_uplinks
+import profiling
+
 def extract_metadata(filename):
-    """Extrait les métadonnées du nom de fichier"""
-    pattern = r'received_data_experience-\d{2}-\d{2}-\d{4}_\d{2}h\d{2}-\d{2}h\d{2}_SF(\d+)_BW(\d+)_CR(\d+)_(\d+)\.csv'
-    match = re.search(pattern, filename)
-    if match:
-        sf, bw, cr, payload = match.groups()
+    """Extrait les métadonnées du nom de fichier (voir dataset.parse_filename)"""
+    metadata = parse_filename(filename)
+    if metadata:
         return {
-            'SF': int(sf),
-            'BW': int(bw),
-            'CR': int(cr),
-            'Payload': int(payload),
-            'File': filename
+            'SF': metadata['sf'],
+            'BW': metadata['bw'],
+            'CR': metadata['cr'],
+            'Payload': metadata['payload'],
+            'File': os.path.basename(filename)
         }
     return None
 
-def analyze_data_files(directory):
-    """Analyse tous les fichiers CSV du répertoire et retourne un DataFrame avec les résultats"""
+def count_deliveries(csv_path, period=None):
+    """Compte les messages reçus, attendus et perdus d'un fichier
+    
+    Les messages attendus sont déduits des trous de la séquence reçue
+    (voir loss_accounting), period étant la période d'émission en secondes
+    (estimée à partir des données si None). Les réceptions d'un même uplink
+    par plusieurs passerelles ne comptent qu'une fois (voir uplink_dedup).
+    """
+    df = parse_csv_file(csv_path)
+    if df is None:
+        return None
+    losses = delivery_stats(deduplicate_uplinks(df), period)
+    return pd.DataFrame({
+        'Messages_Received': [losses['messages_received']],
+        'Messages_Expected': [losses['messages_expected']],
+        'Max_Burst': [losses['max_burst']]
+    })
+
+# Taille des blocs binaires lus par le comptage rapide
+COUNT_CHUNK_SIZE = 1 << 24
+# Octets lus en fin de fichier pour retrouver la dernière ligne
+TAIL_SIZE = 1 << 16
+
+def count_lines(csv_path, chunk_size=COUNT_CHUNK_SIZE):
+    """Compte les lignes de données d'un CSV (en-tête exclu) sans décoder le texte
+    
+    Le fichier est lu par grands blocs binaires dans un tampon réutilisé et
+    les fins de ligne sont comptées par bytearray.count. Les lignes vides
+    ou invalides sont comptées : c'est une borne haute du nombre de messages.
+    """
+    lines = 0
+    last = b'\n'
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(csv_path, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            lines += buffer.count(b'\n', 0, size)
+            last = view[size - 1:size].tobytes()
+    # Dernière ligne sans fin de ligne
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+def _edge_times(csv_path):
+    """Horodatages de la première et de la dernière ligne valides, sans lire le reste du fichier"""
+    with open(csv_path, 'rb') as f:
+        f.readline()
+        data_start = f.tell()
+        head = f.read(TAIL_SIZE).decode('utf-8', errors='replace').split('\n')
+        tail_start = max(data_start, os.path.getsize(csv_path) - TAIL_SIZE)
+        f.seek(tail_start)
+        tail = f.read().decode('utf-8', errors='replace').split('\n')
+    # Seules les lignes complètes des deux extrémités sont examinées (mêmes règles que parse_csv_file)
+    if tail_start > data_start:
+        tail = tail[1:]
+    candidates = (head[:-1] or head, tail[::-1])
+    times = []
+    for lines in candidates:
+        entry = next((entry for entry, _ in map(_parse_line, lines, range(len(lines))) if entry), None)
+        if entry is None:
+            return None
+        times.append(pd.to_datetime(entry['time']))
+    return times
+
+def count_deliveries_fast(csv_path, period=None):
+    """Comptage rapide d'un fichier : lignes de données et messages attendus
+    
+    Les messages reçus sont le nombre de lignes de données (voir count_lines),
+    soit des réceptions : un uplink reçu par plusieurs passerelles compte
+    plusieurs fois.
+    Avec period, les messages attendus sont déduits de la durée entre la
+    première et la dernière ligne ; sans period, ni les messages attendus ni
+    les rafales ne sont connus (NaN).
+    """
+    received = count_lines(csv_path)
+    expected = np.nan
+    if period and received:
+        times = _edge_times(csv_path)
+        if times:
+            span = (times[1] - times[0]).total_seconds()
+            expected = max(int(np.rint(span / period)) + 1, received)
+    return pd.DataFrame({
+        'Messages_Received': [received],
+        'Messages_Expected': [expected],
+        'Max_Burst': [np.nan]
+    })
+
+# Modes de comptage : 'accurate' applique les règles de parse_csv_file et
+# détecte les pertes, 'fast' compte les lignes du fichier
+COUNT_MODES = {
+    'accurate': count_deliveries,
+    'fast': count_deliveries_fast
+}
+
+def analyze_data_files(directory, use_cache=True, period=None, count_mode='accurate'):
+    """Analyse tous les fichiers CSV du répertoire et retourne un DataFrame avec les résultats
+    
+    directory peut être un dossier de campagne (ex: Data/Max) ou la racine des
+    données (Data) : les campagnes sont alors toutes indexées en un seul
+    parcours (voir dataset.build_index) et distinguées par la colonne Power.
+    
+    Le mode 'accurate' compte les messages retenus par parse_csv_file (les
+    mêmes que l'analyse par fichier) ; le mode 'fast' compte les lignes sans
+    les analyser (voir count_deliveries_fast).
+    
+    Avec use_cache, le comptage exact n'est refait que pour les fichiers
+    modifiés depuis la dernière exécution (voir experiment_cache). Le
+    comptage rapide, plus court que la vérification du cache, n'est pas mis
+    en cache.
+    """
+    counter = functools.partial(COUNT_MODES[count_mode], period=period)
+    namespace = 'count_uplinks_v2' if period is None else f'count_uplinks_v2-{period}'
+    use_cache = use_cache and count_mode == 'accurate'
     results = []
     
-    for filename in os.listdir(directory):
-        if filename.endswith('.csv'):
-            metadata = extract_metadata(filename)
-            if not metadata:
-                continue
-                
-            # Compter le nombre de lignes dans le fichier (moins l'en-tête)
-            with open(os.path.join(directory, filename), 'r') as f:
-                line_count = sum(1 for _ in f) - 1
-                
-            # Ajouter les résultats
-            results.append({
-                'SF': metadata['SF'],
-                'BW': metadata['BW'],
-                'CR': metadata['CR'],
-                'Payload': metadata['Payload'],
-                'Messages_Received': line_count,
-                'File': metadata['File']
-            })
+    index = build_index(directory)
+    for (power, sf, bw, cr, payload, _), entry in index.iterrows():
+        # Compter les messages reçus et attendus
+        with profiling.stage('count', file=entry['file'], mode=count_mode) as info:
+            counts = load_experiment(entry['path'], counter, namespace) if use_cache else counter(entry['path'])
+            info['rows'] = 0 if counts is None else counts['Messages_Received'].iloc[0]
+        if counts is None:
+            continue
+            
+        # Ajouter les résultats
+        results.append({
+            'Power': power,
+            'SF': sf,
+            'BW': bw,
+            'CR': cr,
+            'Payload': payload,
+            'Messages_Received': counts['Messages_Received'].iloc[0],
+            'Messages_Expected': counts['Messages_Expected'].iloc[0],
+            'Max_Burst': counts['Max_Burst'].iloc[0],
+            'File': entry['file']
+        })
     
     return pd.DataFrame(results)
 
+def signal_statistics(directory, use_cache=True):
+    """Statistiques SNR/RSSI par niveau de puissance et par SF (moyenne, écart-type, extrêmes, percentiles)
+    
+    Les fichiers sont parcourus un à un et leurs accumulateurs fusionnés
+    (voir streaming_stats) : seule l'expérience en cours est en mémoire.
+    """
+    parser = functools.partial(load_experiment, parser=parse_experiment) if use_cache else parse_experiment
+    summaries = []
+    index = build_index(directory)
+    for power, entries in index.groupby(level='power', sort=True):
+        summary = accumulate_files(list(entries['path']), parser).summary(('sf',)).reset_index()
+        summary.insert(0, 'power', power)
+        summaries.append(summary)
+    if not summaries:
+        return pd.DataFrame()
+    return pd.concat(summaries, ignore_index=True).set_index(['power', 'sf'])
+
+def delivery_rate(df):
+    """Taux de livraison (%) de chaque expérience, NaN si ses messages attendus sont inconnus"""
+    return (df['Messages_Received'] / df['Messages_Expected']) * 100
+
+def combined_counts(df):
+    """Totaux de toutes les expériences : taux global inconnu si l'un des nombres attendus l'est"""
+    if df.empty:
+        return {'Experiments': 0}
+    received = df['Messages_Received'].sum()
+    expected = df['Messages_Expected'].sum(min_count=len(df))
+    return {
+        'Experiments': len(df),
+        'Messages_Received': received,
+        'Messages_Expected': expected,
+        'Delivery_Rate': received / expected * 100 if expected else np.nan,
+        'Max_Burst': df['Max_Burst'].max()
+    }
+
 def generate_summary_plots(df, output_dir='graphs'):
     """Génère des graphiques de synthèse"""
+    plt = _pyplot()
     os.makedirs(output_dir, exist_ok=True)
     
-    # Calculer le taux de livraison (on suppose 200 messages attendus par expérience)
-    df['Delivery_Rate'] = (df['Messages_Received'] / 200) * 100
-    
-    # Trier par SF et par taille de payload
-    df_sorted = df.sort_values(['SF', 'Payload'])
+    # Calculer le taux de livraison à partir des messages attendus de chaque expérience
+    df['Delivery_Rate'] = delivery_rate(df)
     
-    # 1. Graphique à barres groupées du PDR
-    plt.figure(figsize=(14, 8))
+    # Une sous-figure par niveau de puissance lorsque plusieurs campagnes sont analysées ensemble
+    facets = ['Power'] if 'Power' in df.columns and df['Power'].nunique() > 1 else []
+    n_facets = df['Power'].nunique() if facets else 1
     
-    # Paramètres du graphique
-    bar_width = 0.25
-    index = range(len(df['SF'].unique()))
-    colors = ['#1f77b4', '#ff7f0e', '#2ca02c']  # Bleu, Orange, Vert
+    # Comptage rapide sans période : messages attendus inconnus, seuls les messages reçus sont tracés
+    with_rate = df['Delivery_Rate'].notna().any()
+    if not with_rate:
+        print("Messages attendus inconnus (comptage rapide sans --period) : graphiques du PDR non générés")
     
-    # Créer les barres groupées pour chaque taille de payload
-    for i, payload in enumerate(sorted(df['Payload'].unique())):
-        payload_data = df_sorted[df_sorted['Payload'] == payload]
-        positions = [x + i * bar_width for x in index]
+    # 1. Graphique à barres groupées du PDR (matrice SF x payload construite en un seul pivot)
+    if with_rate:
+        matrix = bar_matrix(df, 'SF', 'Payload', 'Delivery_Rate', facets)
+        fig = plt.figure(figsize=(14 * n_facets, 8))
         
-        bars = plt.bar(
-            positions,
-            payload_data['Delivery_Rate'],
-            bar_width,
-            label=f'{payload} octets',
-            color=colors[i],
-            edgecolor='black',
-            linewidth=0.7,
-            alpha=0.8
-        )
+        def draw_delivery_rate(ax, sub, title):
+            draw_grouped_bars(ax, sub, series_label='{} octets')
+            ax.set_xlabel('Spreading Factor (SF)', fontsize=12, labelpad=10)
+            ax.set_ylabel('Taux de livraison (%)', fontsize=12, labelpad=10)
+            if title:
+                ax.set_title(f'Puissance {title}', fontsize=12)
+            
+            # Ajouter une grille pour une meilleure lisibilité
+            ax.grid(axis='y', linestyle='--', alpha=0.5, color='gray')
+            
+            # Ajuster les limites de l'axe Y
+            ax.set_ylim(0, 110)  # 0-100% avec un peu de marge pour les étiquettes
+            
+            # Ajouter un fond de couleur légèrement gris pour les barres
+            ax.set_facecolor('#f9f9f9')
         
-        # Ajouter les valeurs sur les barres
-        for bar in bars:
-            height = bar.get_height()
-            plt.text(
-                bar.get_x() + bar.get_width()/2.,
-                height + 1,  # Légèrement au-dessus de la barre
-                f'{height:.1f}%',
-                ha='center',
-                va='bottom',
-                fontsize=9,
-                fontweight='bold'
-            )
-    
-    # Configuration du graphique
-    plt.xlabel('Spreading Factor (SF)', fontsize=12, labelpad=10)
-    plt.ylabel('Taux de livraison (%)', fontsize=12, labelpad=10)
-    plt.title('Taux de livraison (PDR) par Spreading Factor et taille de payload', 
-              fontsize=14, fontweight='bold', pad=20)
-    
-    # Définir les étiquettes de l'axe X (SF)
-    plt.xticks([x + bar_width for x in index], sorted(df['SF'].unique()))
-    
-    # Ajouter une légende
-    plt.legend(title='Taille de la payload', bbox_to_anchor=(1.05, 1), loc='upper left')
-    
-    # Ajouter une grille pour une meilleure lisibilité
-    plt.grid(axis='y', linestyle='--', alpha=0.5, color='gray')
-    
-    # Ajuster les limites de l'axe Y
-    plt.ylim(0, 110)  # 0-100% avec un peu de marge pour les étiquettes
-    
-    # Ajouter un fond de couleur légèrement gris pour les barres
-    plt.gca().set_facecolor('#f9f9f9')
-    
-    # Ajuster les marges
-    plt.tight_layout()
-    
-    # Sauvegarder le graphique
-    plt.savefig(os.path.join(output_dir, 'delivery_rate_summary.png'), dpi=150, bbox_inches='tight')
-    plt.close()
+        axes = draw_facets(fig, matrix, len(facets), draw_delivery_rate)
+        fig.suptitle('Taux de livraison (PDR) par Spreading Factor et taille de payload', 
+                     fontsize=14, fontweight='bold')
+        
+        # Ajouter une légende
+        axes[-1].legend(title='Taille de la payload', bbox_to_anchor=(1.05, 1), loc='upper left')
+        
+        # Ajuster les marges
+        plt.tight_layout()
+        
+        # Sauvegarder le graphique
+        with profiling.stage('savefig', chart='delivery_rate_summary.png'):
+            plt.savefig(os.path.join(output_dir, 'delivery_rate_summary.png'), dpi=150, bbox_inches='tight')
+        plt.close()
     
     # 2. Nombre de messages reçus par configuration
-    plt.figure(figsize=(14, 8))
-    
-    # Créer des barres groupées par SF et par taille de payload
-    bar_width = 0.25
-    index = range(len(df['SF'].unique()))
-    
-    for i, payload in enumerate(sorted(df['Payload'].unique())):
-        payload_data = df[df['Payload'] == payload]
-        plt.bar([x + i*bar_width for x in index], 
-                payload_data['Messages_Received'], 
-                bar_width, 
-                label=f'{payload} octets')
-    
-    plt.xlabel('Spreading Factor (SF)')
-    plt.ylabel('Nombre de messages reçus')
-    plt.title('Nombre de messages reçus par configuration')
-    plt.xticks([x + bar_width for x in index], sorted(df['SF'].unique()))
-    plt.legend()
-    plt.grid(True, linestyle='--', alpha=0.6, axis='y')
+    matrix = bar_matrix(df, 'SF', 'Payload', 'Messages_Received', facets)
+    fig = plt.figure(figsize=(14 * n_facets, 8))
+    
+    def draw_messages_received(ax, sub, title):
+        # Créer des barres groupées par SF et par taille de payload
+        draw_grouped_bars(ax, sub, series_label='{} octets', value_format='{:.0f}')
+        ax.set_xlabel('Spreading Factor (SF)')
+        ax.set_ylabel('Nombre de messages reçus')
+        if title:
+            ax.set_title(f'Puissance {title}')
+        ax.grid(True, linestyle='--', alpha=0.6, axis='y')
+    
+    axes = draw_facets(fig, matrix, len(facets), draw_messages_received)
+    fig.suptitle('Nombre de messages reçus par configuration')
+    axes[-1].legend()
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'messages_received_summary.png'), dpi=150, bbox_inches='tight')
+    with profiling.stage('savefig', chart='messages_received_summary.png'):
+        plt.savefig(os.path.join(output_dir, 'messages_received_summary.png'), dpi=150, bbox_inches='tight')
     plt.close()
     
     # 3. Tableau récapitulatif
-    summary_df = df.pivot_table(
-        index=['SF', 'BW', 'CR'],
-        columns='Payload',
-        values='Delivery_Rate',
-        aggfunc='first'
-    ).round(1)
-    
-    # Sauvegarder le tableau récapitulatif
-    plt.figure(figsize=(12, 6))
-    ax = plt.subplot(111, frame_on=False)
-    ax.xaxis.set_visible(False)
-    ax.yaxis.set_visible(False)
-    
-    # Créer le tableau
-    table = plt.table(
-        cellText=summary_df.values,
-        rowLabels=summary_df.index.map(lambda x: f"SF{x[0]} BW{x[1]} CR{x[2]}"),
-        colLabels=[f"{col} octets" for col in summary_df.columns],
-        cellLoc='center',
-        loc='center',
-        colColours=['#f3f3f3']*len(summary_df.columns),
-        rowColours=['#f3f3f3']*len(summary_df)
-    )
-    
-    table.auto_set_font_size(False)
-    table.set_fontsize(10)
-    table.scale(1.2, 1.5)
-    
-    plt.title('Taux de livraison (%) par configuration', y=0.8, pad=20)
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'delivery_rate_table.png'), dpi=150, bbox_inches='tight')
-    plt.close()
+    if with_rate:
+        summary_df = df.pivot_table(
+            index=['Power', 'SF', 'BW', 'CR'],
+            columns='Payload',
+            values='Delivery_Rate',
+            aggfunc='first'
+        ).round(1)
+        
+        # Sauvegarder le tableau récapitulatif
+        plt.figure(figsize=(12, 6))
+        ax = plt.subplot(111, frame_on=False)
+        ax.xaxis.set_visible(False)
+        ax.yaxis.set_visible(False)
+        
+        # Créer le tableau
+        table = plt.table(
+            cellText=summary_df.values,
+            rowLabels=summary_df.index.map(lambda x: f"{x[0]} SF{x[1]} BW{x[2]} CR{x[3]}"),
+            colLabels=[f"{col} octets" for col in summary_df.columns],
+            cellLoc='center',
+            loc='center',
+            colColours=['#f3f3f3']*len(summary_df.columns),
+            rowColours=['#f3f3f3']*len(summary_df)
+        )
+        
+        table.auto_set_font_size(False)
+        table.set_fontsize(10)
+        table.scale(1.2, 1.5)
+        
+        plt.title('Taux de livraison (%) par configuration', y=0.8, pad=20)
+        plt.tight_layout()
+        with profiling.stage('savefig', chart='delivery_rate_table.png'):
+            plt.savefig(os.path.join(output_dir, 'delivery_rate_table.png'), dpi=150, bbox_inches='tight')
+        plt.close()
 
-def generate_html_report(df, output_dir='graphs'):
-    """Génère un rapport HTML"""
-    date_str = datetime.now().strftime("%d/%m/%Y à %H:%M")
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Rapport d'analyse LoRaWAN</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; margin: 20px; line-height: 1.6; }}
-            h1, h2, h3 {{ color: #2c3e50; }}
-            .container {{ max-width: 1200px; margin: 0 auto; }}
-            .summary {{ background-color: #f9f9f9; padding: 20px; border-radius: 5px; margin-bottom: 20px; }}
-            .images {{ display: flex; flex-wrap: wrap; gap: 20px; margin: 20px 0; }}
-            .image-container {{ flex: 1; min-width: 300px; }}
-            .image-container img {{ max-width: 100%; height: auto; border: 1px solid #ddd; border-radius: 4px; }}
-            .image-container p {{ text-align: center; font-style: italic; color: #666; }}
-            table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-            th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-            th {{ background-color: #f2f2f2; }}
-            tr:nth-child(even) {{ background-color: #f9f9f9; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Rapport d'analyse LoRaWAN</h1>
-            <p>Généré le {date_str}</p>
-            
-            <div class="summary">
-                <h2>Résumé des configurations testées</h2>
-                <p>Nombre total d'expériences analysées : {len(df)}</p>
-                <p>Spreading Factors testés : {', '.join(map(str, sorted(df['SF'].unique())))}</p>
-                <p>Tailles de payload testées : {', '.join(map(str, sorted(df['Payload'].unique())))} octets</p>
-            </div>
-            
-            <h2>1. Taux de livraison par configuration</h2>
-            <div class="images">
-                <div class="image-container">
-                    <img src="delivery_rate_summary.png" alt="Taux de livraison">
-                    <p>Figure 1: Taux de livraison par Spreading Factor et taille de payload</p>
-                </div>
+# Colonnes du tableau des expériences : (colonnes du payload JSON, en-tête, format d'affichage)
+REPORT_COLUMNS = [
+    (('Power',), 'Puissance', 'text'),
+    (('File',), 'Fichier', 'text'),
+    (('SF',), 'SF', 'int'),
+    (('BW',), 'BW', 'int'),
+    (('CR',), 'CR', 'text'),
+    (('Payload',), 'Payload (octets)', 'int'),
+    (('Messages_Received', 'Messages_Expected'), 'Messages reçus', 'ratio'),
+    (('Delivery_Rate',), 'Taux de livraison', 'percent'),
+    (('Max_Burst',), 'Plus longue rafale de pertes', 'int')
+]
+# Lignes sérialisées et écrites à la fois dans le payload JSON du rapport
+REPORT_CHUNK_ROWS = 1000
+# Lignes affichées par page du tableau
+REPORT_PAGE_SIZE = 50
+
+# Gabarits du rapport (string.Template : les accolades du CSS n'ont pas à être doublées)
+REPORT_HEAD = string.Template("""<!DOCTYPE html>
+<html lang="fr">
+<head>
+    <meta charset="utf-8">
+    <title>Rapport d'analyse LoRaWAN</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; line-height: 1.6; }
+        h1, h2, h3 { color: #2c3e50; }
+        .container { max-width: 1200px; margin: 0 auto; }
+        .summary { background-color: #f9f9f9; padding: 20px; border-radius: 5px; margin-bottom: 20px; }
+        .images { display: flex; flex-wrap: wrap; gap: 20px; margin: 20px 0; }
+        .image-container { flex: 1; min-width: 300px; }
+        .image-container img { max-width: 100%; height: auto; border: 1px solid #ddd; border-radius: 4px; }
+        .image-container p { text-align: center; font-style: italic; color: #666; }
+        table { width: 100%; border-collapse: collapse; margin: 20px 0; }
+        th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+        th { background-color: #f2f2f2; cursor: pointer; user-select: none; }
+        th[aria-sort="ascending"]::after { content: " \\25B2"; }
+        th[aria-sort="descending"]::after { content: " \\25BC"; }
+        tr:nth-child(even) { background-color: #f9f9f9; }
+        .pager { display: flex; gap: 10px; align-items: center; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>Rapport d'analyse LoRaWAN</h1>
+        <p>Généré le $date</p>
+
+        <div class="summary">
+            <h2>Résumé des configurations testées</h2>
+            <p>Nombre total d'expériences analysées : $experiments</p>
+            <p>Puissances d'émission : $powers</p>
+            <p>Spreading Factors testés : $sfs</p>
+            <p>Tailles de payload testées : $payloads octets</p>
+        </div>
+
+        <h2>1. Taux de livraison par configuration</h2>
+        <div class="images">
+            <div class="image-container">
+                <img src="delivery_rate_summary.png" alt="Taux de livraison" loading="lazy" decoding="async">
+                <p>Figure 1: Taux de livraison par Spreading Factor et taille de payload</p>
             </div>
-            
-            <h2>2. Nombre de messages reçus</h2>
-            <div class="images">
-                <div class="image-container">
-                    <img src="messages_received_summary.png" alt="Messages reçus">
-                    <p>Figure 2: Nombre de messages reçus par configuration</p>
-                </div>
+        </div>
+
+        <h2>2. Nombre de messages reçus</h2>
+        <div class="images">
+            <div class="image-container">
+                <img src="messages_received_summary.png" alt="Messages reçus" loading="lazy" decoding="async">
+                <p>Figure 2: Nombre de messages reçus par configuration</p>
             </div>
-            
-            <h2>3. Tableau récapitulatif</h2>
-            <div class="images">
-                <div class="image-container">
-                    <img src="delivery_rate_table.png" alt="Tableau récapitulatif">
-                    <p>Figure 3: Taux de livraison (%) par configuration</p>
-                </div>
+        </div>
+
+        <h2>3. Tableau récapitulatif</h2>
+        <div class="images">
+            <div class="image-container">
+                <img src="delivery_rate_table.png" alt="Tableau récapitulatif" loading="lazy" decoding="async">
+                <p>Figure 3: Taux de livraison (%) par configuration</p>
             </div>
-            
-            <h2>4. Détails par expérience</h2>
-            <table>
-                <tr>
-                    <th>Fichier</th>
-                    <th>SF</th>
-                    <th>BW</th>
-                    <th>CR</th>
-                    <th>Payload (octets)</th>
-                    <th>Messages reçus</th>
-                    <th>Taux de livraison</th>
-                </tr>
+        </div>
+
+        <h2>4. Détails par expérience</h2>
+        <table id="experiments">
+            <thead><tr>$headers</tr></thead>
+            <tbody></tbody>
+        </table>
+        <div class="pager">
+            <button type="button" id="previous">Précédent</button>
+            <span id="page"></span>
+            <button type="button" id="next">Suivant</button>
+        </div>
+        <noscript><p>Le tableau des expériences nécessite JavaScript.</p></noscript>
+        <script type="application/json" id="experiments-data">{"columns":$columns,"rows":[""")
+
+REPORT_TAIL = string.Template("""]}</script>
+        <script>
+        (function () {
+            var data = JSON.parse(document.getElementById('experiments-data').textContent);
+            var spec = $spec;
+            var pageSize = $page_size;
+            var index = {};
+            data.columns.forEach(function (name, i) { index[name] = i; });
+            var rows = data.rows, page = 0, sortColumn = null, direction = 1;
+            var body = document.querySelector('#experiments tbody');
+            var headers = document.querySelectorAll('#experiments th');
+
+            function format(value, kind) {
+                if (value === null) return '-';
+                if (kind === 'percent') return value.toFixed(1) + '%';
+                if (kind === 'int' || kind === 'ratio') return Math.round(value).toString();
+                return String(value);
+            }
+
+            function cell(row, column) {
+                var values = column.fields.map(function (name) { return row[index[name]]; });
+                return values.map(function (value) { return format(value, column.kind); }).join('/');
+            }
+
+            function render() {
+                var pages = Math.max(1, Math.ceil(rows.length / pageSize));
+                page = Math.min(page, pages - 1);
+                var fragment = document.createDocumentFragment();
+                rows.slice(page * pageSize, (page + 1) * pageSize).forEach(function (row) {
+                    var tr = document.createElement('tr');
+                    spec.forEach(function (column) {
+                        var td = document.createElement('td');
+                        td.textContent = cell(row, column);
+                        tr.appendChild(td);
+                    });
+                    fragment.appendChild(tr);
+                });
+                body.replaceChildren(fragment);
+                document.getElementById('page').textContent =
+                    'Page ' + (page + 1) + ' / ' + pages + ' (' + rows.length + ' expériences)';
+                document.getElementById('previous').disabled = page === 0;
+                document.getElementById('next').disabled = page >= pages - 1;
+            }
+
+            headers.forEach(function (th, i) {
+                th.addEventListener('click', function () {
+                    direction = sortColumn === i ? -direction : 1;
+                    sortColumn = i;
+                    var key = index[spec[i].fields[0]];
+                    // Valeurs inconnues toujours en fin de tableau
+                    rows = rows.slice().sort(function (a, b) {
+                        if (a[key] === b[key]) return 0;
+                        if (a[key] === null) return 1;
+                        if (b[key] === null) return -1;
+                        return (a[key] < b[key] ? -1 : 1) * direction;
+                    });
+                    headers.forEach(function (other) { other.removeAttribute('aria-sort'); });
+                    th.setAttribute('aria-sort', direction === 1 ? 'ascending' : 'descending');
+                    page = 0;
+                    render();
+                });
+            });
+            document.getElementById('previous').addEventListener('click', function () { page -= 1; render(); });
+            document.getElementById('next').addEventListener('click', function () { page += 1; render(); });
+            render();
+        })();
+        </script>
+
+        <div class="footer" style="margin-top: 50px; padding-top: 20px; border-top: 1px solid #eee; text-align: center; color: #777; font-size: 0.9em;">
+            <p>Rapport généré automatiquement</p>
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+def _json_chunk(values):
+    """Sérialise compactement une liste pour l'inclure dans une balise <script> du rapport"""
+    # '</' échappé : un nom de fichier ne peut pas fermer la balise
+    return json.dumps(values, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+def generate_html_report(df, output_dir='graphs'):
+    """Génère un rapport HTML
+    
+    Le document est écrit en flux à partir des gabarits REPORT_HEAD et
+    REPORT_TAIL : les lignes du tableau des expériences forment un payload
+    JSON compact (une liste de valeurs par expérience), sérialisé et écrit
+    par blocs de REPORT_CHUNK_ROWS lignes. Le navigateur n'affiche qu'une
+    page de REPORT_PAGE_SIZE lignes à la fois, triable par colonne ; les
+    graphiques sont chargés à l'affichage (loading="lazy").
     """
+    # Colonne Power absente : une seule campagne, non distinguée
+    columns = [column for column in REPORT_COLUMNS if all(name in df.columns for name in column[0])]
+    fields = [name for names, _, _ in columns for name in names]
+    spec = [{'fields': list(names), 'kind': kind} for names, _, kind in columns]
+    headers = ''.join(f"<th>{html.escape(label)}</th>" for _, label, _ in columns)
     
-    # Trier les données par SF et par taille de payload
-    df_sorted = df.sort_values(['SF', 'Payload'])
-    
-    # Ajouter les lignes du tableau
-    for _, row in df_sorted.iterrows():
-        html_content += f"""
-                <tr>
-                    <td>{row['File']}</td>
-                    <td>{row['SF']}</td>
-                    <td>{row['BW']}</td>
-                    <td>{row['CR']}</td>
-                    <td>{row['Payload']}</td>
-                    <td>{row['Messages_Received']}/200</td>
-                    <td>{row['Delivery_Rate']:.1f}%</td>
-                </tr>
-        """
+    # Trier les données par puissance, SF et taille de payload
+    df_sorted = df.sort_values([name for name in ('Power', 'SF', 'Payload') if name in df.columns])[fields]
     
-    # Fin du document HTML
-    html_content += """
-            </table>
-            
-            <div class="footer" style="margin-top: 50px; padding-top: 20px; border-top: 1px solid #eee; text-align: center; color: #777; font-size: 0.9em;">
-                <p>Rapport généré automatiquement</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """.format(date=datetime.now().strftime("%d/%m/%Y à %H:%M"))
-    
-    # Écrire le fichier HTML
     with open(os.path.join(output_dir, 'lorawan_analysis_report.html'), 'w', encoding='utf-8') as f:
-        f.write(html_content)
+        f.write(REPORT_HEAD.substitute(
+            date=datetime.now().strftime("%d/%m/%Y à %H:%M"),
+            experiments=len(df),
+            powers=html.escape(', '.join(map(str, sorted(df['Power'].unique()))) if 'Power' in df.columns else '-'),
+            sfs=html.escape(', '.join(map(str, sorted(df['SF'].unique())))),
+            payloads=html.escape(', '.join(map(str, sorted(df['Payload'].unique())))),
+            headers=headers,
+            columns=_json_chunk(fields)
+        ))
+        
+        # Lignes du tableau, bloc par bloc : valeurs natives, inconnues à null (ex: comptage rapide)
+        for start in range(0, len(df_sorted), REPORT_CHUNK_ROWS):
+            chunk = df_sorted.iloc[start:start + REPORT_CHUNK_ROWS].astype(object)
+            rows = chunk.where(chunk.notna(), None).to_numpy().tolist()
+            f.write((',' if start else '') + _json_chunk(rows)[1:-1])
+        
+        f.write(REPORT_TAIL.substitute(spec=_json_chunk(spec), page_size=REPORT_PAGE_SIZE))
 
 def main():
+    parser = argparse.ArgumentParser(description="Génération du rapport de synthèse LoRaWAN")
+    parser.add_argument('directory', nargs='?', default='Data/Max',
+                        help="Dossier contenant les fichiers CSV (défaut: Data/Max)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Ignorer le cache des fichiers déjà analysés")
+    parser.add_argument('--period', type=float, default=None,
+                        help="Période d'émission en secondes pour le calcul des pertes "
+                             "(défaut : estimée à partir des données)")
+    parser.add_argument('--count-mode', choices=sorted(COUNT_MODES), default='accurate',
+                        help="Comptage des messages : 'accurate' (règles de parse_csv_file et "
+                             "détection des pertes, défaut) ou 'fast' (lignes du fichier, sans "
+                             "analyse ; messages attendus estimés seulement avec --period)")
+    parser.add_argument('--stats-only', action='store_true',
+                        help="Écrire seulement les métriques par expérience et combinées, sans graphique "
+                             "ni rapport HTML (matplotlib n'est pas importé)")
+    parser.add_argument('--output', '-o',
+                        help="Avec --stats-only, fichier de sortie des métriques (.csv ou .json ; "
+                             "défaut: JSON sur la sortie standard)")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.setup(args)
+    
     # Répertoire contenant les données
-    data_dir = 'Data/Max'
+    data_dir = args.directory
     output_dir = 'graphs'
     
+    if args.stats_only:
+        # Métriques sur la sortie standard : le journal est renvoyé sur la sortie d'erreur
+        log = sys.stderr if not args.output else sys.stdout
+        with contextlib.redirect_stdout(log):
+            print(f"Analyse des fichiers dans {data_dir}...")
+            with profiling.stage('analyze_data_files'):
+                df = analyze_data_files(data_dir, not args.no_cache, args.period, args.count_mode)
+        if not df.empty:
+            df['Delivery_Rate'] = delivery_rate(df)
+        write_metrics(df.to_dict('records'), combined_counts(df), args.output)
+        return
+    
     # Analyser les fichiers
     print(f"Analyse des fichiers dans {data_dir}...")
-    df = analyze_data_files(data_dir)
+    with profiling.stage('analyze_data_files'):
+        df = analyze_data_files(data_dir, not args.no_cache, args.period, args.count_mode)
     
     # Générer les graphiques de synthèse
     print("\nGénération des graphiques de synthèse...")
-    generate_summary_plots(df, output_dir)
+    with profiling.stage('summary_plots'):
+        generate_summary_plots(df, output_dir)
     
     # Générer le rapport HTML
     print("Génération du rapport HTML...")
-    generate_html_report(df, output_dir)
+    with profiling.stage('html', rows=len(df)):
+        generate_html_report(df, output_dir)
+    
+    # Statistiques SNR/RSSI de la campagne
+    print("Calcul des statistiques SNR/RSSI par SF...")
+    with profiling.stage('signal_stats'):
+        signal_stats = signal_statistics(data_dir, not args.no_cache)
+    if not signal_stats.empty:
+        signal_stats.round(2).to_csv(os.path.join(output_dir, 'signal_stats_by_sf.csv'))
+        print(signal_stats.round(1).to_string())
     
     print(f"\nAnalyse terminée. Le rapport est disponible dans {output_dir}/lorawan_analysis_report.html")
 
@@ -0,0 +1,90 @@
+import numpy as np
+
+
+# Styles historiques des tailles de payload des campagnes, conservés pour la lisibilité des rapports
+PAYLOAD_COLORS = {20: '#1f77b4', 50: '#ff7f0e', 80: '#d62728'}
+PAYLOAD_HATCHES = {20: None, 50: '////', 80: '..'}
+
+# Motifs utilisés au-delà des tailles connues (cycle)
+HATCHES = (None, '////', '..', 'xx', '\\\\', '++', 'oo', '--')
+
+
+def bar_matrix(df, index, columns, values, facets=()):
+    """Matrice (groupes x séries) des valeurs à tracer, construite par un seul pivot
+
+    Les groupes (index) et les séries (columns) sont triés ; les combinaisons
+    absentes valent NaN. Avec facets, l'index de la matrice commence par les
+    colonnes de facette (une sous-figure par valeur, voir draw_facets).
+    """
+    rows = list(facets) + [index]
+    matrix = df.pivot_table(index=rows, columns=columns, values=values, aggfunc='mean', observed=True)
+    return matrix.sort_index().sort_index(axis=1)
+
+
+def series_styles(keys):
+    """Couleur et motif de chaque série : styles historiques pour 20/50/80 octets, palette sinon"""
+    from matplotlib import colormaps
+    palette = colormaps['tab10' if len(keys) <= 10 else 'tab20']
+    styles = {}
+    for i, key in enumerate(keys):
+        styles[key] = {
+            'color': PAYLOAD_COLORS.get(key, palette(i % palette.N)),
+            'hatch': PAYLOAD_HATCHES[key] if key in PAYLOAD_HATCHES else HATCHES[i % len(HATCHES)]
+        }
+    return styles
+
+
+def draw_grouped_bars(ax, matrix, series_label='{}', value_format='{:.1f}%', group_label='{}',
+                      styles=None, bar_kwargs=None, text_kwargs=None):
+    """Trace une matrice (groupes x séries) en barres groupées sur ax
+
+    Un appel ax.bar par série, quel que soit le nombre de groupes ; la largeur
+    des barres s'adapte au nombre de séries. Les cellules NaN ne sont pas
+    tracées. Retourne les positions des groupes.
+    """
+    n_groups, n_series = matrix.shape
+    positions = np.arange(n_groups)
+    width = 0.8 / max(n_series, 1)
+    offsets = (np.arange(n_series) - (n_series - 1) / 2) * width
+    styles = styles or series_styles(list(matrix.columns))
+    bar_kwargs = dict({'edgecolor': 'black', 'linewidth': 0.7, 'alpha': 0.8}, **(bar_kwargs or {}))
+    text_kwargs = dict({'ha': 'center', 'va': 'bottom', 'fontsize': 9, 'fontweight': 'bold'},
+                       **(text_kwargs or {}))
+    values = matrix.to_numpy(dtype=float)
+    # Décalage des étiquettes : 1 % de la plus haute barre
+    label_offset = np.nanmax(values) * 0.01 if np.isfinite(values).any() else 0
+
+    for j, key in enumerate(matrix.columns):
+        present = ~np.isnan(values[:, j])
+        x = positions[present] + offsets[j]
+        heights = values[present, j]
+        ax.bar(x, heights, width=width, label=series_label.format(key), **styles[key], **bar_kwargs)
+        if value_format:
+            # Étiquettes au-dessus des barres
+            for xi, height in zip(x, heights):
+                ax.text(xi, height + label_offset, value_format.format(height), **text_kwargs)
+
+    ax.set_xticks(positions)
+    ax.set_xticklabels([group_label.format(group) for group in matrix.index])
+    return positions
+
+
+def draw_facets(fig, matrix, n_facet_levels, draw, sharey=True):
+    """Une sous-figure par facette d'une matrice issue de bar_matrix(facets=...)
+
+    draw(ax, sous_matrice, titre) trace chaque facette ; les groupes absents
+    d'une facette n'y apparaissent pas. Retourne la liste des axes.
+    """
+    if n_facet_levels == 0:
+        ax = fig.add_subplot()
+        draw(ax, matrix, None)
+        return [ax]
+
+    levels = list(range(n_facet_levels))
+    facets = matrix.groupby(level=levels, sort=True)
+    axes = fig.subplots(1, facets.ngroups, sharey=sharey, squeeze=False)[0]
+    for ax, (key, sub) in zip(axes, facets):
+        key = key if isinstance(key, tuple) else (key,)
+        sub = sub.droplevel(levels).dropna(axis=1, how='all')
+        draw(ax, sub, ' - '.join(str(k) for k in key))
+    return list(axes)
@@ -0,0 +1,469 @@
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import argparse
+import binascii
+from datetime import datetime, timezone
+
+from analyse_csv_lorawan import _parse_line
+from mmap_csv import mapped_file, data_start, iter_lines
+from dataset import csv_files
+
+
+DEFAULT_HOST = '127.0.0.1'
+# Port UDP habituel du packet forwarder Semtech (le port TCP est le même)
+DEFAULT_PORT = 1700
+# Le tampon est écrit sur disque toutes les FLUSH_INTERVAL secondes ou dès FLUSH_ROWS messages
+FLUSH_INTERVAL = 5.0
+FLUSH_ROWS = 50000
+TCP_READ_SIZE = 1 << 16
+# Taille maximale d'un datagramme envoyé par le client de rejeu
+MAX_DATAGRAM = 1400
+# Rejeu Semtech : paquets PUSH_DATA envoyés sans accusé PUSH_ACK au plus, et attente maximale d'un accusé (s)
+ACK_WINDOW = 64
+ACK_TIMEOUT = 1.0
+
+# En-tête et champs des CSV de la passerelle (lus par parse_csv_file)
+CSV_HEADER = 'type;gateway_eui;node_eui;snr;rssi;cr;datarate;time;data,,\n'
+RECORD_FIELDS = ('type', 'gateway_eui', 'node_eui', 'snr', 'rssi', 'cr', 'datarate', 'time', 'data')
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Protocole Semtech (packet forwarder) : version, jeton sur 2 octets, identifiant du paquet
+SEMTECH_VERSIONS = (1, 2)
+PUSH_DATA, PUSH_ACK, PULL_DATA, PULL_ACK = 0x00, 0x01, 0x02, 0x04
+
+
+def parse_csv_record(line):
+    """Enregistrement d'une ligne au format des CSV de la passerelle, ou None si elle est invalide
+
+    Les règles de validité sont celles de parse_csv_file (voir _parse_line) ;
+    le type et le champ data sont conservés tels quels.
+    """
+    entry, _ = _parse_line(line, 0)
+    if entry is None:
+        return None
+    parts = line.strip().strip('"').split(';')
+    entry['type'] = parts[0]
+    entry['data'] = ';'.join(parts[8:])
+    return entry
+
+
+def _rxpk_time(rxpk):
+    """Horodatage d'un paquet reçu au format des CSV (heure de réception du serveur à défaut)"""
+    try:
+        received = datetime.fromisoformat(rxpk['time'].replace('Z', '+00:00'))
+    except (KeyError, TypeError, ValueError):
+        received = datetime.now(timezone.utc)
+    return received.strftime(TIME_FORMAT)
+
+
+def _devaddr(phy_payload):
+    """DevAddr (hex) d'une trame LoRaWAN encodée en base64, ou '' si elle est illisible"""
+    try:
+        raw = base64.b64decode(phy_payload, validate=True)
+    except (binascii.Error, TypeError, ValueError):
+        return ''
+    # MHDR (1 octet) puis DevAddr sur 4 octets, petit-boutiste
+    return raw[4:0:-1].hex().upper() if len(raw) >= 5 else ''
+
+
+def rxpk_records(message, gateway_eui=''):
+    """Enregistrements des paquets reçus (rxpk) d'un message JSON du packet forwarder Semtech
+
+    Le nœud est identifié par le DevAddr de la trame ; SNR et RSSI sont
+    arrondis à l'entier dans les colonnes et conservés exacts dans data.
+    """
+    packets = message.get('rxpk', [message] if 'datr' in message else [])
+    records = []
+    for rxpk in packets:
+        snr, rssi = rxpk.get('lsnr'), rxpk.get('rssi')
+        if snr is None or rssi is None:
+            continue
+        codr = str(rxpk.get('codr', '4/5'))
+        data = json.dumps({'RSSI': rssi, 'SNR': snr}).replace('"', '""')
+        records.append({
+            'type': 'rx',
+            'gateway_eui': rxpk.get('gweui', gateway_eui),
+            'node_eui': _devaddr(rxpk.get('data', '')),
+            'snr': int(round(snr)),
+            'rssi': int(round(rssi)),
+            'cr': int(codr.split('/')[-1]) if codr.split('/')[-1].isdigit() else 5,
+            'datarate': rxpk.get('datr', ''),
+            'time': _rxpk_time(rxpk),
+            'data': data + ';'
+        })
+    return records
+
+
+def parse_text_records(text):
+    """Enregistrements d'un bloc de texte : lignes CSV ou objets JSON rxpk, une entrée par ligne
+
+    Retourne (enregistrements, nombre de lignes rejetées) ; les lignes vides
+    et les en-têtes CSV sont ignorés.
+    """
+    records = []
+    rejected = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('type;'):
+            continue
+        if line.startswith('{'):
+            try:
+                found = rxpk_records(json.loads(line))
+            except (ValueError, AttributeError):
+                found = []
+        else:
+            record = parse_csv_record(line)
+            found = [record] if record else []
+        if found:
+            records.extend(found)
+        else:
+            rejected += 1
+    return records, rejected
+
+
+class ColumnBuffer:
+    """Tampon en colonnes des messages reçus, vidé par blocs dans un CSV au format de la passerelle"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.columns = {name: [] for name in RECORD_FIELDS}
+        self.received = 0
+        self.rejected = 0
+        self.written = 0
+
+    def __len__(self):
+        return len(self.columns['time'])
+
+    def extend(self, records, rejected=0):
+        for name, values in self.columns.items():
+            values.extend(record[name] for record in records)
+        self.received += len(records)
+        self.rejected += rejected
+
+    def take(self):
+        """Retire et retourne les colonnes en attente"""
+        columns = self.columns
+        self.columns = {name: [] for name in RECORD_FIELDS}
+        return columns
+
+    def write(self, columns):
+        """Ajoute des colonnes au CSV de sortie en une seule écriture (en-tête si le fichier est nouveau)"""
+        rows = zip(*(columns[name] for name in RECORD_FIELDS))
+        text = ''.join(f'"{t};{gw};{node};{snr};{rssi};{cr};{dr};{ts};{data}"\n'
+                       for t, gw, node, snr, rssi, cr, dr, ts, data in rows)
+        new_file = not os.path.exists(self.output_path) or os.path.getsize(self.output_path) == 0
+        with open(self.output_path, 'a', encoding='utf-8') as f:
+            if new_file:
+                f.write(CSV_HEADER)
+            f.write(text)
+        self.written += len(columns['time'])
+
+
+class IngestServer:
+    """Réception des messages en UDP et TCP et écriture périodique du CSV"""
+
+    def __init__(self, output_path, flush_interval=FLUSH_INTERVAL, flush_rows=FLUSH_ROWS):
+        self.buffer = ColumnBuffer(output_path)
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.flush_lock = asyncio.Lock()
+        self.started = time.monotonic()
+        # Écriture déclenchée par le remplissage du tampon : référence gardée jusqu'à sa fin
+        self._flush_task = None
+
+    def ingest(self, records, rejected=0):
+        self.buffer.extend(records, rejected)
+        if len(self.buffer) >= self.flush_rows and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self.flush())
+
+    async def close(self):
+        """Attend l'écriture en cours puis vide le tampon"""
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush()
+
+    async def flush(self):
+        """Écrit le tampon sur disque dans un thread, sans bloquer la réception"""
+        async with self.flush_lock:
+            if not len(self.buffer):
+                return
+            columns = self.buffer.take()
+            await asyncio.to_thread(self.buffer.write, columns)
+            elapsed = time.monotonic() - self.started
+            print(f"[{time.strftime('%H:%M:%S')}] {len(columns['time'])} messages écrits "
+                  f"(total {self.buffer.written} écrits sur {self.buffer.received} reçus, "
+                  f"{self.buffer.rejected} rejetés, {self.buffer.received / elapsed:,.0f} messages/s en moyenne)")
+
+    async def flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def handle_tcp(self, reader, writer):
+        """Connexion TCP : lignes CSV ou JSON séparées par des fins de ligne"""
+        pending = b''
+        try:
+            while True:
+                chunk = await reader.read(TCP_READ_SIZE)
+                if not chunk:
+                    break
+                pending += chunk
+                end = pending.rfind(b'\n') + 1
+                if end:
+                    self.ingest(*parse_text_records(pending[:end].decode('utf-8', errors='replace')))
+                    pending = pending[end:]
+            if pending:
+                self.ingest(*parse_text_records(pending.decode('utf-8', errors='replace')))
+        finally:
+            writer.close()
+
+
+class UdpIngestProtocol(asyncio.DatagramProtocol):
+    """Datagrammes UDP : paquets du packet forwarder Semtech ou lignes CSV/JSON"""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) >= 4 and data[0] in SEMTECH_VERSIONS and data[3] in (PUSH_DATA, PULL_DATA):
+            # Accusé de réception attendu par le packet forwarder
+            ack = PUSH_ACK if data[3] == PUSH_DATA else PULL_ACK
+            self.transport.sendto(data[:3] + bytes([ack]), addr)
+            if data[3] == PUSH_DATA and len(data) > 12:
+                try:
+                    message = json.loads(data[12:])
+                except ValueError:
+                    self.server.ingest([], 1)
+                    return
+                self.server.ingest(rxpk_records(message, data[4:12].hex().upper()))
+            return
+        self.server.ingest(*parse_text_records(data.decode('utf-8', errors='replace')))
+
+
+async def serve(output_path, host=DEFAULT_HOST, port=DEFAULT_PORT, protocols=('udp', 'tcp'),
+                flush_interval=FLUSH_INTERVAL, flush_rows=FLUSH_ROWS):
+    """Démarre le serveur d'ingestion jusqu'à son annulation, puis vide le tampon"""
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    server = IngestServer(output_path, flush_interval, flush_rows)
+    loop = asyncio.get_running_loop()
+    closers = []
+    if 'udp' in protocols:
+        transport, _ = await loop.create_datagram_endpoint(lambda: UdpIngestProtocol(server),
+                                                           local_addr=(host, port))
+        closers.append(transport.close)
+    if 'tcp' in protocols:
+        tcp_server = await asyncio.start_server(server.handle_tcp, host, port)
+        closers.append(tcp_server.close)
+    print(f"Ingestion sur {host}:{port} ({', '.join(protocols).upper()}) -> {output_path}")
+
+    try:
+        await server.flush_periodically()
+    finally:
+        for close in closers:
+            close()
+        await server.close()
+        # Bilan à comparer au nombre de messages annoncé par le client de rejeu
+        print(f"Bilan : {server.buffer.received} messages reçus, {server.buffer.written} écrits, "
+              f"{server.buffer.rejected} rejetés")
+    return server
+
+
+def _replay_lines(paths):
+    """Produit (horodatage, ligne) des lignes valides des fichiers CSV, fichier après fichier"""
+    for path in paths:
+        with mapped_file(path) as buf:
+            for line in iter_lines(buf, data_start(buf)):
+                entry, _ = _parse_line(line, 0)
+                if entry:
+                    yield datetime.strptime(entry['time'][:19], TIME_FORMAT).timestamp(), line.strip()
+
+
+def _to_push_data(record, token):
+    """Paquet PUSH_DATA du protocole Semtech portant un enregistrement CSV"""
+    try:
+        devaddr = int(record['node_eui'], 16).to_bytes(4, 'little')
+    except (ValueError, OverflowError):
+        devaddr = bytes(4)
+    rxpk = {
+        'time': record['time'].replace(' ', 'T') + 'Z',
+        'datr': record['datarate'],
+        'codr': f"4/{record['cr']}",
+        'rssi': record['rssi'],
+        'lsnr': record['snr'],
+        'data': base64.b64encode(b'\x40' + devaddr + b'\x00\x00\x00\x01').decode('ascii')
+    }
+    try:
+        gateway = bytes.fromhex(record['gateway_eui'])[:8].rjust(8, b'\x00')
+    except ValueError:
+        gateway = bytes(8)
+    header = bytes([2]) + token.to_bytes(2, 'big') + bytes([PUSH_DATA]) + gateway
+    return header + json.dumps({'rxpk': [rxpk]}).encode('utf-8')
+
+
+class AckWindow(asyncio.DatagramProtocol):
+    """Accusés PUSH_ACK reçus par le client de rejeu Semtech : limite les paquets en attente d'accusé"""
+
+    def __init__(self):
+        self.pending = set()
+        self.acked = 0
+        self.lost = 0
+        self.changed = asyncio.Event()
+
+    def sent(self, token):
+        self.pending.add(token)
+
+    def datagram_received(self, data, addr):
+        if len(data) >= 4 and data[3] == PUSH_ACK:
+            token = int.from_bytes(data[1:3], 'big')
+            if token in self.pending:
+                self.pending.discard(token)
+                self.acked += 1
+                self.changed.set()
+
+    async def wait_below(self, size, timeout=ACK_TIMEOUT):
+        """Attend que moins de size paquets soient sans accusé ; passé timeout, ils sont comptés perdus"""
+        while len(self.pending) >= size:
+            self.changed.clear()
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.lost += len(self.pending)
+                self.pending.clear()
+
+
+async def replay(paths, host=DEFAULT_HOST, port=DEFAULT_PORT, protocol='tcp', speed=1.0, semtech=False):
+    """Rejoue des fichiers CSV vers le serveur à speed fois la vitesse réelle (0 = au plus vite)
+
+    Les lignes sont envoyées telles quelles (ou converties en paquets
+    PUSH_DATA avec semtech, en UDP) au rythme de leurs horodatages. Les
+    lignes dues au même instant sont regroupées dans un même envoi.
+
+    En TCP, le contrôle de flux garantit la réception de tout ce qui est
+    envoyé. En UDP, les paquets PUSH_DATA sont cadencés par leurs accusés :
+    au plus ACK_WINDOW en attente. Les lignes en UDP simple n'ont pas
+    d'accusé : leur nombre reçu n'est vérifiable que dans le bilan du serveur.
+    Retourne (messages envoyés, durée en secondes, messages acquittés ou None).
+    """
+    loop = asyncio.get_running_loop()
+    acks = None
+    if protocol == 'udp':
+        transport, protocol_instance = await loop.create_datagram_endpoint(
+            AckWindow if semtech else asyncio.DatagramProtocol, remote_addr=(host, port))
+        acks = protocol_instance if semtech else None
+        send = transport.sendto
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+        send = writer.write
+
+    sent = 0
+    batch = []
+    batch_size = 0
+    first_time = None
+    start = time.monotonic()
+
+    def flush_batch():
+        nonlocal batch, batch_size
+        if batch:
+            send(''.join(batch).encode('utf-8'))
+            batch, batch_size = [], 0
+
+    for timestamp, line in _replay_lines(paths):
+        if first_time is None:
+            first_time = timestamp
+        # Attendre l'instant de la ligne, ramené à la vitesse de rejeu
+        delay = (timestamp - first_time) / speed - (time.monotonic() - start) if speed else 0
+        if delay > 0:
+            flush_batch()
+            if protocol == 'tcp':
+                await writer.drain()
+            await asyncio.sleep(delay)
+        if semtech:
+            await acks.wait_below(ACK_WINDOW)
+            send(_to_push_data(_parse_line(line, 0)[0], sent & 0xFFFF))
+            acks.sent(sent & 0xFFFF)
+        else:
+            if protocol == 'udp' and batch_size + len(line) + 1 > MAX_DATAGRAM:
+                flush_batch()
+            batch.append(line + '\n')
+            batch_size += len(line) + 1
+        sent += 1
+        if protocol == 'udp' and not semtech and not speed and sent % 256 == 0:
+            # Laisser la boucle vider la file d'envoi UDP
+            flush_batch()
+            await asyncio.sleep(0)
+    flush_batch()
+
+    if protocol == 'udp':
+        if acks is not None:
+            # Derniers accusés
+            await acks.wait_below(1)
+        transport.close()
+    else:
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+    return sent, time.monotonic() - start, acks.acked if acks is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur d'ingestion des messages LoRaWAN et client de rejeu")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    server_parser = commands.add_parser('serve', help="Recevoir les messages en UDP/TCP et les écrire en CSV")
+    server_parser.add_argument('output', help="Fichier CSV de sortie (complété s'il existe)")
+    server_parser.add_argument('--host', default=DEFAULT_HOST)
+    server_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    server_parser.add_argument('--protocol', choices=['udp', 'tcp', 'both'], default='both')
+    server_parser.add_argument('--flush-interval', type=float, default=FLUSH_INTERVAL,
+                               help=f"Intervalle d'écriture du tampon en secondes (défaut: {FLUSH_INTERVAL:g})")
+    server_parser.add_argument('--flush-rows', type=int, default=FLUSH_ROWS,
+                               help=f"Écrire dès que le tampon atteint N messages (défaut: {FLUSH_ROWS})")
+
+    replay_parser = commands.add_parser('replay', help="Rejouer des fichiers CSV vers le serveur")
+    replay_parser.add_argument('paths', nargs='+', help="Fichiers .csv ou dossiers (ex: Data/Max)")
+    replay_parser.add_argument('--host', default=DEFAULT_HOST)
+    replay_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    replay_parser.add_argument('--protocol', choices=['udp', 'tcp'], default=None,
+                               help="Protocole d'envoi (défaut: tcp, udp avec --semtech) ; "
+                                    "en UDP simple, les pertes ne sont visibles que dans le bilan du serveur")
+    replay_parser.add_argument('--speed', type=float, default=1.0,
+                               help="Facteur d'accélération du rejeu (0 = au plus vite)")
+    replay_parser.add_argument('--semtech', action='store_true',
+                               help="Envoyer des paquets PUSH_DATA du packet forwarder Semtech (UDP)")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        protocols = ('udp', 'tcp') if args.protocol == 'both' else (args.protocol,)
+        try:
+            asyncio.run(serve(args.output, args.host, args.port, protocols, args.flush_interval, args.flush_rows))
+        except KeyboardInterrupt:
+            print("\nServeur arrêté")
+    else:
+        protocol = args.protocol or ('udp' if args.semtech else 'tcp')
+        if args.semtech and protocol != 'udp':
+            print("--semtech nécessite --protocol udp")
+            sys.exit(1)
+        paths = csv_files(args.paths)
+        if not paths:
+            print(f"Aucun fichier CSV trouvé dans {', '.join(args.paths)}")
+            sys.exit(1)
+        sent, elapsed, acked = asyncio.run(replay(paths, args.host, args.port, protocol, args.speed, args.semtech))
+        if acked is not None:
+            print(f"{sent} messages envoyés, {acked} acquittés par le serveur ({sent - acked} sans accusé) "
+                  f"en {elapsed:.2f} s ({acked / max(elapsed, 1e-9):,.0f} messages acquittés/s)")
+        else:
+            print(f"{sent} messages envoyés en {elapsed:.2f} s ({sent / max(elapsed, 1e-9):,.0f} messages/s)")
+            if protocol == 'udp':
+                print("UDP sans accusé de réception : comparer avec le bilan affiché par le serveur")
+
+
+if __name__ == "__main__":
+    main()
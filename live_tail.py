@@ -0,0 +1,187 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from analyse_csv_lorawan import (_parse_block, _blocks_to_frame, compact_experiment,
+                                 generate_time_series_plots, DEFAULT_PDR_WINDOW)
+from loss_accounting import detect_losses
+from mmap_csv import data_start
+from streaming_stats import StreamingStats
+from uplink_dedup import uplink_ids, deduplicate_uplinks
+
+
+# Intervalle de scrutation du fichier (s)
+POLL_INTERVAL = 1.0
+# Intervalle minimal entre deux rendus du graphique temporel (s)
+REFRESH_INTERVAL = 10.0
+# Nombre de blocs reçus au-delà duquel l'historique est regroupé en un seul DataFrame
+MAX_PENDING_FRAMES = 64
+
+
+def read_appended(csv_path, offset):
+    """Lit les lignes complètes ajoutées au fichier depuis offset
+
+    Retourne (octets, nouvel offset) ; une dernière ligne en cours
+    d'écriture (sans fin de ligne) est laissée pour la lecture suivante.
+    """
+    with open(csv_path, 'rb') as f:
+        f.seek(offset)
+        chunk = f.read()
+    end = chunk.rfind(b'\n') + 1
+    return chunk[:end], offset + end
+
+
+class LiveExperiment:
+    """Statistiques d'une expérience mises à jour à chaque bloc de messages ajoutés
+
+    Chaque mise à jour ne traite que les nouveaux messages : statistiques
+    SNR/RSSI en flux de toutes les réceptions (voir streaming_stats), puis
+    fusion des réceptions d'un même uplink par plusieurs passerelles (voir
+    uplink_dedup), y compris avec le dernier uplink du bloc précédent, et
+    pertes détectées sur les nouveaux uplinks précédés du dernier uplink de
+    chaque groupe (nœud, SF). La période d'émission
+    est celle donnée ou, à défaut, estimée sur le premier bloc qui le permet
+    puis conservée.
+    """
+
+    def __init__(self, period=None):
+        self.period = period
+        self.frames = []
+        self.messages = 0
+        self.receptions = 0
+        self.lost = 0
+        self.stats = StreamingStats()
+        self.last_rows = None
+
+    def update(self, df):
+        """Ajoute les réceptions d'un bloc (DataFrame au schéma de parse_csv_file), retourne le nombre de nouveaux uplinks"""
+        df = compact_experiment(df)
+        self.receptions += len(df)
+
+        # Statistiques SNR/RSSI en flux, mises à jour avec les seules nouvelles réceptions
+        self.stats.update_frame(df)
+
+        # Réceptions tardives d'un uplink déjà compté au bloc précédent : écartées
+        if self.last_rows is not None:
+            ids = uplink_ids(pd.concat([self.last_rows, df], ignore_index=True))
+            known = ids[:len(self.last_rows)]
+            df = df[~np.isin(ids[len(self.last_rows):], known)]
+        df = deduplicate_uplinks(df)
+        if df.empty:
+            return 0
+        self.frames.append(df)
+        self.messages += len(df)
+
+        # Pertes : le dernier message connu de chaque groupe sert de point de départ au bloc
+        history = df if self.last_rows is None else pd.concat([self.last_rows, df], ignore_index=True)
+        summary, _ = detect_losses(history, self.period)
+        self.lost += int(summary['lost'].sum())
+        if self.period is None and summary['period_s'].notna().any():
+            self.period = float(summary['period_s'].median())
+        group_cols = [col for col in ('node_eui', 'sf') if col in history.columns]
+        self.last_rows = history.sort_values('datetime', kind='stable').groupby(
+            group_cols, observed=True).tail(1)
+
+        # Regrouper l'historique pour borner le nombre de blocs à concaténer au rendu
+        if len(self.frames) > MAX_PENDING_FRAMES:
+            self.frames = [self.history()]
+        return len(df)
+
+    def history(self):
+        """DataFrame de tous les messages reçus, trié par date"""
+        if not self.frames:
+            return None
+        return pd.concat(self.frames, ignore_index=True).sort_values('datetime', kind='stable')
+
+    @property
+    def delivery_rate(self):
+        expected = self.messages + self.lost
+        return self.messages / expected * 100 if expected else 0.0
+
+    def summary(self):
+        """Statistiques SNR/RSSI par SF des messages reçus jusqu'ici"""
+        return self.stats.summary(('sf',))
+
+
+def follow_file(csv_path, output_dir='graphs', poll_interval=POLL_INTERVAL, refresh_interval=REFRESH_INTERVAL,
+                period=None, pdr_window=DEFAULT_PDR_WINDOW, idle_timeout=None):
+    """Suit un fichier CSV en cours d'écriture et met à jour statistiques et graphique temporel
+
+    Le fichier est scruté toutes les poll_interval secondes ; seuls les
+    octets ajoutés depuis la lecture précédente sont analysés. Le graphique
+    temporel est régénéré au plus une fois toutes les refresh_interval
+    secondes, et une dernière fois à l'arrêt (Ctrl+C, ou idle_timeout
+    secondes sans nouvelle ligne). Un fichier tronqué, ou remplacé par un
+    autre (rotation : inode ou périphérique différent, quelle que soit sa
+    taille), est relu depuis le début. Retourne le LiveExperiment final.
+    """
+    prefix = os.path.splitext(os.path.basename(csv_path))[0] + '_'
+    live = LiveExperiment(period)
+    offset = 0
+    first_line = 2
+    last_data = time.monotonic()
+    last_render = float('-inf')
+    pending_render = False
+    identity = None
+
+    def render():
+        generate_time_series_plots(live.history(), output_dir, prefix, period=live.period, pdr_window=pdr_window)
+
+    print(f"Suivi de {csv_path} (Ctrl+C pour arrêter)...")
+    try:
+        while True:
+            try:
+                stat = os.stat(csv_path)
+            except FileNotFoundError:
+                # Rotation en cours : le nouveau fichier n'est pas encore créé
+                time.sleep(poll_interval)
+                continue
+            replaced = identity is not None and (stat.st_ino, stat.st_dev) != identity
+            if replaced or stat.st_size < offset:
+                print("Fichier remplacé : reprise depuis le début" if replaced else
+                      "Fichier tronqué : reprise depuis le début")
+                live = LiveExperiment(period)
+                offset = 0
+                first_line = 2
+            identity = (stat.st_ino, stat.st_dev)
+
+            block, new_offset = read_appended(csv_path, offset)
+            if block and offset == 0:
+                # Ignorer l'en-tête
+                block = block[data_start(block):]
+            offset = new_offset
+
+            if block:
+                last_data = time.monotonic()
+                data, _, errors = _parse_block(block, first_line)
+                first_line += block.count(b'\n')
+                for error in errors:
+                    print(error)
+                df = _blocks_to_frame([data], live.receptions + 1)
+                if df is not None:
+                    added = live.update(df)
+                    pending_render = True
+                    print(f"[{time.strftime('%H:%M:%S')}] +{added} messages (total {live.messages}) - "
+                          f"SNR moy {live.stats.total('snr').mean:.1f} dB - "
+                          f"RSSI moy {live.stats.total('rssi').mean:.1f} dBm - "
+                          f"PDR {live.delivery_rate:.1f}% ({live.lost} perdus)")
+
+            if pending_render and time.monotonic() - last_render >= refresh_interval:
+                render()
+                last_render = time.monotonic()
+                pending_render = False
+
+            if idle_timeout is not None and time.monotonic() - last_data >= idle_timeout:
+                print(f"Aucune nouvelle ligne depuis {idle_timeout:g} s : arrêt du suivi")
+                break
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("\nArrêt du suivi")
+
+    if pending_render:
+        render()
+    if live.messages:
+        print("\nStatistiques par SF :")
+        print(live.summary().round(1).to_string())
+    return live
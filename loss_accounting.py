@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+
+# Colonne du compteur de trames (FCnt) utilisée si elle est présente dans les données
+COUNTER_COLUMN = 'fcnt'
+
+
+def estimate_period(intervals):
+    """Estime la période d'émission (s) comme la médiane des intervalles strictement positifs"""
+    intervals = np.asarray(intervals, dtype=float)
+    intervals = intervals[intervals > 0]
+    return float(np.median(intervals)) if len(intervals) else np.nan
+
+
+def _sequence_gaps(df, period, group_cols, time_col, counter_col):
+    """Trie df par groupe puis par ordre d'émission et calcule les trous de séquence
+
+    Retourne (df trié, code de groupe par ligne, masque du premier message de
+    chaque groupe, indices de début des groupes, période par groupe, nombre de
+    messages manquants avant chaque ligne).
+    """
+    use_counter = counter_col in df.columns and df[counter_col].notna().all()
+    order_col = counter_col if use_counter else time_col
+
+    df = df.sort_values(group_cols + [order_col], kind='stable')
+    n = len(df)
+
+    # Identifiant de groupe contigu (les données sont triées par groupe)
+    if group_cols:
+        codes = df.groupby(group_cols, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+    else:
+        codes = np.zeros(n, dtype=np.int64)
+    first = np.ones(n, dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+    starts = np.flatnonzero(first)
+
+    times = df[time_col].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    intervals = np.diff(times, prepend=times[:1]) / 1e9
+    intervals[first] = np.nan
+
+    if period is not None:
+        periods = np.full(len(starts), float(period))
+    else:
+        periods = (pd.Series(np.where(intervals > 0, intervals, np.nan))
+                   .groupby(codes).median().to_numpy())
+
+    if use_counter:
+        counters = df[counter_col].to_numpy(dtype=np.int64)
+        gaps = np.diff(counters, prepend=counters[:1]) - 1
+    else:
+        with np.errstate(invalid='ignore'):
+            gaps = np.rint(intervals / periods[codes]) - 1
+    # Premier message d'un groupe, doublon ou remise à zéro du compteur : pas de perte
+    gaps = np.where(first | ~np.isfinite(gaps), 0, np.maximum(gaps, 0)).astype(np.int64)
+    return df, codes, first, starts, periods, gaps
+
+
+def detect_losses(df, period=None, group_cols=('node_eui', 'sf'), time_col='datetime',
+                  counter_col=COUNTER_COLUMN):
+    """Détecte les messages perdus par groupe (nœud, SF) et retourne (résumé, rafales)
+
+    Le nombre de messages manquants entre deux réceptions consécutives d'un
+    même groupe est déduit du compteur de trames (counter_col) s'il est
+    présent, sinon de l'intervalle d'arrivée rapporté à la période
+    d'émission : round(intervalle / période) - 1. La période est celle
+    configurée (period, en secondes) ou, à défaut, la médiane des intervalles
+    du groupe. Les pertes avant le premier et après le dernier message reçu
+    ne sont pas visibles.
+
+    Le résumé est indexé par group_cols (colonnes received, expected, lost,
+    delivery_rate, period_s, n_bursts, max_burst) ; les rafales listent
+    chaque trou avec ses bornes (last_received, next_received) et sa longueur.
+    """
+    group_cols = [col for col in group_cols if col in df.columns]
+    df, codes, first, starts, periods, gaps = _sequence_gaps(df, period, group_cols, time_col, counter_col)
+    n = len(df)
+
+    received = np.bincount(codes, minlength=len(starts))
+    lost = np.bincount(codes, weights=gaps, minlength=len(starts)).astype(np.int64)
+    expected = received + lost
+    summary = df.iloc[starts][group_cols].reset_index(drop=True)
+    summary['received'] = received
+    summary['expected'] = expected
+    summary['lost'] = lost
+    summary['delivery_rate'] = received / expected * 100
+    summary['period_s'] = periods
+    summary['n_bursts'] = np.bincount(codes, weights=gaps > 0, minlength=len(starts)).astype(np.int64)
+    summary['max_burst'] = np.maximum.reduceat(gaps, starts) if n else np.empty(0, dtype=np.int64)
+    if group_cols:
+        summary = summary.set_index(group_cols)
+
+    holes = np.flatnonzero(gaps)
+    bursts = df.iloc[holes][group_cols].reset_index(drop=True)
+    bursts['last_received'] = df[time_col].to_numpy()[holes - 1]
+    bursts['next_received'] = df[time_col].to_numpy()[holes]
+    bursts['length'] = gaps[holes]
+    return summary, bursts
+
+
+def delivery_stats(df, period=None, group_cols=('node_eui', 'sf'), time_col='datetime'):
+    """Bilan global des pertes d'une expérience : reçus, attendus, perdus, PDR et plus longue rafale"""
+    summary, bursts = detect_losses(df, period, group_cols, time_col)
+    received = int(summary['received'].sum())
+    expected = int(summary['expected'].sum())
+    return {
+        'messages_received': received,
+        'messages_expected': expected,
+        'messages_lost': expected - received,
+        'delivery_rate': received / expected * 100 if expected else 0.0,
+        'n_bursts': len(bursts),
+        'max_burst': int(bursts['length'].max()) if len(bursts) else 0
+    }
+
+
+def rolling_delivery_rate(df, window=10, unit='messages', period=None, group_cols=('node_eui', 'sf'),
+                          time_col='datetime', counter_col=COUNTER_COLUMN):
+    """PDR glissant (%) à chaque message reçu, aligné sur l'index de df
+
+    Chaque message reçu reçoit son rang dans la séquence attendue du groupe
+    (rang du précédent + messages manquants + 1). Le PDR est le nombre de
+    messages reçus parmi les `window` derniers rangs attendus (unit='messages')
+    ou parmi ceux émis dans les `window` dernières secondes (unit='seconds',
+    soit window / période rangs). Tous les groupes sont traités en une seule
+    recherche dichotomique sur les rangs décalés par groupe, sans boucle Python.
+    """
+    if unit not in ('messages', 'seconds'):
+        raise ValueError(f"Unité de fenêtre inconnue : {unit} (messages ou seconds)")
+    group_cols = [col for col in group_cols if col in df.columns]
+    ordered, codes, first, starts, periods, gaps = _sequence_gaps(df, period, group_cols, time_col,
+                                                                 counter_col)
+    if not len(ordered):
+        return pd.Series(np.empty(0), index=df.index, name='pdr')
+
+    # Rang attendu de chaque message dans son groupe (0 pour le premier)
+    ranks = np.cumsum(gaps + 1)
+    ranks = ranks - ranks[starts][codes]
+
+    if unit == 'messages':
+        widths = np.full(len(ordered), float(window))
+    else:
+        # Une période inconnue (groupe d'un seul message) ne couvre que le message lui-même
+        widths = np.nan_to_num(window / periods[codes], nan=1.0)
+    widths = np.maximum(widths, 1.0)
+
+    # Rangs rendus croissants sur l'ensemble des groupes : les fenêtres ne débordent jamais d'un groupe
+    offset = float(ranks.max() + widths.max() + 1)
+    keys = ranks + codes * offset
+    lower = np.searchsorted(keys, keys - widths, side='right')
+    received = np.arange(len(keys)) - lower + 1
+    expected = np.minimum(widths, ranks + 1)
+    pdr = np.minimum(received / expected, 1.0) * 100
+
+    return pd.Series(pdr, index=ordered.index, name='pdr').reindex(df.index)
@@ -0,0 +1,108 @@
+import os
+import mmap
+import contextlib
+
+
+# Taille minimale d'une plage d'octets confiée à un processus de travail
+MIN_CHUNK_SIZE = 1 << 24
+# Taille des tranches lues pour compter les fins de ligne
+COUNT_CHUNK_SIZE = 1 << 24
+# Taille des fenêtres d'octets analysées l'une après l'autre dans une plage
+WINDOW_SIZE = 1 << 24
+
+
+@contextlib.contextmanager
+def mapped_file(path):
+    """Projette un fichier en mémoire en lecture seule
+
+    Produit un objet mmap (ou b'' pour un fichier vide, qui ne peut pas être
+    projeté). Les vues memoryview prises dessus doivent être libérées avant
+    la sortie du bloc.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield buf
+        finally:
+            buf.close()
+
+
+def data_start(buf):
+    """Position du premier octet suivant la ligne d'en-tête"""
+    end = buf.find(b'\n')
+    return len(buf) if end < 0 else end + 1
+
+
+def record_ranges(buf, start, n_chunks, min_chunk_size=MIN_CHUNK_SIZE):
+    """Découpe buf[start:] en au plus n_chunks plages (début, fin) alignées sur les fins de ligne
+
+    Les plages sont de tailles voisines et d'au moins min_chunk_size octets ;
+    chacune commence en début de ligne et se termine après une fin de ligne
+    (sauf la dernière), de sorte qu'aucun enregistrement n'est coupé.
+    """
+    size = len(buf)
+    n_chunks = max(1, min(n_chunks, (size - start) // max(min_chunk_size, 1)))
+    step = (size - start) // n_chunks
+    bounds = [start]
+    for i in range(1, n_chunks):
+        newline = buf.find(b'\n', max(start + i * step, bounds[-1]))
+        if newline < 0:
+            break
+        bounds.append(newline + 1)
+    bounds.append(size)
+    return [(lo, hi) for lo, hi in zip(bounds, bounds[1:]) if hi > lo]
+
+
+def window_ranges(buf, start, end, window_size=WINDOW_SIZE):
+    """Découpe buf[start:end] en fenêtres (début, fin) successives alignées sur les fins de ligne
+
+    Chaque fenêtre compte window_size octets prolongés jusqu'à la fin de ligne
+    suivante (la dernière s'arrête à end), de sorte qu'aucun tampon ne
+    contient toute la plage.
+    """
+    pos = start
+    while pos < end:
+        newline = buf.find(b'\n', pos + window_size, end) if pos + window_size < end else -1
+        stop = end if newline < 0 else newline + 1
+        yield pos, stop
+        pos = stop
+
+
+def release(buf, start, end):
+    """Rend au noyau les pages projetées de buf[start:end] déjà lues
+
+    Les pages lues d'une projection restent comptées dans la mémoire du
+    processus jusqu'à sa fermeture ; madvise(MADV_DONTNEED) les libère (elles
+    seront relues depuis le cache du système si besoin). Sans effet hors
+    projection ou sur les systèmes qui ne le proposent pas.
+    """
+    if not isinstance(buf, mmap.mmap) or not hasattr(mmap, 'MADV_DONTNEED'):
+        return
+    page_start = start - start % mmap.PAGESIZE
+    if end > page_start:
+        buf.madvise(mmap.MADV_DONTNEED, page_start, end - page_start)
+
+
+def count_newlines(buf, start, end, chunk_size=COUNT_CHUNK_SIZE):
+    """Nombre de fins de ligne de buf[start:end], compté par tranches sans décoder le texte"""
+    count = 0
+    for pos in range(start, end, chunk_size):
+        stop = min(pos + chunk_size, end)
+        count += buf[pos:stop].count(b'\n')
+        release(buf, pos, stop)
+    return count
+
+
+def iter_lines(buf, start=0):
+    """Produit les lignes de buf à partir de start, décodées en UTF-8 et sans fin de ligne"""
+    pos = start
+    size = len(buf)
+    while pos < size:
+        end = buf.find(b'\n', pos)
+        if end < 0:
+            end = size
+        yield buf[pos:end].decode('utf-8', errors='replace').rstrip('\r')
+        pos = end + 1
@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import time
+import atexit
+import cProfile
+import threading
+import contextlib
+
+try:
+    import resource
+except ImportError:  # Windows : pic de mémoire résidente indisponible
+    resource = None
+
+
+# Variables d'environnement équivalentes à --profile et --cprofile (utiles sous cron)
+PROFILE_ENV = 'LORAWAN_PROFILE'
+CPROFILE_ENV = 'LORAWAN_CPROFILE'
+DEFAULT_OUTPUT = 'profile.json'
+# Valeurs de ces variables qui désactivent ou activent (trace par défaut) le profilage
+DISABLED_VALUES = ('', '0', 'false', 'no')
+ENABLED_VALUES = ('1', 'true', 'yes')
+
+_profiler = None
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus depuis son démarrage (Mo), None si indisponible"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sous macOS, kilo-octets sous Linux
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def _json_default(value):
+    """Convertit les scalaires numpy (et à défaut tout objet) en valeurs sérialisables"""
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+class Profiler:
+    """Enregistre la durée, le temps CPU, le débit et le pic mémoire des étapes d'une exécution
+
+    Chaque étape devient un événement complet ('X') au format Chrome trace
+    (chrome://tracing, Perfetto) ; les étapes imbriquées s'affichent les unes
+    sous les autres et les étapes exécutées dans des threads de rendu sur leur
+    propre ligne. Le temps CPU est celui du processus entier.
+    """
+
+    def __init__(self, output_path=DEFAULT_OUTPUT, cprofile=False):
+        self.output_path = output_path
+        self.events = []
+        self.origin = time.perf_counter()
+        # Horloge commune aux processus : recale les événements des processus de travail (voir merge)
+        self.wall_origin = time.time()
+        self.cpu_origin = time.process_time()
+        self.pid = os.getpid()
+        self.cprofile = cProfile.Profile() if cprofile else None
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+    @contextlib.contextmanager
+    def stage(self, name, **args):
+        info = dict(args)
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield info
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - cpu_start
+            info.update(wall_s=wall, cpu_s=cpu, peak_rss_mb=peak_rss_mb())
+            if info.get('rows') is not None and wall > 0:
+                info['rows_per_s'] = info['rows'] / wall
+            self.events.append({'name': name, 'ph': 'X', 'pid': self.pid, 'tid': threading.get_ident(),
+                                'ts': (start - self.origin) * 1e6, 'dur': wall * 1e6, 'args': info})
+
+    def summary(self):
+        """Totaux par nom d'étape : nombre d'appels, durées, lignes traitées et pic mémoire"""
+        stages = {}
+        for event in self.events:
+            if event['ph'] != 'X':
+                continue
+            args = event['args']
+            total = stages.setdefault(event['name'], {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows': 0,
+                                                      'peak_rss_mb': None})
+            total['count'] += 1
+            total['wall_s'] += args['wall_s']
+            total['cpu_s'] += args['cpu_s']
+            total['rows'] += args.get('rows') or 0
+            if args['peak_rss_mb'] is not None:
+                total['peak_rss_mb'] = max(total['peak_rss_mb'] or 0, args['peak_rss_mb'])
+        for total in stages.values():
+            total['rows_per_s'] = total['rows'] / total['wall_s'] if total['rows'] and total['wall_s'] else None
+        return stages
+
+    def export(self):
+        """Événements enregistrés, avec le pid et l'origine des temps du processus (voir merge)"""
+        return {'pid': self.pid, 'wall_origin': self.wall_origin, 'events': self.events}
+
+    def merge(self, trace):
+        """Ajoute les événements exportés par un processus de travail, recalés sur l'origine de ce profil
+
+        Les étapes du processus apparaissent sur sa propre ligne (pid) dans la
+        trace et sont comptées dans les totaux par étape.
+        """
+        shift = (trace['wall_origin'] - self.wall_origin) * 1e6
+        if not any(event['ph'] == 'M' and event['pid'] == trace['pid'] for event in self.events):
+            self.events.append({'name': 'process_name', 'ph': 'M', 'pid': trace['pid'],
+                                'args': {'name': f"processus de travail {trace['pid']}"}})
+        for event in trace['events']:
+            self.events.append(dict(event, ts=event['ts'] + shift))
+
+    def write(self):
+        """Écrit la trace (et le profil cProfile éventuel) et affiche les totaux par étape"""
+        wall = time.perf_counter() - self.origin
+        self.events.insert(0, {'name': os.path.basename(sys.argv[0]) or 'python', 'ph': 'X', 'pid': self.pid,
+                               'tid': threading.get_ident(), 'ts': 0, 'dur': wall * 1e6,
+                               'args': {'argv': sys.argv[1:], 'wall_s': wall,
+                                        'cpu_s': time.process_time() - self.cpu_origin,
+                                        'peak_rss_mb': peak_rss_mb()}})
+        stages = self.summary()
+        with open(self.output_path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms', 'stages': stages}, f, indent=1,
+                      default=_json_default)
+
+        # Sur la sortie d'erreur, pour ne pas se mêler à une sortie exploitée par un autre programme
+        out = sys.stderr
+        print(f"\nProfil ({wall:.2f} s, pic mémoire {self.events[0]['args']['peak_rss_mb'] or 0:.0f} Mo) :", file=out)
+        print(f"  {'Étape':<26}{'Appels':>7}{'Durée (s)':>11}{'CPU (s)':>10}{'Lignes/s':>13}", file=out)
+        for name, total in sorted(stages.items(), key=lambda item: -item[1]['wall_s']):
+            rate = f"{total['rows_per_s']:,.0f}" if total['rows_per_s'] else '-'
+            print(f"  {name:<26}{total['count']:>7}{total['wall_s']:>11.2f}{total['cpu_s']:>10.2f}{rate:>13}",
+                  file=out)
+        print(f"Trace enregistrée : {self.output_path}", file=out)
+
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            cprofile_path = os.path.splitext(self.output_path)[0] + '.prof'
+            self.cprofile.dump_stats(cprofile_path)
+            print(f"Profil cProfile enregistré : {cprofile_path}", file=out)
+
+
+def enable(output_path=DEFAULT_OUTPUT, cprofile=False):
+    """Active l'enregistrement des étapes ; la trace est écrite à la fin du processus"""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(output_path, cprofile)
+        atexit.register(_profiler.write)
+    return _profiler
+
+
+def active():
+    """True si le profilage est actif dans ce processus (à transmettre aux processus de travail)"""
+    return _profiler is not None and os.getpid() == _profiler.pid
+
+
+@contextlib.contextmanager
+def collect(enabled=True):
+    """Enregistre les étapes d'un processus de travail pendant une tâche
+
+    Produit un dict rempli à la sortie du bloc par les événements de la tâche
+    (voir Profiler.export), à renvoyer au processus principal avec le
+    résultat puis à passer à merge ; produit None si enabled est faux.
+    """
+    global _profiler
+    if not enabled:
+        yield None
+        return
+    previous = _profiler
+    _profiler = Profiler(output_path=None)
+    trace = {}
+    try:
+        yield trace
+    finally:
+        trace.update(_profiler.export())
+        _profiler = previous
+
+
+def merge(trace):
+    """Ajoute à la trace du processus principal les événements d'un processus de travail (voir collect)"""
+    if trace and active():
+        _profiler.merge(trace)
+
+
+@contextlib.contextmanager
+def stage(name, **args):
+    """Mesure une étape nommée ; args (ex: file=..., rows=...) sont joints à l'événement
+
+    Produit un dict dans lequel l'appelant peut renseigner des informations
+    connues en cours d'étape (ex: info['rows'] = len(df)). Sans profilage
+    actif, le coût se limite à un test.
+    """
+    if _profiler is None or os.getpid() != _profiler.pid:
+        # Processus de travail hors collect : étapes non enregistrées
+        yield dict(args)
+        return
+    with _profiler.stage(name, **args) as info:
+        yield info
+
+
+def add_arguments(parser):
+    """Ajoute les options --profile et --cprofile à un analyseur argparse"""
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_OUTPUT, default=None, metavar='TRACE',
+                        help="Enregistrer durée, temps CPU, débit et pic mémoire de chaque étape dans une "
+                             f"trace JSON au format Chrome (défaut: {DEFAULT_OUTPUT} ; variable {PROFILE_ENV})")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="Avec --profile, enregistrer aussi un profil cProfile (.prof) de l'exécution "
+                             f"(variable {CPROFILE_ENV}=1)")
+
+
+def setup(args):
+    """Active le profilage demandé en ligne de commande ou par variable d'environnement"""
+    output_path = args.profile
+    if not output_path:
+        output_path = os.environ.get(PROFILE_ENV, '')
+        if output_path.strip().lower() in DISABLED_VALUES:
+            return None
+        if output_path.strip().lower() in ENABLED_VALUES:
+            output_path = DEFAULT_OUTPUT
+    cprofile = args.cprofile or os.environ.get(CPROFILE_ENV, '').strip().lower() not in DISABLED_VALUES
+    return enable(output_path, cprofile)
@@ -15,20 +15,9 @@ python3 convert_csv_to_json.py Data/Moy/
 # Créer un dossier pour les graphiques
 mkdir -p graphs
 
-# Analyser les fichiers JSON générés
+# Analyser les fichiers JSON générés en un seul processus :
+# les graphiques de chaque export sont écrits directement dans graphs/
 echo "\nAnalyse des données..."
-for dir in Data/Max/json Data/Min/json Data/Moy/json; do
-    if [ -d "$dir" ]; then
-        echo "Traitement du dossier $dir"
-        for json_file in "$dir"/*.json; do
-            if [ -f "$json_file" ]; then
-                echo "  Analyse de $json_file"
-                python3 analyse_lorawan.py "$json_file"
-                # Déplacer les graphiques générés
-                mv ./*.png graphs/ 2>/dev/null || true
-            fi
-        done
-    fi
-done
+python3 analyse_lorawan.py Data/Max/json Data/Min/json Data/Moy/json --output-dir graphs
 
 echo "\nAnalyse terminée ! Les graphiques ont été enregistrés dans le dossier 'graphs/'"
@@ -0,0 +1,248 @@
+import os
+import sys
+import argparse
+import functools
+import contextlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from analyse_csv_lorawan import parse_experiment, parse_workers
+from dataset import csv_files
+
+
+# Clé d'un groupe de mesures et métriques suivies
+KEY_COLUMNS = ('node_eui', 'gateway_eui', 'sf')
+METRICS = ('snr', 'rssi')
+
+# Histogrammes à pas fixe (min, max, pas) : chaque classe est centrée sur un multiple du pas,
+# de sorte que médiane et percentiles sont exacts pour des mesures entières
+METRIC_BINS = {
+    'snr': (-40.0, 30.0, 0.25),
+    'rssi': (-160.0, 10.0, 0.5)
+}
+
+# Percentiles rapportés par summary()
+QUANTILES = {'p10': 0.10, 'median': 0.50, 'p90': 0.90}
+
+
+class MetricAccumulator:
+    """Statistiques en flux d'une métrique : moyenne et variance (Welford), extrêmes et histogramme
+
+    update() ajoute une mesure en O(1), update_many() un lot de mesures en
+    une opération vectorisée ; deux accumulateurs se fusionnent avec merge()
+    (formule de Chan), par exemple entre fichiers ou processus. Médiane et
+    percentiles sont lus dans l'histogramme, à un demi-pas près (exacts pour
+    des mesures alignées sur le pas) ; les valeurs hors plage sont comptées
+    dans les classes extrêmes.
+    """
+
+    def __init__(self, low, high, width):
+        self.low = low
+        self.width = width
+        self.counts = np.zeros(int(round((high - low) / width)) + 1, dtype=np.int64)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _bins(self, values):
+        return np.clip(np.rint((values - self.low) / self.width), 0, len(self.counts) - 1).astype(np.int64)
+
+    def update(self, value):
+        value = float(value)
+        if value != value:
+            return
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.counts[min(max(int(round((value - self.low) / self.width)), 0), len(self.counts) - 1)] += 1
+
+    def update_many(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        batch = MetricAccumulator.__new__(MetricAccumulator)
+        batch.low, batch.width = self.low, self.width
+        batch.counts = np.bincount(self._bins(values), minlength=len(self.counts))
+        batch.n = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        self.merge(batch)
+
+    def merge(self, other):
+        """Ajoute les mesures d'un autre accumulateur de même histogramme et retourne self"""
+        if not other.n:
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.counts += other.counts
+        return self
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else 0.0
+
+    def quantile(self, q):
+        """Quantile q (0 à 1) lu dans l'histogramme, borné par les extrêmes observés"""
+        if not self.n:
+            return np.nan
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, q * self.n, side='left'))
+        value = self.low + min(index, len(self.counts) - 1) * self.width
+        return float(min(max(value, self.min), self.max))
+
+    def summary(self, prefix=''):
+        stats = {'count': self.n, 'mean': self.mean if self.n else np.nan, 'std': self.std,
+                 'min': self.min if self.n else np.nan, 'max': self.max if self.n else np.nan}
+        stats.update({name: self.quantile(q) for name, q in QUANTILES.items()})
+        return {f"{prefix}{name}": value for name, value in stats.items()}
+
+
+def _new_group():
+    return {metric: MetricAccumulator(*METRIC_BINS[metric]) for metric in METRICS}
+
+
+class StreamingStats:
+    """Accumulateurs SNR/RSSI par (nœud, passerelle, SF), fusionnables entre fichiers et processus"""
+
+    def __init__(self):
+        self.groups = {}
+
+    def _group(self, key):
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = _new_group()
+        return group
+
+    def update(self, record):
+        """Ajoute un message (dict ou ligne avec les colonnes KEY_COLUMNS et METRICS) en O(1)"""
+        group = self._group((str(record['node_eui']), str(record['gateway_eui']), int(record['sf'])))
+        for metric in METRICS:
+            group[metric].update(record[metric])
+
+    def update_frame(self, df):
+        """Ajoute les messages d'un DataFrame, un lot vectorisé par groupe"""
+        for key, sub in df.groupby(list(KEY_COLUMNS), observed=True, sort=False):
+            group = self._group((str(key[0]), str(key[1]), int(key[2])))
+            for metric in METRICS:
+                group[metric].update_many(sub[metric].to_numpy())
+        return self
+
+    def merge(self, other):
+        """Fusionne les groupes d'un autre StreamingStats et retourne self"""
+        for key, group in other.groups.items():
+            own = self._group(key)
+            for metric in METRICS:
+                own[metric].merge(group[metric])
+        return self
+
+    @property
+    def messages(self):
+        return sum(group[METRICS[0]].n for group in self.groups.values())
+
+    def total(self, metric):
+        """Accumulateur d'une métrique fusionné sur tous les groupes"""
+        total = MetricAccumulator(*METRIC_BINS[metric])
+        for group in self.groups.values():
+            total.merge(group[metric])
+        return total
+
+    def summary(self, by=('sf',)):
+        """DataFrame des statistiques par sous-ensemble des clés (ex: ('sf',), ('node_eui', 'sf'))
+
+        Les groupes partageant les mêmes valeurs de by sont fusionnés ; avec
+        by=(), une seule ligne couvre tous les messages.
+        """
+        by = list(by)
+        positions = [KEY_COLUMNS.index(name) for name in by]
+        merged = {}
+        for key, group in self.groups.items():
+            sub_key = tuple(key[i] for i in positions)
+            target = merged.setdefault(sub_key, _new_group())
+            for metric in METRICS:
+                target[metric].merge(group[metric])
+
+        rows = []
+        for sub_key, group in sorted(merged.items()):
+            row = dict(zip(by, sub_key))
+            row['messages'] = group[METRICS[0]].n
+            for metric in METRICS:
+                stats = group[metric].summary(f"{metric}_")
+                del stats[f"{metric}_count"]
+                row.update(stats)
+            rows.append(row)
+        summary = pd.DataFrame(rows)
+        return summary.set_index(by) if by and not summary.empty else summary
+
+
+def file_stats(csv_path, parser=parse_experiment):
+    """StreamingStats d'un fichier CSV analysé par parser"""
+    stats = StreamingStats()
+    df = parser(csv_path)
+    if df is not None and not df.empty:
+        stats.update_frame(df)
+    return stats
+
+
+def accumulate_files(csv_paths, parser=parse_experiment, jobs=1):
+    """Statistiques de plusieurs fichiers en un seul passage, fichier par fichier
+
+    Seul le fichier en cours est en mémoire ; avec jobs > 1, les fichiers
+    sont répartis sur des processus dont les accumulateurs sont fusionnés.
+    """
+    total = StreamingStats()
+    if jobs == 1:
+        for csv_path in csv_paths:
+            total.merge(file_stats(csv_path, parser))
+        return total
+    with ProcessPoolExecutor(max_workers=jobs or None) as executor:
+        for stats in executor.map(functools.partial(file_stats, parser=parser), csv_paths):
+            total.merge(stats)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Statistiques SNR/RSSI en un seul passage sur des fichiers CSV")
+    parser.add_argument('paths', nargs='+', help="Fichiers .csv ou dossiers")
+    parser.add_argument('--by', default='sf',
+                        help="Clés de regroupement séparées par des virgules parmi "
+                             f"{', '.join(KEY_COLUMNS)} (défaut: sf ; vide = global)")
+    parser.add_argument('--jobs', '-j', type=parse_workers, default=1,
+                        help="Nombre de processus (0 = tous les cœurs)")
+    parser.add_argument('--output', '-o', help="Écrire le résumé dans un fichier CSV")
+    args = parser.parse_args()
+
+    by = tuple(name for name in args.by.split(',') if name)
+    unknown = set(by) - set(KEY_COLUMNS)
+    if unknown:
+        print(f"Clés inconnues : {', '.join(sorted(unknown))}")
+        sys.exit(1)
+
+    csv_paths = csv_files(args.paths)
+    if not csv_paths:
+        print(f"Aucun fichier CSV trouvé dans {', '.join(args.paths)}")
+        sys.exit(1)
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        stats = accumulate_files(csv_paths, jobs=args.jobs)
+    summary = stats.summary(by)
+    print(summary.round(2).to_string())
+    if args.output:
+        summary.to_csv(args.output)
+
+
+if __name__ == "__main__":
+    main()
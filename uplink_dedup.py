@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+
+from loss_accounting import COUNTER_COLUMN
+
+
+# Écart maximal (s) entre deux réceptions d'un même uplink par des passerelles différentes :
+# les horodatages des exports sont à la seconde, une réception peut donc tomber sur la seconde suivante
+UPLINK_TOLERANCE = 2.0
+
+
+def _split_cluster(times, gateways, tolerance_ns):
+    """Débuts d'uplink (positions relatives) d'une grappe de réceptions triée par heure
+
+    Parcours glouton : un uplink commence à une réception et s'étend tant
+    que les suivantes arrivent au plus tolerance_ns après elle et viennent
+    de passerelles qui ne l'ont pas encore reçu. La fin de l'uplink commencé
+    à chaque position est calculée de façon vectorisée ; seul l'enchaînement
+    des débuts est une boucle, d'une itération par uplink.
+    """
+    n = len(times)
+    # Par l'heure : première réception au-delà de la tolérance
+    ends = np.searchsorted(times, times + tolerance_ns, side='right')
+
+    # Par la passerelle : première réception j dont la précédente de la même passerelle est >= au début
+    order = np.lexsort((np.arange(n), gateways))
+    repeat = np.flatnonzero(gateways[order][1:] == gateways[order][:-1])
+    first_repeat = np.full(n + 1, n)
+    np.minimum.at(first_repeat, order[repeat], order[repeat + 1])
+    ends = np.minimum(ends, np.minimum.accumulate(first_repeat[::-1])[::-1][:n])
+
+    starts = []
+    ends = ends.tolist()
+    position = 0
+    while position < n:
+        starts.append(position)
+        position = ends[position]
+    return starts
+
+
+def uplink_ids(df, tolerance=UPLINK_TOLERANCE, key_cols=('node_eui', 'sf'), time_col='datetime',
+               counter_col=COUNTER_COLUMN, gateway_col='gateway_eui'):
+    """Numéro d'uplink de chaque réception de df (tableau aligné sur les lignes de df)
+
+    Les réceptions sont triées une seule fois par (nœud, SF, compteur de
+    trames s'il est présent, heure). Un uplink regroupe des réceptions de
+    même clé et même compteur arrivées au plus tolerance secondes après sa
+    première réception, chacune d'une passerelle différente : deux
+    réceptions d'une même passerelle sont toujours deux uplinks, même pour
+    un nœud émettant plus vite que la tolérance. Sans compteur, seule la
+    proximité temporelle compte.
+
+    Les grappes de réceptions sans ambiguïté (écart total dans la tolérance,
+    passerelles toutes différentes) sont fusionnées sans boucle Python ; les
+    autres sont découpées par _split_cluster. Les uplinks sont numérotés à
+    partir de 0 dans l'ordre du tri.
+    """
+    n = len(df)
+    if not n:
+        return np.empty(0, dtype=np.int64)
+    key_cols = [col for col in key_cols if col in df.columns]
+    use_counter = counter_col in df.columns and df[counter_col].notna().all()
+    tolerance_ns = int(tolerance * 1e9)
+
+    times = df[time_col].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    keys = [times]
+    if use_counter:
+        counters = df[counter_col].to_numpy(dtype=np.int64)
+        keys.append(counters)
+    if key_cols:
+        codes = df.groupby(key_cols, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+        keys.append(codes)
+    # np.lexsort trie sur la dernière clé d'abord
+    order = np.lexsort(keys)
+
+    # Grappes : réceptions consécutives de même clé et même compteur, distantes d'au plus la tolérance
+    sorted_times = times[order]
+    new = np.ones(n, dtype=bool)
+    new[1:] = np.diff(sorted_times) > tolerance_ns
+    if use_counter:
+        new[1:] |= np.diff(counters[order]) != 0
+    if key_cols:
+        new[1:] |= np.diff(codes[order]) != 0
+
+    if gateway_col in df.columns:
+        gateways = pd.factorize(df[gateway_col], use_na_sentinel=False)[0][order]
+    else:
+        # Passerelle inconnue : chaque réception est supposée venir d'une passerelle différente
+        gateways = np.arange(n)
+
+    # Grappe ambiguë : plus longue que la tolérance, ou reçue deux fois par une même passerelle
+    cluster = np.cumsum(new) - 1
+    cluster_starts = np.flatnonzero(new)
+    cluster_ends = np.append(cluster_starts[1:], n)
+    spans = sorted_times[cluster_ends - 1] - sorted_times[cluster_starts]
+    n_gateways = int(gateways.max()) + 1
+    pairs = np.sort(cluster * n_gateways + gateways)
+    repeated = np.zeros(len(cluster_starts), dtype=bool)
+    repeated[pairs[1:][pairs[1:] == pairs[:-1]] // n_gateways] = True
+    for index in np.flatnonzero((spans > tolerance_ns) | repeated):
+        start, end = cluster_starts[index], cluster_ends[index]
+        for position in _split_cluster(sorted_times[start:end], gateways[start:end], tolerance_ns):
+            new[start + position] = True
+
+    ids = np.empty(n, dtype=np.int64)
+    ids[order] = np.cumsum(new) - 1
+    return ids
+
+
+def deduplicate_uplinks(df, tolerance=UPLINK_TOLERANCE, key_cols=('node_eui', 'sf'), time_col='datetime',
+                        counter_col=COUNTER_COLUMN, gateway_col='gateway_eui'):
+    """Regroupe les réceptions d'un même uplink par plusieurs passerelles (voir uplink_ids)
+
+    Retourne un DataFrame d'une ligne par uplink, triée par date : la
+    réception de meilleur SNR (puis de meilleur RSSI), complétée des colonnes
+    gateways (nombre de passerelles distinctes l'ayant reçu, diversité) et
+    receptions (nombre de réceptions fusionnées) ; message_id reste celui de
+    la réception retenue. Tout se fait en quelques tris vectorisés, sans
+    boucle Python.
+    """
+    if df is None or df.empty:
+        return df
+    ids = uplink_ids(df, tolerance, key_cols, time_col, counter_col, gateway_col)
+    n_uplinks = int(ids.max()) + 1
+
+    # Meilleure réception de chaque uplink : premier rang d'un tri (uplink, -SNR, -RSSI)
+    sort_keys = [ids]
+    for column in ('snr', 'rssi'):
+        if column in df.columns:
+            # np.lexsort trie sur la dernière clé d'abord : le SNR départage avant le RSSI
+            sort_keys.insert(0, -df[column].to_numpy(dtype=float))
+    ranked = np.lexsort(sort_keys)
+    first = np.ones(len(ranked), dtype=bool)
+    first[1:] = ids[ranked][1:] != ids[ranked][:-1]
+    best = ranked[first]
+
+    uplinks = df.iloc[best].copy()
+    uplinks['receptions'] = np.bincount(ids, minlength=n_uplinks)
+    if gateway_col in df.columns:
+        # Couples (uplink, passerelle) distincts, comptés après un tri plutôt qu'avec np.unique (hachage)
+        gateways, _ = pd.factorize(df[gateway_col], use_na_sentinel=False)
+        n_gateways = int(gateways.max()) + 1
+        pairs = np.sort(ids * n_gateways + gateways)
+        distinct = np.ones(len(pairs), dtype=bool)
+        distinct[1:] = pairs[1:] != pairs[:-1]
+        uplinks['gateways'] = np.bincount(pairs[distinct] // n_gateways, minlength=n_uplinks)
+    else:
+        uplinks['gateways'] = 1
+
+    return uplinks.sort_values(time_col, kind='stable')
+
+
+def diversity_summary(uplinks):
+    """Résumé de la diversité de réception d'un DataFrame issu de deduplicate_uplinks"""
+    return {
+        'uplinks': len(uplinks),
+        'receptions': int(uplinks['receptions'].sum()),
+        'mean_gateways': float(uplinks['gateways'].mean()) if len(uplinks) else 0.0,
+        'max_gateways': int(uplinks['gateways'].max()) if len(uplinks) else 0
+    }
+
+
+def regression_check():
+    """Vérifie le regroupement sur des flux synthétiques, lève AssertionError en cas d'écart
+
+    Un nœud émettant plus vite que UPLINK_TOLERANCE et entendu par une seule
+    passerelle doit garder tous ses uplinks ; avec trois passerelles et une
+    gigue d'une seconde, chaque uplink doit être compté une seule fois.
+    """
+    start = pd.Timestamp('2025-06-07 10:00:00')
+    for step in (UPLINK_TOLERANCE / 2, UPLINK_TOLERANCE):
+        df = pd.DataFrame({'node_eui': 'N1', 'sf': 7, 'gateway_eui': 'G1', 'snr': 0, 'rssi': -80,
+                           'datetime': start + pd.to_timedelta(np.arange(100) * step, unit='s')})
+        uplinks = deduplicate_uplinks(df)
+        assert len(uplinks) == 100, f"flux à {step:g} s, une passerelle : {len(uplinks)} uplinks au lieu de 100"
+        assert (uplinks['gateways'] == 1).all()
+
+    seconds = np.repeat(np.arange(100) * 7.0, 3) + np.tile([0, 1, 1], 100)
+    df = pd.DataFrame({'node_eui': 'N1', 'sf': 7, 'gateway_eui': np.tile(['G1', 'G2', 'G3'], 100),
+                       'snr': 0, 'rssi': -80, 'datetime': start + pd.to_timedelta(seconds, unit='s')})
+    uplinks = deduplicate_uplinks(df)
+    assert len(uplinks) == 100, f"trois passerelles : {len(uplinks)} uplinks au lieu de 100"
+    assert (uplinks['gateways'] == 3).all()
+
+
+if __name__ == "__main__":
+    regression_check()
+    print("Regroupement des uplinks : vérifications réussies")